@@ -4,9 +4,10 @@ import httpx
 import psycopg2
 import os
 from datetime import datetime, timezone
-import time
 import traceback
 
+from polygon_client import polygon_get_sync, PolygonError
+
 # --- CONFIGURATION -----------------------------------------------
 DB_NAME         = "darkpool_data"
 DB_USER         = "trader"
@@ -41,13 +42,17 @@ def backfill_data(ticker: str, start_date: str, end_date: str, mode: str):
     total_downloaded = 0
     total_saved      = 0
     page_count       = 1
+    client           = httpx.Client(timeout=60)
 
     while url:
         print(f"--- Fetching page {page_count} for {ticker} ---")
         try:
-            resp = httpx.get(url, timeout=60)
-            resp.raise_for_status()
+            # Retries, backoff and pacing happen inside polygon_get_sync
+            resp = polygon_get_sync(client, url)
             data = resp.json()
+        except PolygonError as e:
+            print(f"● Fetch error for {ticker}: {e}")
+            break
         except Exception as e:
             print(f"● Fetch error for {ticker}: {e}")
             traceback.print_exc()
@@ -129,11 +134,11 @@ def backfill_data(ticker: str, start_date: str, end_date: str, mode: str):
         if next_url:
             url = f"{next_url}&apiKey={POLYGON_API_KEY}"
             page_count += 1
-            time.sleep(1)
         else:
             break
 
     print(f"Finished {mode} backfill for {ticker}: downloaded {total_downloaded}, saved {total_saved}.\n")
+    client.close()
     conn.close()
 
 # --- MAIN ENTRYPOINT ---------------------------------------------
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark - SD volume calculator page aggregation
+Times one Polygon trades page (50,000 trades, the API's page limit) through:
+1. The original per-trade loop from unlimited_fast_calculate_level_volume
+2. main.aggregate_trade_page's NumPy kernel (if installed) - used for dense bands
+3. main.aggregate_trade_page's loop kernel - used for narrow bands and without NumPy
+
+Widen --tolerance to find where the NumPy kernel overtakes the loop
+(main.VECTORIZE_MIN_BAND_FRACTION).
+
+Every variant must agree with the loop before its timing is printed.
+Run from the repo root: python benchmark_aggregation.py [--trades N] [--repeat N]
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List, Tuple
+
+import main
+
+def make_page(trades: int, level_price: float, seed: int = 7) -> List[Dict]:
+    """Synthetic page shaped like Polygon v3 trades around a level, with a few zero-size and fractional-share rows"""
+    rng = random.Random(seed)
+    page = []
+    for i in range(trades):
+        trade = {
+            'price': round(level_price + rng.gauss(0, 0.5), 4),
+            'size': rng.choice((1, 5, 10, 50, 100, 100, 100, 200, 500, 1000)),
+            'sip_timestamp': 1717421400000000000 + i * 1000,
+            'exchange': rng.randint(1, 21),
+            'conditions': [rng.choice((12, 14, 37, 41))],
+        }
+        if i % 997 == 0:
+            trade['size'] = 0
+        elif i % 499 == 0:
+            trade['size'] = 0.25
+        page.append(trade)
+    return page
+
+def original_loop(results: List[Dict], min_price: float,
+                  max_price: float) -> Tuple[int, float, int, float, float]:
+    """The per-trade loop as it was before aggregate_trade_page"""
+    total_volume = 0
+    total_value = 0.0
+    total_trades = 0
+    min_actual_price = float('inf')
+    max_actual_price = 0.0
+    for trade in results:
+        qty = trade.get('size')
+        price = trade.get('price')
+
+        if not (qty and price):
+            continue
+
+        if min_price <= price <= max_price:
+            total_volume += qty
+            total_value += (qty * price)
+            total_trades += 1
+
+            min_actual_price = min(min_actual_price, price)
+            max_actual_price = max(max_actual_price, price)
+    return total_volume, total_value, total_trades, min_actual_price, max_actual_price
+
+def time_variant(fn, page: List[Dict], min_price: float, max_price: float,
+                 repeat: int) -> Tuple[float, Tuple]:
+    """Best-of-repeat wall time in seconds"""
+    best = float('inf')
+    result: Tuple = ()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(page, min_price, max_price)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main_benchmark() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark SD page aggregation")
+    parser.add_argument("--trades", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--level", type=float, default=512.35)
+    parser.add_argument("--tolerance", type=float, default=0.025)
+    args = parser.parse_args()
+
+    page = make_page(args.trades, args.level)
+    min_price = args.level - args.tolerance
+    max_price = args.level + args.tolerance
+
+    variants = [("original loop", original_loop)]
+    if main.NUMPY_AVAILABLE:
+        variants.append(("numpy", main._aggregate_trade_page_numpy))
+    else:
+        print("📁 numpy not installed - skipping the vectorized kernel")
+    variants.append(("loop kernel", main._aggregate_trade_page_python))
+
+    print(f"🚀 {args.trades:,} trades/page, band ${min_price:.3f} - ${max_price:.3f}, best of {args.repeat}")
+    baseline_time, expected = time_variant(original_loop, page, min_price, max_price, args.repeat)
+
+    for name, fn in variants:
+        if fn is original_loop:
+            elapsed, result = baseline_time, expected
+        else:
+            elapsed, result = time_variant(fn, page, min_price, max_price, args.repeat)
+        volume, value, trades, low, high = result
+        agrees = (
+            (volume, trades, low, high) == (expected[0], expected[2], expected[3], expected[4])
+            and abs(value - expected[1]) <= 1e-9 * max(1.0, abs(expected[1]))
+        )
+        status = "✅" if agrees else "❌ MISMATCH"
+        print(f"{status} {name:<16} {elapsed * 1e6:>10,.0f} µs/page  "
+              f"{baseline_time / elapsed:>6.1f}x  ({trades:,} trades in band, {volume:,} shares)")
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -6,6 +6,7 @@ INCLUDES: Segmented job visualization with proper date ranges and customizable c
 """
 
 import uuid
+import json
 import os
 import math
 import io
@@ -17,7 +18,7 @@ from discord.ext import commands
 from discord import app_commands
 from PIL import Image, ImageDraw, ImageFont
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from typing import Optional, Union, List, Dict
 
 # Matplotlib imports for visualization with proper error handling
@@ -107,13 +108,33 @@ def format_large_number(num):
     return str(num)
 
 # ─── ENHANCED HTTP CLIENT ──────────────────────────────────────────
+# GET responses that carried an ETag: (url, params) -> (etag, body bytes). Refreshes send
+# If-None-Match and re-parse the cached body on 304 instead of re-downloading it.
+ETAG_CACHE_SIZE = 256
+etag_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
 async def make_api_request(url: str, method: str = "GET", params=None, json_data=None, timeout_seconds: int = 60):
     """Make API request with proper timeout and error handling"""
     try:
         timeout = httpx.Timeout(timeout_seconds)
         async with httpx.AsyncClient(timeout=timeout) as client:
             if method.upper() == "GET":
-                response = await client.get(url, params=params or {})
+                cache_key = (url, tuple(sorted((params or {}).items())))
+                cached = etag_cache.get(cache_key)
+                headers = {'If-None-Match': cached[0]} if cached else {}
+                response = await client.get(url, params=params or {}, headers=headers)
+                if response.status_code == 304 and cached:
+                    etag_cache.move_to_end(cache_key)
+                    return json.loads(cached[1])  # fresh objects - callers mutate the result
+                response.raise_for_status()
+                data = response.json()
+                etag = response.headers.get('ETag')
+                if etag:
+                    etag_cache[cache_key] = (etag, response.content)
+                    etag_cache.move_to_end(cache_key)
+                    if len(etag_cache) > ETAG_CACHE_SIZE:
+                        etag_cache.popitem(last=False)
+                return data
             elif method.upper() == "POST":
                 response = await client.post(url, json=json_data or {})
             elif method.upper() == "PUT":
@@ -135,11 +156,11 @@ async def make_api_request(url: str, method: str = "GET", params=None, json_data
 
 # ─── PAGINATION & IMAGE GENERATOR ────────────────────────────────
 class PaginatorView(discord.ui.View):
-    def __init__(self, trades, headers, title, author: Union[discord.User, discord.Member], show_summaries=False, **kwargs):
+    def __init__(self, trades, headers, title, author: Union[discord.User, discord.Member], show_summaries=False, daily_totals=None, **kwargs):
         super().__init__(timeout=180)
         
         if show_summaries:
-            self.processed_rows = self._process_trades_with_summaries(trades)
+            self.processed_rows = self._process_trades_with_summaries(trades, daily_totals)
         else:
             self.processed_rows = trades
         
@@ -161,10 +182,13 @@ class PaginatorView(discord.ui.View):
             self.hdr_font = ImageFont.load_default()
             self.body_font = ImageFont.load_default()
 
-    def _process_trades_with_summaries(self, trades):
+    def _process_trades_with_summaries(self, trades, daily_totals=None):
+        """Group trades by day with a totals row; exact API totals win, page-only sums are labelled"""
         if not trades:
             return []
 
+        daily_totals = daily_totals or {}
+
         trades_by_date = defaultdict(list)
         for trade in trades:
             trade_date = datetime.fromisoformat(trade['trade_time']).strftime('%Y-%m-%d')
@@ -174,13 +198,19 @@ class PaginatorView(discord.ui.View):
         for trade_date in sorted(trades_by_date.keys(), reverse=True):
             day_trades = trades_by_date[trade_date]
             
-            total_quantity = sum(t['quantity'] for t in day_trades)
-            total_value = sum(t['trade_value'] for t in day_trades)
+            if trade_date in daily_totals:
+                total_quantity = daily_totals[trade_date]['quantity']
+                total_value = daily_totals[trade_date]['value']
+                label = f"{trade_date} Totals:"
+            else:
+                total_quantity = sum(t['quantity'] for t in day_trades)
+                total_value = sum(t['trade_value'] for t in day_trades)
+                label = f"{trade_date} Shown:"
 
             summary_row = {
                 'is_summary': True,
                 'Ticker': day_trades[0]['ticker'],
-                'Time': f"{trade_date} Totals:",
+                'Time': label,
                 'Quantity': total_quantity,
                 'Value': total_value
             }
@@ -752,7 +782,28 @@ class TimelineAbsorptionView(discord.ui.View):
             await interaction.response.edit_message(embed=embed, attachments=[file], view=self)
 
 # ─── COMMAND RUNNER ──────────────────────────────────────────────
-async def run_paginated_command(interaction: discord.Interaction, url: str, headers: list, title: str, show_summaries: bool = False, **kwargs):
+async def fetch_daily_totals(summary_url: str, trades: list, min_value: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Exact per-day totals of the listing's own population (same value floor and session),
+    over the days the fetched trades span, keyed by YYYY-MM-DD
+    """
+    days = sorted({datetime.fromisoformat(t['trade_time']).strftime('%Y-%m-%d') for t in trades})
+    params = {'start_date': days[0], 'end_date': days[-1]}
+    if min_value is not None:
+        params['min_value'] = min_value
+    try:
+        rows = await make_api_request(summary_url, params=params, timeout_seconds=10)
+    except Exception as e:
+        print(f"Daily totals unavailable, showing page sums: {e}")
+        return {}
+
+    return {
+        row['trade_day']: {'quantity': row['total_volume'], 'value': row['total_notional']}
+        for row in rows
+    }
+
+async def run_paginated_command(interaction: discord.Interaction, url: str, headers: list, title: str, show_summaries: bool = False,
+                                summary_url: Optional[str] = None, **kwargs):
     await interaction.response.defer(thinking=True)
     
     try:
@@ -760,6 +811,7 @@ async def run_paginated_command(interaction: discord.Interaction, url: str, head
             resp = await asyncio.wait_for(client.get(url), timeout=30)
         resp.raise_for_status()
         data = resp.json()
+        value_floor = resp.headers.get('X-Value-Floor')
     except Exception as e:
         traceback.print_exc()
         await interaction.followup.send(f'❌ An API or network error occurred. Check the bot console for details.', ephemeral=True)
@@ -774,7 +826,11 @@ async def run_paginated_command(interaction: discord.Interaction, url: str, head
         await interaction.followup.send('❌ Unable to identify user.', ephemeral=True)
         return
 
-    view = PaginatorView(data, headers, title, user, show_summaries=show_summaries, **kwargs)
+    daily_totals = None
+    if show_summaries and summary_url:
+        daily_totals = await fetch_daily_totals(summary_url, data, value_floor)
+
+    view = PaginatorView(data, headers, title, user, show_summaries=show_summaries, daily_totals=daily_totals, **kwargs)
     
     embed = discord.Embed(title=title, color=discord.Color(0xFF8C00))
     if bot.user is not None:
@@ -1398,7 +1454,8 @@ class DarkPoolCommands(app_commands.Group):
             interaction, f"{API_BASE_URL}/dp/allblocks/{ticker.upper()}",
             ['Ticker','Quantity','Price','Value','Time'],
             f"Block Trades for {ticker.upper()}",
-            show_summaries=True
+            show_summaries=True,
+            summary_url=f"{API_BASE_URL}/dp/allblocks/{ticker.upper()}/daily"
         )
 
     @app_commands.command(description='Block trades during market hours')
@@ -1451,6 +1508,7 @@ class LitCommands(app_commands.Group):
             ['Ticker','Quantity','Price','Value','Time'],
             f"Lit Market Trades for {ticker.upper()}",
             show_summaries=True,
+            summary_url=f"{API_BASE_URL}/lit/all/{ticker.upper()}/daily",
             header_gradient=((97, 138, 250), (0, 68, 255))
         )
 
@@ -106,7 +106,7 @@ def create_sd_tables():
             ticker VARCHAR(20) NOT NULL,
             trade_time TIMESTAMPTZ NOT NULL,
             price DECIMAL(12,4) NOT NULL,
-            quantity BIGINT NOT NULL,
+            quantity DECIMAL(20,4) NOT NULL,  -- Polygon sizes can be fractional
             trade_value DECIMAL(20,4) NOT NULL,
             conditions INTEGER[],
             exchange INTEGER,
@@ -145,10 +145,10 @@ def create_sd_tables():
             level_id BIGINT REFERENCES supply_demand_levels(id) ON DELETE CASCADE,
             ticker VARCHAR(20) NOT NULL,
             trade_date DATE NOT NULL,
-            daily_volume BIGINT DEFAULT 0,
+            daily_volume DECIMAL(20,4) DEFAULT 0,
             daily_value DECIMAL(20,4) DEFAULT 0,
             daily_trade_count INTEGER DEFAULT 0,
-            cumulative_volume BIGINT DEFAULT 0,
+            cumulative_volume DECIMAL(20,4) DEFAULT 0,
             last_updated TIMESTAMPTZ DEFAULT NOW(),
             UNIQUE(level_id, trade_date)
         )
@@ -10,9 +10,28 @@ import asyncio
 import uuid
 import traceback
 import json
+import base64
+import csv
+import io
+import time
+import threading
+import contextvars
+import sys
+import hmac
+import functools
+import hashlib
+import bisect
+import operator
+import socket
+import weakref
+import concurrent.futures
+import multiprocessing
+from dataclasses import dataclass
+from collections import deque
 from datetime import datetime, timedelta, timezone, date
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Tuple, Callable, Hashable, Union
 from contextlib import asynccontextmanager
+from urllib.parse import parse_qsl
 from zoneinfo import ZoneInfo
 
 import httpx
@@ -20,13 +39,40 @@ import asyncpg
 import psycopg2
 import psycopg2.pool
 import psycopg2.extras
+import psycopg2.errors
 from psycopg2.extras import RealDictCursor
 import uvicorn
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
+from fastapi import FastAPI, HTTPException, Query, Response, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from starlette.routing import Match
 from pydantic import BaseModel
 import logging
 
+import polygon_client
+from polygon_client import polygon_get
+
+# Optional fast serializers - the default JSON path does not need either
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# Vectorized page aggregation for the SD volume calculator (in requirements.txt;
+# without it every page takes the loop kernel)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -47,9 +93,19 @@ SD_DB_PASS = "Deltuhdarkpools!7"
 SD_DB_HOST = "localhost"
 SD_DB_PORT = "5432"
 
+# Optional hot-standby replicas (libpq DSNs) for GET traffic; unset = everything on the primary
+DARKPOOL_REPLICA_DSN = os.environ.get('DARKPOOL_REPLICA_DSN')
+SD_REPLICA_DSN = os.environ.get('SD_REPLICA_DSN')
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_LAG_CHECK_SECONDS = 2
+
 # Other configs
 POLYGON_API_KEY = os.environ.get('POLYGON_API_KEY')
+DEBUG_API_TOKEN = os.environ.get('DEBUG_API_TOKEN')  # /debug/profile is disabled when unset
 RECENT_TRADES_FOR_PCT = 5000
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+STREAM_FETCH_SIZE = 5000  # rows per round-trip on server-side cursors
 DEFAULT_MIN_VALUE = 1_000_000.0
 NY_TZ = ZoneInfo("America/New_York")
 
@@ -57,7 +113,22 @@ NY_TZ = ZoneInfo("America/New_York")
 darkpool_db_pool: Optional[psycopg2.pool.SimpleConnectionPool] = None
 sd_db_pool: Optional[asyncpg.Pool] = None
 sd_sync_pool: Optional[psycopg2.pool.SimpleConnectionPool] = None
-jobs_db: Dict[str, Dict] = {}  # In-memory job tracking
+darkpool_replica_pool: Optional[psycopg2.pool.SimpleConnectionPool] = None
+sd_replica_pool: Optional[asyncpg.Pool] = None
+jobs_db: Dict[str, Dict] = {}  # Per-worker read-through cache of background_jobs (Postgres is authoritative)
+
+# Each uvicorn worker is its own process with its own pools - keep the total under max_connections
+API_WORKERS = int(os.environ.get('API_WORKERS', '1'))
+
+def per_worker(total: int, floor: int = 2) -> int:
+    """Split a server-wide connection budget across API_WORKERS processes"""
+    return max(floor, total // API_WORKERS)
+
+# 'inline' runs the job queue workers inside the API processes; 'external' leaves them to
+# `python main.py worker` so job CPU never shares an event loop with requests
+JOB_RUNNER = os.environ.get('JOB_RUNNER', 'inline')
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', '4'))  # per deployment
+JOB_MAX_PER_TICKER = int(os.environ.get('JOB_MAX_PER_TICKER', '2'))
 
 # ─── HELPER FUNCTIONS ────────────────────────────────────────────
 
@@ -69,6 +140,435 @@ def parse_date_string(date_str: str) -> date:
         return datetime.strptime(date_str, '%Y-%m-%d').date()
     raise ValueError(f"Invalid date format: {date_str}")
 
+# ─── INSTRUMENTATION ─────────────────────────────────────────────
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', '1.0'))
+SLOW_REQUEST_BUFFER_SIZE = 200
+
+class Histogram:
+    """Minimal Prometheus-style cumulative histogram, keyed by a label tuple"""
+    
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series: Dict[Tuple, List] = {}  # labels -> [bucket_counts, sum, count]
+        self._lock = threading.Lock()
+    
+    def observe(self, labels: Tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (buckets, total, count) in sorted(self._series.items()):
+                label_str = ",".join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+                for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f'{self.name}_bucket{{{label_str},le="{bound}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{label_str},le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{{label_str}}} {total:.6f}')
+                lines.append(f'{self.name}_count{{{label_str}}} {count}')
+        return lines
+
+REQUEST_LATENCY = Histogram("api_request_duration_seconds", "End-to-end request latency by route", ("method", "route"))
+REQUEST_DB_TIME = Histogram("api_request_db_seconds", "Time a request held DB connections", ("method", "route"))
+POOL_WAIT = Histogram("db_pool_wait_seconds", "Time spent waiting for a pooled connection", ("pool",))
+POOL_EXEC = Histogram("db_connection_held_seconds", "Time a checked-out connection was in use (queries + fetch)", ("pool",))
+
+requests_total: Dict[Tuple[str, str, int], int] = {}
+requests_in_flight: Dict[Tuple[str, str], int] = {}
+slow_requests: deque = deque(maxlen=SLOW_REQUEST_BUFFER_SIZE)
+
+# Per-request DB timing; run_in_threadpool copies the context, so sync handlers share the dict
+request_db_timing: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    'request_db_timing', default=None
+)
+
+# ─── STATEMENT TIMEOUTS & ADMISSION CONTROL ──────────────────────
+
+@dataclass(frozen=True)
+class RouteLimit:
+    statement_timeout: Optional[float] = None  # seconds, applied to every query the request runs
+    max_concurrent: Optional[int] = None       # beyond this the route answers 503 immediately
+
+# Keyed by route template. Darkpool routes share the maxconn=10 psycopg2 pool, so
+# the heavy scans are capped well below it.
+ROUTE_LIMITS: Dict[str, RouteLimit] = {
+    '/dp/allblocks/{ticker}': RouteLimit(statement_timeout=10, max_concurrent=4),
+    '/dp/alldp/{ticker}': RouteLimit(statement_timeout=10, max_concurrent=4),
+    '/lit/all/{ticker}': RouteLimit(statement_timeout=10, max_concurrent=4),
+    '/dp/bigprints': RouteLimit(statement_timeout=15, max_concurrent=2),
+    '/lit/bigprints': RouteLimit(statement_timeout=15, max_concurrent=2),
+    '/dp/batch/allblocks': RouteLimit(statement_timeout=20, max_concurrent=2),
+    '/dp/batch/alldp': RouteLimit(statement_timeout=20, max_concurrent=2),
+    '/lit/batch/all': RouteLimit(statement_timeout=20, max_concurrent=2),
+    '/dp/daily/{ticker}': RouteLimit(statement_timeout=5, max_concurrent=4),
+    '/lit/daily/{ticker}': RouteLimit(statement_timeout=5, max_concurrent=4),
+    '/dp/allblocks/{ticker}/daily': RouteLimit(statement_timeout=10, max_concurrent=4),
+    '/lit/all/{ticker}/daily': RouteLimit(statement_timeout=10, max_concurrent=4),
+    '/db/status': RouteLimit(statement_timeout=30, max_concurrent=1),
+    '/levels/{ticker}/enhanced-timeline': RouteLimit(statement_timeout=10, max_concurrent=8),
+    '/levels/{ticker}/nearby-prints': RouteLimit(statement_timeout=20, max_concurrent=2),
+}
+ADMISSION_RETRY_AFTER = 1  # seconds, sent with 503s
+
+requests_rejected_total: Dict[str, int] = {}
+requests_cancelled_total: Dict[str, int] = {}
+
+request_statement_timeout: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    'request_statement_timeout', default=None
+)
+# psycopg2 connections a request currently holds -> the coalesced flight (if any) that
+# checked each out, so a disconnect can cancel their queries. Threadpool handlers add and
+# remove entries while the loop thread reads them, hence the lock.
+request_active_connections: contextvars.ContextVar[Optional[Dict[Any, Any]]] = contextvars.ContextVar(
+    'request_active_connections', default=None
+)
+_active_connections_lock = threading.Lock()
+
+# ─── READ REPLICA ROUTING ────────────────────────────────────────
+
+# Set for GET/HEAD requests by ReadReplicaRoutingMiddleware; the connection helpers
+# only honour it while the replica's lag is under REPLICA_MAX_LAG_SECONDS
+request_prefers_replica: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    'request_prefers_replica', default=False
+)
+
+# GET routes that write (directly or via background tasks) stay on the primary
+PRIMARY_ONLY_GET_ROUTES = {
+    '/market-volume-job-enhanced/{ticker}',
+}
+
+replica_status: Dict[str, Dict[str, Any]] = {
+    'darkpool': {'configured': False, 'healthy': False, 'lag_seconds': None},
+    'sd': {'configured': False, 'healthy': False, 'lag_seconds': None},
+}
+
+# Zero when the replica has replayed everything it received (an idle primary is not lag)
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END::float
+"""
+
+def use_replica(database: str) -> bool:
+    return request_prefers_replica.get() and replica_status[database]['healthy']
+
+def record_pool_wait(pool: str, seconds: float):
+    POOL_WAIT.observe((pool,), seconds)
+    timing = request_db_timing.get()
+    if timing is not None:
+        timing['db_wait'] += seconds
+        timing['db_calls'] += 1
+
+def record_pool_exec(pool: str, seconds: float):
+    POOL_EXEC.observe((pool,), seconds)
+    timing = request_db_timing.get()
+    if timing is not None:
+        timing['db_exec'] += seconds
+
+coalesced_calls_total: Dict[str, int] = {}
+statement_prepares_total: Dict[str, int] = {}
+not_modified_total: Dict[str, int] = {}
+jobs_finished_total: Dict[Tuple[str, str], int] = {}
+jobs_requeued_total: Dict[str, int] = {}
+
+def render_prometheus_metrics() -> str:
+    lines: List[str] = []
+    for histogram in (REQUEST_LATENCY, REQUEST_DB_TIME, POOL_WAIT, POOL_EXEC):
+        lines.extend(histogram.render())
+    
+    lines += ["# HELP api_requests_total Completed requests", "# TYPE api_requests_total counter"]
+    for (method, route, status_code), count in sorted(requests_total.items()):
+        lines.append(f'api_requests_total{{method="{method}",route="{route}",status="{status_code}"}} {count}')
+    
+    lines += ["# HELP api_requests_in_flight Requests currently being handled", "# TYPE api_requests_in_flight gauge"]
+    for (method, route), count in sorted(requests_in_flight.items()):
+        lines.append(f'api_requests_in_flight{{method="{method}",route="{route}"}} {count}')
+    
+    lines += ["# HELP api_requests_rejected_total Requests refused by per-route admission control",
+              "# TYPE api_requests_rejected_total counter"]
+    for route, count in sorted(requests_rejected_total.items()):
+        lines.append(f'api_requests_rejected_total{{route="{route}"}} {count}')
+    
+    lines += ["# HELP api_requests_cancelled_total Requests whose queries were cancelled after client disconnect",
+              "# TYPE api_requests_cancelled_total counter"]
+    for route, count in sorted(requests_cancelled_total.items()):
+        lines.append(f'api_requests_cancelled_total{{route="{route}"}} {count}')
+    
+    lines += ["# HELP api_coalesced_calls_total Calls answered by an identical in-flight query",
+              "# TYPE api_coalesced_calls_total counter"]
+    for function_name, count in sorted(coalesced_calls_total.items()):
+        lines.append(f'api_coalesced_calls_total{{function="{function_name}"}} {count}')
+    
+    lines += ["# HELP api_statement_prepares_total Server-side PREPAREs of registry statements (one per pooled connection)",
+              "# TYPE api_statement_prepares_total counter"]
+    for statement_name, count in sorted(statement_prepares_total.items()):
+        lines.append(f'api_statement_prepares_total{{statement="{statement_name}"}} {count}')
+    
+    lines += ["# HELP api_not_modified_total Conditional GETs answered 304 from the version stamp alone",
+              "# TYPE api_not_modified_total counter"]
+    for route, count in sorted(not_modified_total.items()):
+        lines.append(f'api_not_modified_total{{route="{route}"}} {count}')
+    
+    lines += ["# HELP api_jobs_finished_total Queued jobs run to an end by this process's workers",
+              "# TYPE api_jobs_finished_total counter"]
+    for (kind, outcome), count in sorted(jobs_finished_total.items()):
+        lines.append(f'api_jobs_finished_total{{kind="{kind}",outcome="{outcome}"}} {count}')
+    
+    lines += ["# HELP api_jobs_requeued_total Jobs put back on the queue after their worker died",
+              "# TYPE api_jobs_requeued_total counter"]
+    for kind, count in sorted(jobs_requeued_total.items()):
+        lines.append(f'api_jobs_requeued_total{{kind="{kind}"}} {count}')
+    
+    lines += ["# HELP api_replica_lag_seconds Replay lag of each configured read replica (-1 = unreachable)",
+              "# TYPE api_replica_lag_seconds gauge"]
+    for database, status in sorted(replica_status.items()):
+        if status['configured']:
+            lag = status['lag_seconds']
+            lines.append(f'api_replica_lag_seconds{{database="{database}"}} {-1 if lag is None else lag}')
+    
+    lines += ["# HELP api_replica_healthy 1 while GET traffic is routed to the replica",
+              "# TYPE api_replica_healthy gauge"]
+    for database, status in sorted(replica_status.items()):
+        if status['configured']:
+            lines.append(f'api_replica_healthy{{database="{database}"}} {int(status["healthy"])}')
+    
+    lines += ["# HELP api_polygon_requests_total Polygon request attempts by outcome",
+              "# TYPE api_polygon_requests_total counter"]
+    for (host, outcome), count in sorted(polygon_client.polygon_requests_total.items()):
+        lines.append(f'api_polygon_requests_total{{host="{host}",outcome="{outcome}"}} {count}')
+    
+    lines += ["# HELP api_polygon_retries_total Polygon attempts retried after backoff",
+              "# TYPE api_polygon_retries_total counter"]
+    for (host, reason), count in sorted(polygon_client.polygon_retries_total.items()):
+        lines.append(f'api_polygon_retries_total{{host="{host}",reason="{reason}"}} {count}')
+    
+    lines += ["# HELP api_polygon_throttle_seconds_total Time spent waiting on the rate limiter or a 429 Retry-After",
+              "# TYPE api_polygon_throttle_seconds_total counter"]
+    for source, seconds in sorted(polygon_client.polygon_throttle_seconds_total.items()):
+        lines.append(f'api_polygon_throttle_seconds_total{{source="{source}"}} {seconds:.3f}')
+    
+    lines += ["# HELP api_polygon_breaker_opened_total Times a Polygon host's circuit breaker opened",
+              "# TYPE api_polygon_breaker_opened_total counter"]
+    for host, count in sorted(polygon_client.polygon_breaker_opened_total.items()):
+        lines.append(f'api_polygon_breaker_opened_total{{host="{host}"}} {count}')
+    
+    lines += ["# HELP api_polygon_breaker_rejected_total Polygon calls refused while the breaker was open",
+              "# TYPE api_polygon_breaker_rejected_total counter"]
+    for host, count in sorted(polygon_client.polygon_breaker_rejected_total.items()):
+        lines.append(f'api_polygon_breaker_rejected_total{{host="{host}"}} {count}')
+    
+    lines += ["# HELP api_polygon_breaker_open 1 while calls to the host are refused",
+              "# TYPE api_polygon_breaker_open gauge"]
+    for host, breaker in sorted(polygon_client.breakers.items()):
+        lines.append(f'api_polygon_breaker_open{{host="{host}"}} {int(breaker.state == "open")}')
+    
+    return "\n".join(lines) + "\n"
+
+# ─── SINGLE-FLIGHT COALESCING ────────────────────────────────────
+
+class _Flight:
+    """
+    One shared execution: a concurrent.futures.Future (sync) or asyncio.Task (async),
+    how many callers are waiting on it, and whether its queries were cancelled out from
+    under it (a client disconnect - see AdmissionControlMiddleware). Callers that see a
+    cancelled flight fail run the call again instead of inheriting the error.
+    """
+    __slots__ = ('result', 'waiters', 'cancelled')
+    
+    def __init__(self, result=None):
+        self.result = result
+        self.waiters = 1
+        self.cancelled = False
+
+# The flight whose body is running in this context, so connections it checks out can be tagged
+current_flight: contextvars.ContextVar[Optional[_Flight]] = contextvars.ContextVar('current_flight', default=None)
+
+_inflight_sync: Dict[Hashable, _Flight] = {}
+_inflight_sync_lock = threading.Lock()
+_inflight_async: Dict[Hashable, _Flight] = {}
+
+def coalesced(key_fn: Callable[..., Hashable]):
+    """
+    Single-flight: concurrent calls whose key_fn(*args, **kwargs) match share one
+    execution and its result (or exception). Nothing is cached once the leader returns.
+    Works for sync helpers (threadpool handlers) and coroutines (event loop).
+    Results are shared objects - callers must not mutate them.
+    A coroutine runs in its own task: a cancelled caller only stops waiting, and the
+    task is cancelled when its last caller has gone. The task gets a fresh context, so
+    no caller's request-scoped state (statement timeout, replica routing, tracked
+    connections) leaks into work done on behalf of the others.
+    """
+    def decorator(fn):
+        name = fn.__name__
+        
+        if asyncio.iscoroutinefunction(fn):
+            async def run(flight: _Flight, args, kwargs):
+                current_flight.set(flight)
+                return await fn(*args, **kwargs)
+            
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                key = (name, key_fn(*args, **kwargs))
+                while True:
+                    flight = _inflight_async.get(key)
+                    if flight is None or flight.cancelled:
+                        flight = _Flight()
+                        flight.result = asyncio.get_running_loop().create_task(
+                            run(flight, args, kwargs), context=contextvars.Context()
+                        )
+                        _inflight_async[key] = flight
+                        flight.result.add_done_callback(
+                            lambda _, flight=flight: _inflight_async.get(key) is flight and _inflight_async.pop(key)
+                        )
+                    else:
+                        flight.waiters += 1
+                        coalesced_calls_total[name] = coalesced_calls_total.get(name, 0) + 1
+                    
+                    try:
+                        return await asyncio.shield(flight.result)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception:
+                        if not flight.cancelled:
+                            raise
+                    finally:
+                        flight.waiters -= 1
+                        if flight.waiters == 0 and not flight.result.done():
+                            if _inflight_async.get(key) is flight:
+                                del _inflight_async[key]
+                            flight.result.cancel()
+            return async_wrapper
+        
+        @functools.wraps(fn)
+        def sync_wrapper(*args, **kwargs):
+            key = (name, key_fn(*args, **kwargs))
+            while True:
+                with _inflight_sync_lock:
+                    flight = _inflight_sync.get(key)
+                    leader = flight is None or flight.cancelled
+                    if leader:
+                        flight = _Flight(concurrent.futures.Future())
+                        _inflight_sync[key] = flight
+                    else:
+                        flight.waiters += 1
+                        coalesced_calls_total[name] = coalesced_calls_total.get(name, 0) + 1
+                
+                if leader:
+                    token = current_flight.set(flight)
+                    try:
+                        result = fn(*args, **kwargs)
+                        flight.result.set_result(result)
+                        return result
+                    except BaseException as e:
+                        flight.result.set_exception(e)
+                        raise
+                    finally:
+                        current_flight.reset(token)
+                        with _inflight_sync_lock:
+                            flight.waiters -= 1
+                            if _inflight_sync.get(key) is flight:
+                                del _inflight_sync[key]
+                
+                try:
+                    return flight.result.result()
+                except Exception:
+                    if not flight.cancelled:
+                        raise
+                finally:
+                    with _inflight_sync_lock:
+                        flight.waiters -= 1
+        return sync_wrapper
+    return decorator
+
+# ─── ON-DEMAND PROFILER ──────────────────────────────────────────
+
+PROFILE_MAX_SECONDS = 60
+PROFILE_INTERVAL = 0.01  # 100 Hz
+profile_lock = threading.Lock()  # one capture at a time; nothing runs while idle
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+def sample_thread_stacks(seconds: float, interval: float, loop_thread_id: int) -> Tuple[Dict[str, Dict[Tuple[str, ...], int]], float]:
+    """
+    Wall-clock sampling of every Python thread via sys._current_frames().
+    Returns ({thread_name: {root-first stack: samples}}, elapsed). The thread running
+    the asyncio loop is labelled 'event-loop' so coroutine work is easy to pick out.
+    """
+    own_id = threading.get_ident()
+    stacks: Dict[str, Dict[Tuple[str, ...], int]] = {}
+    started = time.perf_counter()
+    deadline = started + seconds
+    
+    while time.perf_counter() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            if thread_id == loop_thread_id:
+                thread_name = 'event-loop'
+            else:
+                thread_name = names.get(thread_id, f"thread-{thread_id}")
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            key = tuple(reversed(stack))
+            per_thread = stacks.setdefault(thread_name, {})
+            per_thread[key] = per_thread.get(key, 0) + 1
+        time.sleep(interval)
+    
+    return stacks, time.perf_counter() - started
+
+def to_collapsed_stacks(stacks: Dict[str, Dict[Tuple[str, ...], int]]) -> str:
+    """Brendan Gregg collapsed format - feed to flamegraph.pl or speedscope"""
+    lines = []
+    for thread_name, per_thread in stacks.items():
+        for stack, count in per_thread.items():
+            frames = ";".join(f.replace(';', ':') for f in (thread_name,) + stack)
+            lines.append(f"{frames} {count}")
+    return "\n".join(sorted(lines)) + "\n"
+
+def to_speedscope(stacks: Dict[str, Dict[Tuple[str, ...], int]], elapsed: float, interval: float) -> Dict:
+    """speedscope.app sampled-profile file, one profile per thread"""
+    frame_index: Dict[str, int] = {}
+    profiles = []
+    for thread_name, per_thread in stacks.items():
+        samples, weights = [], []
+        for stack, count in per_thread.items():
+            samples.append([frame_index.setdefault(f, len(frame_index)) for f in stack])
+            weights.append(count * interval)
+        profiles.append({
+            'type': 'sampled',
+            'name': thread_name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': elapsed,
+            'samples': samples,
+            'weights': weights
+        })
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': [{'name': name} for name in frame_index]},
+        'profiles': profiles,
+        'name': f"unified-api {datetime.now(timezone.utc).isoformat()}",
+        'exporter': 'main.py /debug/profile'
+    }
+
 # ─── MODELS ──────────────────────────────────────────────────────
 
 class BlockTrade(BaseModel):
@@ -79,6 +579,21 @@ class BlockTrade(BaseModel):
     trade_time: datetime
     conditions: Optional[List[int]] = None
 
+class DailySummary(BaseModel):
+    ticker: str
+    trade_day: date
+    session: str  # 'premarket', 'regular' or 'afterhours'
+    trade_count: int
+    total_volume: int
+    total_notional: float
+    vwap: Optional[float] = None
+
+class ListingDayTotal(BaseModel):
+    trade_day: date  # New York
+    trade_count: int
+    total_volume: int
+    total_notional: float
+
 class Level(BaseModel):
     ticker: str
     level_price: float
@@ -88,6 +603,18 @@ class Level(BaseModel):
 class LinkJobRequest(BaseModel):
     level_id: int
 
+class VolumeBand(BaseModel):
+    level_id: int
+    level_price: float
+    price_tolerance: float = 0.025
+
+class BatchVolumeJobRequest(BaseModel):
+    start_date: str
+    end_date: str
+    bands: List[VolumeBand]
+    is_absorption: bool = False
+    priority: Optional[int] = None  # default JOB_PRIORITIES['batch'] - below interactive jobs
+
 class MarketVolumeResponse(BaseModel):
     total_volume: int
     total_value: float
@@ -116,85 +643,167 @@ class JobSegment(BaseModel):
 
 # ─── ENHANCED JOB PERSISTENCE FUNCTIONS ──────────────────────────
 
+# Every job write NOTIFYs this channel with the job_id; other workers drop their cached copy
+JOB_CHANNEL = 'background_jobs'
+JOB_LISTENER_CHECK_SECONDS = 10
+
+# Jobs running in this worker - their cache entry is the live copy and is never evicted
+_local_jobs: set = set()
+job_listener_connected = False
+
 async def save_job_to_db(job_id: str, job_data: Dict):
     """Save job to database with enhanced tracking"""
     if sd_db_pool is None:
         return
         
-    async with sd_db_pool.acquire() as conn:
+    async with acquire_sd_connection(primary=True) as conn:
         # Convert result to JSON string if it exists
         result_json = None
         if job_data.get('result'):
             result_json = json.dumps(job_data.get('result'))
         
-        # Enhanced job saving with new fields
-        await conn.execute(
-            """
-            INSERT INTO background_jobs 
-            (job_id, ticker, level_price, level_id, date_range, status, progress, 
-             created_at, result_data, enhancement, api_calls_used, is_absorption)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
-            ON CONFLICT (job_id) DO UPDATE SET
-            status = $6, progress = $7, result_data = $9, enhancement = $10,
-            api_calls_used = $11, is_absorption = $12,
-            completed_at = CASE WHEN $6 = 'completed' THEN NOW() ELSE background_jobs.completed_at END
-            """,
-            job_id,
-            job_data.get('ticker'),
-            job_data.get('level_price'),
-            job_data.get('level_id'),
-            job_data.get('date_range'),
-            job_data.get('status'),
-            job_data.get('progress', 0),
-            datetime.fromisoformat(job_data.get('created_at', datetime.now().isoformat())),
-            result_json,
-            job_data.get('enhancement', 'standard'),
-            job_data.get('api_calls_used', 0),
-            job_data.get('is_absorption', False)
-        )
+        async with conn.transaction():
+            # Enhanced job saving with new fields; job_state holds the full document
+            # (availability, estimates...) so any worker can serve /jobs/{id}/status
+            await conn.execute(
+                """
+                INSERT INTO background_jobs 
+                (job_id, ticker, level_price, level_id, date_range, status, progress, 
+                 created_at, result_data, enhancement, api_calls_used, is_absorption,
+                 error_message, job_state)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
+                ON CONFLICT (job_id) DO UPDATE SET
+                status = $6, progress = $7, result_data = $9, enhancement = $10,
+                api_calls_used = $11, is_absorption = $12, error_message = $13, job_state = $14,
+                completed_at = CASE WHEN $6 = 'completed' THEN NOW() ELSE background_jobs.completed_at END
+                """,
+                job_id,
+                job_data.get('ticker'),
+                job_data.get('level_price'),
+                job_data.get('level_id'),
+                job_data.get('date_range'),
+                job_data.get('status'),
+                job_data.get('progress', 0),
+                datetime.fromisoformat(job_data.get('created_at', datetime.now().isoformat())),
+                result_json,
+                job_data.get('enhancement', 'standard'),
+                job_data.get('api_calls_used', 0),
+                job_data.get('is_absorption', False),
+                job_data.get('error'),
+                json.dumps(job_data, default=str)
+            )
+            # Delivered on commit, after the row is visible
+            await conn.execute("SELECT pg_notify($1, $2)", JOB_CHANNEL, job_id)
+
+def job_from_row(row) -> Dict:
+    """Rebuild the in-memory job document from a background_jobs row"""
+    if row.get('job_state'):
+        return json.loads(row['job_state'])
+    
+    # Rows written before job_state existed
+    job_data = {
+        'job_id': row['job_id'],
+        'ticker': row['ticker'],
+        'level_price': float(row['level_price']) if row['level_price'] else None,
+        'level_id': row['level_id'],
+        'date_range': row['date_range'],
+        'status': row['status'],
+        'progress': row['progress'],
+        'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+        'enhancement': row.get('enhancement', 'standard'),
+        'api_calls_used': row.get('api_calls_used', 0),
+        'is_absorption': row.get('is_absorption', False)
+    }
+    
+    # Parse result_data JSON if it exists
+    if row['result_data']:
+        try:
+            job_data['result'] = json.loads(row['result_data'])
+        except (json.JSONDecodeError, TypeError):
+            job_data['result'] = None
+    
+    if row['error_message']:
+        job_data['error'] = row['error_message']
+    return job_data
 
 async def load_jobs_from_db():
     """Load existing jobs from database into memory"""
     if sd_db_pool is None:
         return
         
-    async with sd_db_pool.acquire() as conn:
+    async with acquire_sd_connection() as conn:
         rows = await conn.fetch("SELECT * FROM background_jobs ORDER BY created_at DESC LIMIT 100")
         
         for row in rows:
-            job_data = {
-                'job_id': row['job_id'],
-                'ticker': row['ticker'],
-                'level_price': float(row['level_price']) if row['level_price'] else None,
-                'level_id': row['level_id'],
-                'date_range': row['date_range'],
-                'status': row['status'],
-                'progress': row['progress'],
-                'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                'enhancement': row.get('enhancement', 'standard'),
-                'api_calls_used': row.get('api_calls_used', 0),
-                'is_absorption': row.get('is_absorption', False)
-            }
-            
-            # Parse result_data JSON if it exists
-            if row['result_data']:
-                try:
-                    job_data['result'] = json.loads(row['result_data'])
-                except (json.JSONDecodeError, TypeError):
-                    job_data['result'] = None
-            
-            if row['error_message']:
-                job_data['error'] = row['error_message']
-                
-            jobs_db[row['job_id']] = job_data
+            jobs_db[row['job_id']] = job_from_row(row)
         
         logger.info(f"Loaded {len(rows)} jobs from database")
 
+async def get_job(job_id: str) -> Optional[Dict]:
+    """Read-through: this worker's cache, else the primary (a job started on another worker)"""
+    job = jobs_db.get(job_id)
+    if job is not None or sd_db_pool is None:
+        return job
+    
+    # Primary, not a replica - a job created a moment ago may not have replayed yet
+    async with acquire_sd_connection(primary=True) as conn:
+        row = await conn.fetchrow("SELECT * FROM background_jobs WHERE job_id = $1", job_id)
+    if row is None:
+        return None
+    job = job_from_row(row)
+    cache_job(job_id, job)
+    return job
+
+def cache_job(job_id: str, job: Dict):
+    """Cache a job this worker isn't running - only while notifications can invalidate it"""
+    if job_listener_connected:
+        jobs_db[job_id] = job
+
 async def update_job_in_db(job_id: str):
     """Update job status in database"""
     if job_id in jobs_db:
         await save_job_to_db(job_id, jobs_db[job_id])
 
+def _on_job_notification(connection, pid, channel, job_id):
+    if job_id not in _local_jobs:
+        jobs_db.pop(job_id, None)
+
+def evict_remote_jobs():
+    """Drop every cached job this worker isn't running itself"""
+    for job_id in [j for j in jobs_db if j not in _local_jobs]:
+        del jobs_db[job_id]
+
+async def listen_for_job_changes():
+    """
+    Dedicated LISTEN connection (pooled connections are reset on release, which drops LISTENs).
+    While it is down nothing is cached, so a missed NOTIFY can't leave a stale status behind.
+    """
+    global job_listener_connected
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(
+                host=SD_DB_HOST, port=SD_DB_PORT, user=SD_DB_USER,
+                password=SD_DB_PASS, database=SD_DB_NAME
+            )
+            await conn.add_listener(JOB_CHANNEL, _on_job_notification)
+            evict_remote_jobs()  # anything cached before LISTEN took effect may be stale
+            job_listener_connected = True
+            logger.info(f"Listening for job changes on '{JOB_CHANNEL}'")
+            while True:
+                await asyncio.sleep(JOB_LISTENER_CHECK_SECONDS)
+                await conn.execute("SELECT 1")  # surfaces a dead connection
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Job listener disconnected, retrying: {e}")
+        finally:
+            job_listener_connected = False
+            evict_remote_jobs()
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(JOB_LISTENER_CHECK_SECONDS)
+
 # ─── DATABASE CONNECTION POOLS ───────────────────────────────────
 
 async def init_darkpool_db_pool():
@@ -202,7 +811,7 @@ async def init_darkpool_db_pool():
     global darkpool_db_pool
     try:
         darkpool_db_pool = psycopg2.pool.SimpleConnectionPool(
-            minconn=1, maxconn=10,
+            minconn=1, maxconn=per_worker(10),
             dbname=DARKPOOL_DB_NAME,
             user=DARKPOOL_DB_USER,
             password=DARKPOOL_DB_PASS,
@@ -224,8 +833,8 @@ async def init_sd_db_pool():
             user=SD_DB_USER,
             password=SD_DB_PASS,
             database=SD_DB_NAME,
-            min_size=5,
-            max_size=25  # Increased for enhanced functionality
+            min_size=min(5, per_worker(25)),
+            max_size=per_worker(25)  # Increased for enhanced functionality
         )
         logger.info(f"Enhanced SD DB pool initialized: {SD_DB_NAME}")
         
@@ -241,7 +850,7 @@ async def init_sd_sync_pool():
     global sd_sync_pool
     try:
         sd_sync_pool = psycopg2.pool.SimpleConnectionPool(
-            minconn=3, maxconn=12,  # Increased for better performance
+            minconn=min(3, per_worker(12)), maxconn=per_worker(12),  # Increased for better performance
             dbname=SD_DB_NAME,
             user=SD_DB_USER,
             password=SD_DB_PASS,
@@ -253,6 +862,71 @@ async def init_sd_sync_pool():
         logger.error(f"Failed to initialize SD sync pool: {e}")
         raise
 
+async def init_replica_pools():
+    """Optional read-only pools; an unreachable replica is logged and left unused"""
+    global darkpool_replica_pool, sd_replica_pool
+    if DARKPOOL_REPLICA_DSN:
+        try:
+            darkpool_replica_pool = psycopg2.pool.SimpleConnectionPool(minconn=1, maxconn=per_worker(10), dsn=DARKPOOL_REPLICA_DSN)
+            replica_status['darkpool']['configured'] = True
+            logger.info("Darkpool replica pool initialized")
+        except Exception as e:
+            logger.warning(f"Darkpool replica unavailable, reads stay on the primary: {e}")
+    
+    if SD_REPLICA_DSN:
+        try:
+            sd_replica_pool = await asyncpg.create_pool(dsn=SD_REPLICA_DSN, min_size=2, max_size=per_worker(25))
+            replica_status['sd']['configured'] = True
+            logger.info("SD replica pool initialized")
+        except Exception as e:
+            logger.warning(f"SD replica unavailable, reads stay on the primary: {e}")
+
+def _darkpool_replica_lag() -> Optional[float]:
+    conn = darkpool_replica_pool.getconn()
+    broken = False
+    try:
+        with conn.cursor() as cur:
+            cur.execute(REPLICA_LAG_QUERY)
+            return cur.fetchone()[0]
+    except psycopg2.Error:
+        broken = conn.closed != 0
+        raise
+    finally:
+        if not conn.closed:
+            conn.rollback()
+        darkpool_replica_pool.putconn(conn, close=broken)
+
+async def check_replica_lag(database: str):
+    """Refresh replica_status[database]; any failure routes reads back to the primary"""
+    try:
+        if database == 'darkpool':
+            lag = await asyncio.to_thread(_darkpool_replica_lag)
+        else:
+            lag = await sd_replica_pool.fetchval(REPLICA_LAG_QUERY)
+    except Exception as e:
+        logger.warning(f"Replica lag check failed for {database}: {e}")
+        lag = None
+    
+    status = replica_status[database]
+    healthy = lag is not None and lag <= REPLICA_MAX_LAG_SECONDS
+    if healthy != status['healthy']:
+        if healthy:
+            logger.info(f"📖 {database} replica caught up ({lag:.1f}s) - routing reads to it")
+        elif lag is None:
+            logger.warning(f"⚠️ {database} replica unreachable - reads fall back to primary")
+        else:
+            logger.warning(f"⚠️ {database} replica lag {lag:.1f}s over {REPLICA_MAX_LAG_SECONDS}s - reads fall back to primary")
+    status['healthy'] = healthy
+    status['lag_seconds'] = lag
+
+async def monitor_replica_lag():
+    """Background loop started by lifespan when at least one replica is configured"""
+    while True:
+        for database, status in replica_status.items():
+            if status['configured']:
+                await check_replica_lag(database)
+        await asyncio.sleep(REPLICA_LAG_CHECK_SECONDS)
+
 async def close_db_pools():
     """Close all database connection pools"""
     global darkpool_db_pool, sd_db_pool, sd_sync_pool
@@ -268,28 +942,112 @@ async def close_db_pools():
     if sd_sync_pool:
         sd_sync_pool.closeall()
         logger.info("SD sync pool closed")
+    
+    if darkpool_replica_pool:
+        darkpool_replica_pool.closeall()
+        logger.info("Darkpool replica pool closed")
+    
+    if sd_replica_pool:
+        await sd_replica_pool.close()
+        logger.info("SD replica pool closed")
+
+# psycopg2 connections can't carry attributes; checkout times are tracked by id(conn)
+_checkout_times: Dict[int, float] = {}
+_replica_checkouts: set = set()  # ids of darkpool connections borrowed from the replica pool
+
+def _timed_getconn(pool: psycopg2.pool.SimpleConnectionPool, pool_name: str):
+    started = time.perf_counter()
+    conn = pool.getconn()
+    acquired = time.perf_counter()
+    _checkout_times[id(conn)] = acquired
+    record_pool_wait(pool_name, acquired - started)
+    return conn
+
+def _timed_putconn(pool: psycopg2.pool.SimpleConnectionPool, pool_name: str, conn):
+    acquired = _checkout_times.pop(id(conn), None)
+    if acquired is not None:
+        record_pool_exec(pool_name, time.perf_counter() - acquired)
+    pool.putconn(conn)
 
 def get_darkpool_connection():
-    """Get connection from darkpool database pool"""
+    """Get connection from darkpool database pool (with the route's statement timeout applied)"""
     if not darkpool_db_pool:
         raise RuntimeError("Darkpool connection pool not initialized")
-    return darkpool_db_pool.getconn()
+    if use_replica('darkpool'):
+        conn = _timed_getconn(darkpool_replica_pool, 'darkpool_replica')
+        _replica_checkouts.add(id(conn))
+    else:
+        conn = _timed_getconn(darkpool_db_pool, 'darkpool')
+    
+    active = request_active_connections.get()
+    if active is not None:
+        with _active_connections_lock:
+            active[conn] = current_flight.get()
+    
+    timeout = request_statement_timeout.get()
+    if timeout:
+        try:
+            with conn.cursor() as cur:
+                # LOCAL: ends with the transaction that release_darkpool_connection rolls back
+                cur.execute("SET LOCAL statement_timeout = %s", (int(timeout * 1000),))
+        except Exception:
+            release_darkpool_connection(conn)
+            raise
+    return conn
 
 def release_darkpool_connection(conn):
     """Release connection back to darkpool pool"""
     if darkpool_db_pool and conn:
-        darkpool_db_pool.putconn(conn)
+        active = request_active_connections.get()
+        if active is not None:
+            with _active_connections_lock:
+                active.pop(conn, None)
+        try:
+            # Read-only pool: end the implicit transaction instead of leaving it idle-in-transaction
+            if not conn.closed:
+                conn.rollback()
+        except psycopg2.Error as e:
+            logger.warning(f"Rollback on release failed: {e}")
+        if id(conn) in _replica_checkouts:
+            _replica_checkouts.discard(id(conn))
+            _timed_putconn(darkpool_replica_pool, 'darkpool_replica', conn)
+        else:
+            _timed_putconn(darkpool_db_pool, 'darkpool', conn)
 
 def get_sd_sync_connection():
     """Get synchronous connection for batch operations"""
     if not sd_sync_pool:
         raise RuntimeError("SD sync connection pool not initialized")
-    return sd_sync_pool.getconn()
+    return _timed_getconn(sd_sync_pool, 'sd_sync')
 
 def release_sd_sync_connection(conn):
     """Release connection back to SD sync pool"""
     if sd_sync_pool and conn:
-        sd_sync_pool.putconn(conn)
+        _timed_putconn(sd_sync_pool, 'sd_sync', conn)
+
+@asynccontextmanager
+async def acquire_sd_connection(primary: bool = False):
+    """
+    sd_db_pool.acquire() with pool-wait and held-time instrumentation.
+    GET requests read from the replica while it is healthy; pass primary=True for writes.
+    """
+    if sd_db_pool is None:
+        raise RuntimeError("SD database pool not initialized")
+    pool, pool_name = sd_db_pool, 'sd_async'
+    if not primary and use_replica('sd'):
+        pool, pool_name = sd_replica_pool, 'sd_async_replica'
+    started = time.perf_counter()
+    async with pool.acquire() as conn:
+        acquired = time.perf_counter()
+        record_pool_wait(pool_name, acquired - started)
+        timeout = request_statement_timeout.get()
+        if timeout:
+            # Session-level SET is undone by the pool's RESET ALL on release
+            await conn.execute(f"SET statement_timeout = {int(timeout * 1000)}")
+        try:
+            yield conn
+        finally:
+            record_pool_exec(pool_name, time.perf_counter() - acquired)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -298,31 +1056,322 @@ async def lifespan(app: FastAPI):
     await init_darkpool_db_pool()
     await init_sd_db_pool()
     await init_sd_sync_pool()
+    await init_replica_pools()
+    await sync_level_mirror()
+    job_listener = asyncio.create_task(listen_for_job_changes())
+    job_workers = None
+    if JOB_RUNNER == 'inline':
+        job_workers = asyncio.create_task(run_job_workers(per_worker(JOB_CONCURRENCY, floor=1)))
+    lag_monitor = None
+    if any(status['configured'] for status in replica_status.values()):
+        lag_monitor = asyncio.create_task(monitor_replica_lag())
     yield
     # Shutdown
     logger.info("🔄 Enhanced Unified FastAPI server shutting down...")
+    job_listener.cancel()
+    if lag_monitor:
+        lag_monitor.cancel()
+    if job_workers:
+        job_workers.cancel()
+        try:
+            await job_workers  # running jobs are handed back to the queue first
+        except asyncio.CancelledError:
+            pass
     await close_db_pools()
+    shutdown_cpu_pool()
 
-# ─── ORIGINAL DARKPOOL FUNCTIONS (UNCHANGED) ─────────────────────
+# ─── FAST SERIALIZATION ──────────────────────────────────────────
 
-def get_dynamic_threshold(ticker: str, percentile: float, table_name: str) -> float:
-    """Get dynamic threshold from darkpool database (UNCHANGED)"""
-    if table_name not in ('block_trades', 'lit_trades'):
-        raise ValueError("Invalid table name")
+# 'json' is the validated response_model path; the others skip Pydantic entirely
+FORMAT_PATTERN = "^(json|fast|columnar|msgpack)$"
+TRADE_FIELDS = ('ticker', 'quantity', 'price', 'trade_value', 'trade_time', 'conditions')
+
+def dumps_json(payload: Any) -> bytes:
+    """orjson when installed (native datetime support), stdlib json otherwise"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=lambda v: v.isoformat()).encode()
+
+def trades_payload(rows: List[tuple], fmt: str) -> Any:
+    """
+    Build the fast-path payload from raw cursor tuples (no RealDictRows, no BlockTrade validation).
+    fast     - same JSON shape as the default response
+    columnar - {field: [values...]} arrays per field
+    msgpack  - columnar payload with trade_time as ISO strings
+    Extra trailing columns (keyset id/cursor_time) are ignored.
+    """
+    if fmt == 'fast':
+        return [dict(zip(TRADE_FIELDS, row)) for row in rows]
     
-    conn = get_darkpool_connection()
-    try:
-        sql = f"""
+    columns = list(zip(*rows)) if rows else [()] * len(TRADE_FIELDS)
+    payload = {field: list(columns[i]) for i, field in enumerate(TRADE_FIELDS)}
+    if fmt == 'msgpack':
+        payload['trade_time'] = [t.isoformat() for t in payload['trade_time']]
+    return payload
+
+def encode_fast_payload(payload: Any, fmt: str) -> Response:
+    """Encode a trades_payload (or a dict of them) for the requested format"""
+    if fmt == 'msgpack':
+        if not MSGPACK_AVAILABLE:
+            raise HTTPException(status_code=400, detail="msgpack format requires the msgpack package on the server")
+        return Response(msgpack.packb(payload), media_type="application/msgpack")
+    return Response(dumps_json(payload), media_type="application/json")
+
+def fast_trades_response(rows: List[tuple], fmt: str) -> Response:
+    """Serialize raw cursor tuples for the non-default formats"""
+    return encode_fast_payload(trades_payload(rows, fmt), fmt)
+
+# ─── PREPARED STATEMENT REGISTRY ─────────────────────────────────
+
+# Hot darkpool SQL as named, parameterized statements. Each one is PREPAREd the first
+# time a pooled connection runs it and EXECUTEd by name afterwards, so the text never
+# varies with filters and the planner can settle on a cached generic plan.
+# (The SD handlers need no registry: asyncpg already prepares and caches every
+# $n statement per connection.)
+
+@dataclass(frozen=True)
+class PreparedStatement:
+    name: str
+    arg_types: Tuple[str, ...]
+    sql: str
+
+PREPARED_STATEMENTS: Dict[str, PreparedStatement] = {}
+
+# connection -> names already prepared on it; entries vanish when the pool drops the connection
+_prepared_on_connection: "weakref.WeakKeyDictionary[Any, set]" = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+def register_statement(name: str, arg_types: Tuple[str, ...], sql: str) -> str:
+    """Add a statement to the registry; returns its name"""
+    if name in PREPARED_STATEMENTS:
+        raise ValueError(f"Duplicate prepared statement: {name}")
+    PREPARED_STATEMENTS[name] = PreparedStatement(name, tuple(arg_types), sql)
+    return name
+
+def execute_prepared(cur, name: str, params: Tuple = ()):
+    """EXECUTE a registry statement on cur, preparing it on this connection first if needed"""
+    statement = PREPARED_STATEMENTS[name]
+    with _prepared_lock:
+        prepared = _prepared_on_connection.setdefault(cur.connection, set())
+    
+    if name not in prepared:
+        # PREPARE is session-level - it survives the rollback in release_darkpool_connection
+        arg_list = f" ({', '.join(statement.arg_types)})" if statement.arg_types else ""
+        cur.execute(f"PREPARE {name}{arg_list} AS {statement.sql}")
+        prepared.add(name)
+        statement_prepares_total[name] = statement_prepares_total.get(name, 0) + 1
+    
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
+
+# Per-ticker listing SQL shared by the paged and streaming paths
+# Column order must match TRADE_FIELDS - the fast serializers index rows positionally
+TRADE_SELECT_COLUMNS = """
+              ticker, quantity, price::float, trade_value::float,
+              (trade_time AT TIME ZONE 'America/New_York') AS trade_time,
+              conditions"""
+
+SESSION_FILTERS = {
+    'all': "",
+    'market_hours': " AND (trade_time AT TIME ZONE 'America/New_York')::time BETWEEN '09:30:00' AND '16:00:00'",
+    'off_hours': " AND (trade_time AT TIME ZONE 'America/New_York')::time NOT BETWEEN '09:30:00' AND '16:00:00'",
+}
+
+DARKPOOL_TABLES = ('block_trades', 'lit_trades')
+DAILY_VIEWS = ('block_trades_daily', 'lit_trades_daily')
+
+def threshold_statement(table_name: str) -> str:
+    return f"{table_name}_threshold"
+
+def page_statement(table_name: str, session: str, after_cursor: bool) -> str:
+    return f"{table_name}_page_{session}{'_after' if after_cursor else ''}"
+
+def batch_statement(table_name: str, session: str, with_percentile: bool) -> str:
+    return f"{table_name}_batch_{session}{'_pct' if with_percentile else ''}"
+
+def big_prints_statement(table_name: str) -> str:
+    return f"{table_name}_big_prints"
+
+def daily_summary_statement(view_name: str) -> str:
+    return f"{view_name}_summary"
+
+def day_totals_statement(table_name: str, session: str) -> str:
+    return f"{table_name}_day_totals_{session}"
+
+def version_statement(table_name: str, scope: str) -> str:
+    return f"{table_name}_version_{scope}"
+
+def level_prints_statement(table_name: str) -> str:
+    return f"{table_name}_level_prints"
+
+def register_darkpool_statements():
+    """Build the darkpool statement registry (one statement per table/session/variant)"""
+    for table_name in DARKPOOL_TABLES:
+        register_statement(threshold_statement(table_name), ('text', 'float8'), f"""
             WITH recent AS (
                 SELECT trade_value::float FROM {table_name}
-                WHERE ticker = %s
+                WHERE ticker = $1
                 ORDER BY trade_time DESC
                 LIMIT {RECENT_TRADES_FOR_PCT}
             )
-            SELECT percentile_cont(%s) WITHIN GROUP (ORDER BY trade_value) FROM recent;
-        """
+            SELECT percentile_cont($2) WITHIN GROUP (ORDER BY trade_value) FROM recent""")
+        
+        # Two big-print filters as boolean parameters instead of four SQL texts
+        register_statement(big_prints_statement(table_name), ('timestamptz', 'timestamptz', 'boolean', 'boolean'), f"""
+            SELECT{TRADE_SELECT_COLUMNS}
+            FROM {table_name}
+            WHERE trade_time BETWEEN $1 AND $2
+              AND (NOT $3 OR trade_value < 400000000)
+              AND (NOT $4 OR (trade_time AT TIME ZONE 'America/New_York')::time BETWEEN '09:30:00' AND '16:00:00')
+            ORDER BY trade_value DESC LIMIT 300""")
+        
+        # ETag stamps: newest print and newest id. Backfilled rows are older than the newest
+        # print but still take a fresh id. Each max is a single backwards step on an index.
+        register_statement(version_statement(table_name, 'ticker'), ('text',),
+                           f"SELECT max(trade_time) || ':' || max(id) FROM {table_name} WHERE ticker = $1")
+        register_statement(version_statement(table_name, 'tickers'), ('text[]',), f"""
+            SELECT max(m.latest) || ':' || max(m.last_id)
+            FROM unnest($1) AS u(ticker)
+            CROSS JOIN LATERAL (
+                SELECT max(trade_time) AS latest, max(id) AS last_id FROM {table_name} WHERE ticker = u.ticker
+            ) m""")
+        register_statement(version_statement(table_name, 'all'), (),
+                           f"SELECT max(trade_time) || ':' || max(id) FROM {table_name}")
+        
+        # Prints inside each mirrored level's band: one (ticker, price, trade_time) index
+        # range per level instead of a client-side loop over every print
+        band_filter = f"""
+                WHERE b.ticker = l.ticker
+                  AND b.price BETWEEN l.level_price * (1 - $2) AND l.level_price * (1 + $2)
+                  AND b.trade_time >= $3 AND b.trade_time < $4
+                  AND b.trade_value >= $5"""
+        register_statement(level_prints_statement(table_name),
+                           ('text', 'numeric', 'timestamptz', 'timestamptz', 'numeric', 'bigint'), f"""
+            SELECT l.level_id, l.level_price::float AS level_price, l.level_type, l.level_name,
+                   totals.print_count, totals.total_volume, totals.total_notional,
+                   recent.prints
+            FROM sd_level_bands l
+            CROSS JOIN LATERAL (
+                SELECT count(*) AS print_count,
+                       COALESCE(sum(b.quantity), 0)::bigint AS total_volume,
+                       COALESCE(sum(b.trade_value), 0)::float AS total_notional
+                FROM {table_name} b{band_filter}
+            ) totals
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(json_agg(json_build_object(
+                           'ticker', p.ticker, 'quantity', p.quantity, 'price', p.price::float,
+                           'trade_value', p.trade_value::float,
+                           'trade_time', p.trade_time AT TIME ZONE 'America/New_York',
+                           'conditions', p.conditions
+                       ) ORDER BY p.trade_time DESC), '[]'::json) AS prints
+                FROM (
+                    SELECT b.ticker, b.quantity, b.price, b.trade_value, b.trade_time, b.conditions
+                    FROM {table_name} b{band_filter}
+                    ORDER BY b.trade_time DESC
+                    LIMIT $6
+                ) p
+            ) recent
+            WHERE l.ticker = $1
+            ORDER BY l.level_price DESC""")
+        
+        for session, session_filter in SESSION_FILTERS.items():
+            # First page and next page stay separate statements: folding the cursor into a
+            # nullable parameter would hide the trade_time bound from chunk exclusion.
+            page_sql = f"""
+            SELECT{TRADE_SELECT_COLUMNS},
+              id, trade_time AS cursor_time
+            FROM {table_name}
+            WHERE ticker = $1 AND trade_value >= $2{session_filter}{{keyset_filter}}
+            ORDER BY trade_time DESC, id DESC LIMIT {{limit}}"""
+            register_statement(page_statement(table_name, session, False), ('text', 'numeric', 'bigint'),
+                               page_sql.format(keyset_filter="", limit="$3"))
+            register_statement(page_statement(table_name, session, True),
+                               ('text', 'numeric', 'timestamptz', 'bigint', 'bigint'),
+                               page_sql.format(keyset_filter=" AND trade_time <= $3 AND (trade_time, id) < ($3, $4)",
+                                               limit="$5"))
+            
+            # Day totals over exactly the rows the listing pages through (same floor and session)
+            register_statement(day_totals_statement(table_name, session), ('text', 'numeric', 'date', 'date'), f"""
+            SELECT
+              (trade_time AT TIME ZONE 'America/New_York')::date AS trade_day,
+              count(*) AS trade_count,
+              sum(quantity)::bigint AS total_volume,
+              sum(trade_value)::float AS total_notional
+            FROM {table_name}
+            WHERE ticker = $1 AND trade_value >= $2{session_filter}
+              AND trade_time >= ($3::timestamp AT TIME ZONE 'America/New_York')
+              AND trade_time < (($4 + 1)::timestamp AT TIME ZONE 'America/New_York')
+            GROUP BY 1
+            ORDER BY 1 DESC""")
+            
+            threshold_sqls = {
+                False: "SELECT t.ticker, $2::float AS floor FROM tickers t",
+                True: f"""
+                SELECT t.ticker, COALESCE(p.floor, $2) AS floor
+                FROM tickers t
+                LEFT JOIN LATERAL (
+                    SELECT percentile_cont($4) WITHIN GROUP (ORDER BY r.trade_value) AS floor
+                    FROM (
+                        SELECT trade_value::float FROM {table_name} x
+                        WHERE x.ticker = t.ticker
+                        ORDER BY x.trade_time DESC
+                        LIMIT {RECENT_TRADES_FOR_PCT}
+                    ) r
+                ) p ON true""",
+            }
+            for with_percentile, threshold_sql in threshold_sqls.items():
+                arg_types = ('text[]', 'float8', 'bigint') + (('float8',) if with_percentile else ())
+                register_statement(batch_statement(table_name, session, with_percentile), arg_types, f"""
+            WITH tickers AS (
+                SELECT DISTINCT ticker FROM unnest($1) AS u(ticker)
+            ),
+            thresholds AS ({threshold_sql}
+            )
+            SELECT trades.*
+            FROM thresholds th
+            CROSS JOIN LATERAL (
+                SELECT{TRADE_SELECT_COLUMNS},
+                  b.trade_time AS sort_time, b.id
+                FROM {table_name} b
+                WHERE b.ticker = th.ticker AND b.trade_value >= th.floor{session_filter}
+                ORDER BY b.trade_time DESC, b.id DESC
+                LIMIT $3
+            ) trades
+            ORDER BY trades.ticker, trades.sort_time DESC, trades.id DESC""")
+    
+    for view_name in DAILY_VIEWS:
+        register_statement(daily_summary_statement(view_name), ('text', 'date', 'text'), f"""
+            SELECT
+              ticker,
+              (trade_day AT TIME ZONE 'America/New_York')::date AS trade_day,
+              session, trade_count, total_volume,
+              total_notional::float,
+              (total_notional / NULLIF(total_volume, 0))::float AS vwap
+            FROM {view_name}
+            WHERE ticker = $1
+              AND trade_day >= ($2::timestamp AT TIME ZONE 'America/New_York')
+              AND ($3::text IS NULL OR session = $3)
+            ORDER BY trade_day DESC, session""")
+
+register_darkpool_statements()
+
+# ─── DARKPOOL QUERIES (prepared statements, coalesced) ───────────
+
+@coalesced(lambda ticker, percentile, table_name: (table_name, ticker.upper(), percentile))
+def get_dynamic_threshold(ticker: str, percentile: float, table_name: str) -> float:
+    """
+    Percentile of trade value for ticker in table_name via its prepared threshold statement,
+    or DEFAULT_MIN_VALUE when there are no trades. Concurrent identical calls share one query.
+    """
+    if table_name not in DARKPOOL_TABLES:
+        raise ValueError("Invalid table name")
+    
+    conn = get_darkpool_connection()
+    try:
         with conn.cursor() as cur:
-            cur.execute(sql, (ticker.upper(), percentile))
+            execute_prepared(cur, threshold_statement(table_name), (ticker.upper(), percentile))
             row = cur.fetchone()
             if row and row[0] is not None:
                 return row[0]
@@ -330,45 +1379,564 @@ def get_dynamic_threshold(ticker: str, percentile: float, table_name: str) -> fl
         release_darkpool_connection(conn)
     return DEFAULT_MIN_VALUE
 
-def big_prints_query(table_name: str, days: int, under_400m: bool = False, market_hours_only: bool = False):
-    """Big prints query from darkpool database (UNCHANGED)"""
-    now_ny = datetime.now(NY_TZ)
-    end_of_today_ny = now_ny.replace(hour=23, minute=59, second=59, microsecond=999999)
-    start_date_ny = (now_ny - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
-    start_utc = start_date_ny.astimezone(timezone.utc)
-    end_utc = end_of_today_ny.astimezone(timezone.utc)
+def encode_trade_cursor(trade_time: datetime, trade_id: int) -> str:
+    """Opaque keyset cursor for (trade_time, id)"""
+    raw = f"{trade_time.isoformat()}|{trade_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_trade_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Inverse of encode_trade_cursor; raises ValueError on malformed input. Anything a
+    real cursor can't hold (a naive time, an id outside bigint) is rejected here, so
+    a tampered cursor is a 400 rather than a database error.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        time_part, id_part = raw.rsplit('|', 1)
+        cursor_time, cursor_id = datetime.fromisoformat(time_part), int(id_part)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if cursor_time.tzinfo is None or not 0 < cursor_id < 2 ** 63:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return cursor_time, cursor_id
+
+@coalesced(lambda table_name, ticker, floor, session, limit=DEFAULT_PAGE_SIZE, cursor=None, raw=False:
+           (table_name, ticker.upper(), floor, session, limit, cursor, raw))
+def ticker_trades_query(table_name: str, ticker: str, floor: float, session: str,
+                        limit: int = DEFAULT_PAGE_SIZE,
+                        cursor: Optional[str] = None, raw: bool = False) -> Tuple[List, Optional[str]]:
+    """
+    One keyset page of a ticker's trades, newest first.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    raw=True returns plain tuples in TRADE_FIELDS order for the fast serializers.
+    """
+    if table_name not in DARKPOOL_TABLES:
+        raise ValueError("Invalid table name")
+    
+    params: List[Any] = [ticker.upper(), floor]
+    if cursor:
+        cursor_time, cursor_id = decode_trade_cursor(cursor)
+        # The redundant trade_time bound lets chunk exclusion and compressed-batch
+        # min/max metadata prune; the row comparison alone is not pushed down.
+        params.extend([cursor_time, cursor_id])
+    params.append(limit)
     
-    additional_filter = ""
-    if under_400m:
-        additional_filter += " AND trade_value < 400000000"
+    conn = get_darkpool_connection()
+    try:
+        with conn.cursor(cursor_factory=None if raw else RealDictCursor) as cur:
+            execute_prepared(cur, page_statement(table_name, session, bool(cursor)), tuple(params))
+            rows = cur.fetchall()
+    finally:
+        release_darkpool_connection(conn)
     
-    if market_hours_only:
-        additional_filter += " AND (trade_time AT TIME ZONE 'America/New_York')::time BETWEEN '09:30:00' AND '16:00:00'"
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        if raw:
+            next_cursor = encode_trade_cursor(last[-1], last[-2])
+        else:
+            next_cursor = encode_trade_cursor(last['cursor_time'], last['id'])
+    return rows, next_cursor
+
+def stream_ticker_trades(table_name: str, ticker: str, floor: float, session: str) -> Iterator[bytes]:
+    """
+    NDJSON over a server-side (named) cursor - the full history is never held in memory.
+    Holds one pool connection until the client finishes reading.
+    """
+    if table_name not in DARKPOOL_TABLES:
+        raise ValueError("Invalid table name")
     
+    # Unprepared on purpose: DECLARE ... CURSOR cannot wrap an EXECUTE
     conn = get_darkpool_connection()
     try:
         sql = f"""
-            SELECT
-              ticker, quantity, price::float, trade_value::float,
-              (trade_time AT TIME ZONE 'America/New_York') as trade_time,
-              conditions
+            SELECT{TRADE_SELECT_COLUMNS}
             FROM {table_name}
-            WHERE trade_time BETWEEN %s AND %s {additional_filter}
-            ORDER BY trade_value DESC LIMIT 300;
+            WHERE ticker = %s AND trade_value >= %s{SESSION_FILTERS[session]}
+            ORDER BY trade_time DESC, id DESC;
         """
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql, (start_utc, end_utc))
-            return cur.fetchall()
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+            cur.itersize = STREAM_FETCH_SIZE
+            cur.execute(sql, (ticker.upper(), floor))
+            for row in cur:
+                yield dumps_json(dict(zip(TRADE_FIELDS, row))) + b"\n"
     finally:
+        conn.rollback()  # close the cursor's transaction before handing the connection back
         release_darkpool_connection(conn)
 
-# ─── ENHANCED SD DATABASE FUNCTIONS ─────────────────────────────
-
+def ticker_trades_response(table_name: str, ticker: str, floor: float, session: str,
+                           response: Response, limit: int, cursor: Optional[str], stream: bool,
+                           fmt: str = 'json'):
+    """Shared body of the per-ticker listing endpoints"""
+    if stream:
+        return StreamingResponse(
+            stream_ticker_trades(table_name, ticker, floor, session),
+            media_type="application/x-ndjson"
+        )
+    
+    raw = fmt != 'json'
+    try:
+        rows, next_cursor = ticker_trades_query(table_name, ticker, floor, session, limit, cursor, raw=raw)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if raw:
+        response = fast_trades_response(rows, fmt)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    # Lets a client ask listing_day_totals for the same population this page came from
+    response.headers['X-Value-Floor'] = repr(float(floor))
+    return response if raw else rows
+
+MAX_DAY_TOTALS_SPAN = 366
+
+def listing_day_totals_response(table_name: str, ticker: str, floor: float, session: str,
+                                start_date: str, end_date: str) -> List[Dict]:
+    """Shared body of the per-ticker listing /daily endpoints"""
+    try:
+        start_day = parse_date_string(start_date)
+        end_day = parse_date_string(end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if end_day < start_day:
+        raise HTTPException(status_code=400, detail="end_date must be on or after start_date")
+    if (end_day - start_day).days >= MAX_DAY_TOTALS_SPAN:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_DAY_TOTALS_SPAN} days per request")
+    return listing_day_totals_query(table_name, ticker, floor, session, start_day, end_day)
+
+MAX_BATCH_TICKERS = 100
+
+def parse_ticker_list(tickers: str) -> List[str]:
+    """'nvda, AAPL,nvda' -> ['NVDA', 'AAPL'] (order kept, duplicates dropped)"""
+    parsed = list(dict.fromkeys(t.strip().upper() for t in tickers.split(',') if t.strip()))
+    if not parsed:
+        raise ValueError("At least one ticker is required")
+    if len(parsed) > MAX_BATCH_TICKERS:
+        raise ValueError(f"At most {MAX_BATCH_TICKERS} tickers per batch request")
+    invalid = [t for t in parsed if not t.replace('.', '').isalnum()]
+    if invalid:
+        raise ValueError(f"Invalid ticker(s): {', '.join(invalid)}")
+    return parsed
+
+@coalesced(lambda table_name, tickers, percentile, session, limit=DEFAULT_PAGE_SIZE, raw=False:
+           (table_name, tuple(tickers), percentile, session, limit, raw))
+def batch_ticker_trades_query(table_name: str, tickers: List[str], percentile: Optional[float],
+                              session: str, limit: int = DEFAULT_PAGE_SIZE,
+                              raw: bool = False) -> Dict[str, List]:
+    """
+    Latest trades for many tickers in one round-trip, grouped by ticker.
+    Per-ticker percentile floors are computed in the same statement with a lateral
+    join, matching get_dynamic_threshold (DEFAULT_MIN_VALUE when a ticker has no history).
+    """
+    if table_name not in DARKPOOL_TABLES:
+        raise ValueError("Invalid table name")
+    
+    params: List[Any] = [tickers, DEFAULT_MIN_VALUE, limit]
+    if percentile is not None:
+        params.append(percentile)
+    
+    conn = get_darkpool_connection()
+    try:
+        with conn.cursor(cursor_factory=None if raw else RealDictCursor) as cur:
+            execute_prepared(cur, batch_statement(table_name, session, percentile is not None), tuple(params))
+            rows = cur.fetchall()
+    finally:
+        release_darkpool_connection(conn)
+    
+    grouped: Dict[str, List] = {t: [] for t in tickers}
+    for row in rows:
+        grouped[row[0] if raw else row['ticker']].append(row)
+    return grouped
+
+def batch_trades_response(table_name: str, tickers: str, percentile: Optional[float],
+                          session: str, limit: int, fmt: str = 'json'):
+    """Shared body of the watchlist batch endpoints"""
+    try:
+        ticker_list = parse_ticker_list(tickers)
+        grouped = batch_ticker_trades_query(table_name, ticker_list, percentile, session, limit, raw=fmt != 'json')
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if fmt == 'json':
+        return grouped
+    return encode_fast_payload({t: trades_payload(rows, fmt) for t, rows in grouped.items()}, fmt)
+
+@coalesced(lambda table_name, days, under_400m=False, market_hours_only=False, raw=False:
+           (table_name, days, under_400m, market_hours_only, raw))
+def big_prints_query(table_name: str, days: int, under_400m: bool = False, market_hours_only: bool = False,
+                     raw: bool = False):
+    """
+    The 300 largest prints across all tickers over the last `days` NY days, via the prepared
+    big-prints statement (dict rows, or tuples when raw). Concurrent identical calls share one query.
+    """
+    if table_name not in DARKPOOL_TABLES:
+        raise ValueError("Invalid table name")
+    
+    now_ny = datetime.now(NY_TZ)
+    end_of_today_ny = now_ny.replace(hour=23, minute=59, second=59, microsecond=999999)
+    start_date_ny = (now_ny - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_utc = start_date_ny.astimezone(timezone.utc)
+    end_utc = end_of_today_ny.astimezone(timezone.utc)
+    
+    conn = get_darkpool_connection()
+    try:
+        with conn.cursor(cursor_factory=None if raw else RealDictCursor) as cur:
+            execute_prepared(cur, big_prints_statement(table_name),
+                             (start_utc, end_utc, under_400m, market_hours_only))
+            return cur.fetchall()
+    finally:
+        release_darkpool_connection(conn)
+
+@coalesced(lambda view_name, ticker, days, session=None: (view_name, ticker.upper(), days, session))
+def daily_summary_query(view_name: str, ticker: str, days: int, session: Optional[str] = None):
+    """Exact per-day/session totals from the continuous aggregates (see update_dp_schema.py)"""
+    if view_name not in DAILY_VIEWS:
+        raise ValueError("Invalid view name")
+    
+    start_day = (datetime.now(NY_TZ) - timedelta(days=days - 1)).date()
+    
+    conn = get_darkpool_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            execute_prepared(cur, daily_summary_statement(view_name), (ticker.upper(), start_day, session))
+            return cur.fetchall()
+    finally:
+        release_darkpool_connection(conn)
+
+@coalesced(lambda table_name, ticker, floor, session, start_day, end_day:
+           (table_name, ticker.upper(), floor, session, start_day, end_day))
+def listing_day_totals_query(table_name: str, ticker: str, floor: float, session: str,
+                             start_day: date, end_day: date) -> List[Dict]:
+    """Per-day totals of a per-ticker listing's population, for its day summary rows"""
+    if table_name not in DARKPOOL_TABLES:
+        raise ValueError("Invalid table name")
+    
+    conn = get_darkpool_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            execute_prepared(cur, day_totals_statement(table_name, session),
+                             (ticker.upper(), floor, start_day, end_day))
+            return cur.fetchall()
+    finally:
+        release_darkpool_connection(conn)
+
+@coalesced(lambda table_name, ticker, start_utc, end_utc, tolerance_pct, min_value, limit:
+           (table_name, ticker.upper(), start_utc, end_utc, tolerance_pct, min_value, limit))
+def level_prints_query(table_name: str, ticker: str, start_utc: datetime, end_utc: datetime,
+                       tolerance_pct: float, min_value: float, limit: int) -> List[Dict]:
+    """Per mirrored level: totals and the newest prints within level_price * (1 ± tolerance_pct)"""
+    if table_name not in DARKPOOL_TABLES:
+        raise ValueError("Invalid table name")
+    
+    conn = get_darkpool_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            execute_prepared(cur, level_prints_statement(table_name),
+                             (ticker.upper(), tolerance_pct, start_utc, end_utc, min_value, limit))
+            return cur.fetchall()
+    finally:
+        release_darkpool_connection(conn)
+
+def replace_mirrored_levels(levels: List[Dict], ticker: Optional[str] = None) -> bool:
+    """
+    Rewrite sd_level_bands for one ticker (or all of it) in a single transaction.
+    Writers are serialized on an advisory lock so workers can't race into PK conflicts;
+    a full rewrite another worker is already doing is skipped (returns False).
+    """
+    conn = get_darkpool_connection()
+    try:
+        with conn.cursor() as cur:
+            if ticker is None:
+                cur.execute("SELECT pg_try_advisory_xact_lock(hashtext('sd_level_bands'))")
+                if not cur.fetchone()[0]:
+                    return False
+            else:
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('sd_level_bands'))")
+            if ticker is None:
+                cur.execute("DELETE FROM sd_level_bands")
+            else:
+                cur.execute("DELETE FROM sd_level_bands WHERE ticker = %s", (ticker.upper(),))
+            if levels:
+                psycopg2.extras.execute_values(
+                    cur,
+                    "INSERT INTO sd_level_bands (level_id, ticker, level_price, level_type, level_name) VALUES %s",
+                    [(l['id'], l['ticker'], l['level_price'], l['level_type'], l['level_name']) for l in levels]
+                )
+        conn.commit()
+        return True
+    finally:
+        release_darkpool_connection(conn)
+
+# ─── ENHANCED SD DATABASE FUNCTIONS ─────────────────────────────
+
+# Column order of the tick-cache COPY rows band_page_kernel encodes
+TICK_CACHE_COLUMNS = [
+    'ticker', 'trade_time', 'price', 'quantity', 'trade_value', 'conditions', 'exchange',
+    'participant_timestamp', 'date_range_start', 'date_range_end', 'fetch_session_id'
+]
+# A 'processing' session older than this is assumed dead and may be reclaimed
+FETCH_SESSION_STALE_AFTER = timedelta(hours=1)
+
+async def begin_fetch_session(ticker: str, start_date_obj: date, end_date_obj: date) -> Optional[uuid.UUID]:
+    """
+    Claim the fetch_sessions row for ticker/range and clear any partial cache under it.
+    Returns None while another live fetch is writing the same range (the caller then
+    computes without caching).
+    """
+    async with acquire_sd_connection(primary=True) as conn:
+        async with conn.transaction():
+            session_id = await conn.fetchval(
+                """
+                INSERT INTO fetch_sessions (ticker, start_date, end_date, status)
+                VALUES ($1, $2, $3, 'processing')
+                ON CONFLICT (ticker, start_date, end_date) DO UPDATE SET
+                    status = 'processing', started_at = NOW(), completed_at = NULL,
+                    error_message = NULL, total_trades_fetched = 0, total_api_calls = 0
+                WHERE fetch_sessions.status <> 'processing'
+                   OR fetch_sessions.started_at < NOW() - $4::interval
+                RETURNING id
+                """,
+                ticker.upper(), start_date_obj, end_date_obj, FETCH_SESSION_STALE_AFTER
+            )
+            if session_id is not None:
+                await conn.execute("DELETE FROM market_data_cache WHERE fetch_session_id = $1", session_id)
+    return session_id
+
+async def cache_trade_page(payload: bytes):
+    """Bulk COPY one Polygon page (CSV from band_page_kernel) into market_data_cache"""
+    async with acquire_sd_connection(primary=True) as conn:
+        await conn.copy_to_table(
+            'market_data_cache', source=io.BytesIO(payload), columns=TICK_CACHE_COLUMNS, format='csv'
+        )
+
+async def finish_fetch_session(session_id: uuid.UUID, trades_cached: int, api_calls: int,
+                               error: Optional[str] = None):
+    """Mark the session completed (readable by check_data_availability) or failed"""
+    async with acquire_sd_connection(primary=True) as conn:
+        await conn.execute(
+            """
+            UPDATE fetch_sessions SET
+                status = $2, total_trades_fetched = $3, total_api_calls = $4,
+                error_message = $5, completed_at = CASE WHEN $2 = 'completed' THEN NOW() END
+            WHERE id = $1
+            """,
+            session_id, 'failed' if error else 'completed', trades_cached, api_calls, error
+        )
+
+# Projecting a page of dicts into arrays costs ~4ms per 50k trades whatever the band, while
+# the loop only pays full price for trades inside the band - so NumPy wins only on pages
+# where a large share of trades land in it (benchmark_aggregation.py --tolerance)
+VECTORIZE_MIN_BAND_FRACTION = 0.3
+
+def share_volume(shares) -> Union[int, float]:
+    """A share count (int, float or NUMERIC Decimal) as int when whole, else float - fractional shares are kept"""
+    shares = float(shares)
+    return int(shares) if shares.is_integer() else shares
+
+_trade_price = operator.itemgetter('price')
+_trade_size = operator.itemgetter('size')
+
+def _aggregate_trade_page_numpy(results: List[Dict], min_price: float,
+                                max_price: float) -> Tuple[int, float, int, float, float]:
+    """Project the page into typed arrays once, then mask and reduce without a Python loop"""
+    count = len(results)
+    try:
+        # C-level projection; any trade missing a field (or null) drops to the .get path.
+        # Sizes are float64 - fractional shares must not be truncated.
+        prices = np.fromiter(map(_trade_price, results), dtype=np.float64, count=count)
+        sizes = np.fromiter(map(_trade_size, results), dtype=np.float64, count=count)
+    except (KeyError, TypeError):
+        prices = np.fromiter((trade.get('price') or 0.0 for trade in results), dtype=np.float64, count=count)
+        sizes = np.fromiter((trade.get('size') or 0 for trade in results), dtype=np.float64, count=count)
+    
+    mask = (sizes > 0) & (prices >= min_price) & (prices <= max_price) & (prices != 0.0)
+    trades = int(np.count_nonzero(mask))
+    if not trades:
+        return 0, 0.0, 0, float('inf'), 0.0
+    
+    band_prices = prices[mask]
+    band_sizes = sizes[mask]
+    return (
+        share_volume(band_sizes.sum()),  # whole shares stay int, like the loop kernel
+        float(np.dot(band_sizes, band_prices)),
+        trades,
+        float(band_prices.min()),
+        float(band_prices.max()),
+    )
+
+def _aggregate_trade_page_python(results: List[Dict], min_price: float,
+                                 max_price: float) -> Tuple[int, float, int, float, float]:
+    """Loop kernel: band test first, so out-of-band trades cost one dict lookup and a compare"""
+    volume = 0
+    value = 0.0
+    trades = 0
+    low = float('inf')
+    high = 0.0
+    for trade in results:
+        price = trade.get('price')
+        if not price or price < min_price or price > max_price:
+            continue
+        qty = trade.get('size')
+        if not qty:
+            continue
+        volume += qty
+        value += qty * price
+        trades += 1
+        if price < low:
+            low = price
+        if price > high:
+            high = price
+    return volume, value, trades, low, high
+
+def aggregate_trade_page(results: List[Dict], min_price: float, max_price: float,
+                         dense: bool = False) -> Tuple[int, float, int, float, float]:
+    """
+    Band totals of one Polygon trades page: (volume, value, trades, min price, max price).
+    Min/max are inf/0.0 when nothing falls in the band. dense = most trades are expected
+    inside the band, where the vectorized kernel is the faster one.
+    """
+    if dense and NUMPY_AVAILABLE:
+        return _aggregate_trade_page_numpy(results, min_price, max_price)
+    return _aggregate_trade_page_python(results, min_price, max_price)
+
+# ─── CPU POOL ─────────────────────────────────────────────────────
+
+# Page JSON decoding and per-trade work run in worker processes so a big job can't stall
+# the event loop (and every other endpoint with it). 0 = run inline, for debugging.
+SD_CPU_WORKERS = int(os.environ.get('SD_CPU_WORKERS', '2'))
+_cpu_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+def get_cpu_pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _cpu_pool
+    if _cpu_pool is None:
+        # spawn, not fork: the parent has pool and listener threads a fork would copy mid-state
+        _cpu_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=SD_CPU_WORKERS, mp_context=multiprocessing.get_context('spawn')
+        )
+    return _cpu_pool
+
+async def run_cpu(fn: Callable[..., Any], *args) -> Any:
+    """Run a module-level kernel in the CPU pool; only its return value crosses back"""
+    if SD_CPU_WORKERS <= 0:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(get_cpu_pool(), fn, *args)
+
+def shutdown_cpu_pool():
+    global _cpu_pool
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=False, cancel_futures=True)
+        _cpu_pool = None
+
+def decode_page(body: bytes) -> Dict:
+    return orjson.loads(body) if ORJSON_AVAILABLE else json.loads(body)
+
+def encode_cache_page(results: List[Dict], cache_context: tuple) -> Tuple[int, bytes]:
+    """
+    A page's tick-cache rows as COPY CSV in TICK_CACHE_COLUMNS order: (rows, payload).
+    One bytes object pickles back from the worker far cheaper than ~50k row tuples.
+    Empty unquoted fields are NULLs.
+    """
+    ticker, range_start, range_end, session_id = cache_context
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    rows = 0
+    for trade in results:
+        qty = trade.get('size')
+        price = trade.get('price')
+        trade_ns = trade.get('sip_timestamp') or trade.get('participant_timestamp')
+        if qty and price and trade_ns:
+            conditions = trade.get('conditions')
+            writer.writerow((
+                ticker,
+                datetime.fromtimestamp(trade_ns / 1e9, tz=timezone.utc).isoformat(),
+                price, qty, qty * price,
+                None if conditions is None else '{' + ','.join(map(str, conditions)) + '}',
+                trade.get('exchange'), trade.get('participant_timestamp'),
+                range_start, range_end, session_id
+            ))
+            rows += 1
+    return rows, out.getvalue().encode()
+
+def band_page_kernel(body: bytes, min_price: float, max_price: float, dense: bool,
+                     cache_context: Optional[tuple]) -> Tuple[int, tuple, Optional[str], Optional[Tuple[int, bytes]]]:
+    """
+    Decode one trades page and reduce it to band totals:
+    (trades on page, aggregate_trade_page totals, next_url, encode_cache_page (rows, CSV)).
+    cache_context = (ticker, range start, range end, session id), or None to skip the cache rows.
+    """
+    data = decode_page(body)
+    results = data.get("results", [])
+    if not results:
+        return 0, (0, 0.0, 0, float('inf'), 0.0), None, None
+    
+    totals = aggregate_trade_page(results, min_price, max_price, dense)
+    cache_page = encode_cache_page(results, cache_context) if cache_context is not None else None
+    return len(results), totals, data.get('next_url'), cache_page
+
+def profile_page_kernel(body: bytes) -> Tuple[Dict[int, list], int, Optional[str]]:
+    """Decode one trades page and fold it into price buckets: (buckets, trades, next_url)"""
+    data = decode_page(body)
+    buckets: Dict[int, list] = {}
+    trades = 0
+    for trade in data.get("results", []):
+        qty = trade.get('size')
+        price = trade.get('price')
+        if not (qty and price):
+            continue
+        key = profile_bucket(price)
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = [qty, qty * price, 1]
+        else:
+            bucket[0] += qty
+            bucket[1] += qty * price
+            bucket[2] += 1
+        trades += 1
+    return buckets, trades, data.get('next_url')
+
+def minute_bar_page_kernel(body: bytes, min_price: float,
+                           max_price: float) -> Tuple[int, tuple, List[Tuple[int, int]], Optional[str]]:
+    """
+    Decode one minute-aggregates page, spreading each bar's volume evenly over its low-high
+    range: (bars on page, (volume, value, trades, volume floor, volume ceiling, all trades),
+    [(bar start ms, bar trades)] for bars touching the band, next_url).
+    Floor counts bars wholly inside the band, ceiling every bar that touches it.
+    """
+    data = decode_page(body)
+    bars = data.get("results") or []
+    volume = value = trades = 0.0
+    floor = ceiling = tape_trades = 0
+    touched: List[Tuple[int, int]] = []
+    for bar in bars:
+        qty = bar.get('v')
+        low = bar.get('l')
+        high = bar.get('h')
+        bar_trades = bar.get('n', 0)
+        tape_trades += bar_trades
+        if not qty or low is None or high is None or high < min_price or low > max_price:
+            continue
+
+        overlap_low = max(low, min_price)
+        overlap_high = min(high, max_price)
+        ceiling += qty
+        if overlap_low == low and overlap_high == high:
+            share = 1.0
+            floor += qty
+        else:
+            share = (overlap_high - overlap_low) / (high - low)
+        volume += qty * share
+        value += qty * share * (overlap_low + overlap_high) / 2
+        trades += bar_trades * share
+        touched.append((bar['t'], bar_trades))
+    return len(bars), (volume, value, trades, floor, ceiling, tape_trades), touched, data.get('next_url')
+
 async def unlimited_fast_calculate_level_volume(ticker: str, level_price: float, 
                                               start_date: str, end_date: str, 
                                               tolerance: float = 0.025) -> Dict:
     """
-    ENHANCED: Unlimited API calls for maximum data coverage
+    ENHANCED: Unlimited API calls for maximum data coverage.
+    Every fetched trade is also COPYed into market_data_cache under a fetch_sessions
+    row, so later jobs on this ticker/range are answered by calculate_level_volume_from_cache.
     """
     if not POLYGON_API_KEY:
         raise ValueError("POLYGON_API_KEY not set")
@@ -376,6 +1944,8 @@ async def unlimited_fast_calculate_level_volume(ticker: str, level_price: float,
     # Convert dates to timestamps
     start_dt = datetime.strptime(start_date, '%Y-%m-%d')
     end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+    start_date_obj = start_dt.date()
+    end_date_obj = parse_date_string(end_date)
     
     start_timestamp = int(start_dt.timestamp() * 1000000000)
     end_timestamp = int(end_dt.timestamp() * 1000000000)
@@ -397,6 +1967,18 @@ async def unlimited_fast_calculate_level_volume(ticker: str, level_price: float,
     api_calls = 0
     min_actual_price = float('inf')
     max_actual_price = 0.0
+    band_fraction = 0.0
+    
+    session_id = None
+    cached_trades = 0
+    if sd_db_pool is not None:
+        try:
+            session_id = await begin_fetch_session(ticker, start_date_obj, end_date_obj)
+        except Exception as e:
+            logger.warning(f"Tick cache unavailable, computing without it: {e}")
+        if session_id is None:
+            logger.info(f"Not caching {ticker} {start_date} to {end_date} - another fetch is writing it")
+    ticker_upper = ticker.upper()
     
     logger.info(f"🚀 UNLIMITED calculation for {ticker} at ${level_price:.2f} ±${tolerance:.3f}")
     
@@ -406,43 +1988,52 @@ async def unlimited_fast_calculate_level_volume(ticker: str, level_price: float,
             logger.info(f"⚡ UNLIMITED API call {api_calls} for {ticker}")
             
             try:
-                resp = await client.get(url)
-                resp.raise_for_status()
-                data = resp.json()
+                # Retries, backoff and rate limiting happen inside polygon_get
+                resp = await polygon_get(client, url)
+                # Decode + band totals off the event loop; the previous page's hit rate picks the kernel
+                page_size, page_totals, next_url, cache_page = await run_cpu(
+                    band_page_kernel, resp.content, min_price, max_price,
+                    band_fraction >= VECTORIZE_MIN_BAND_FRACTION,
+                    (ticker_upper, start_date_obj, end_date_obj, session_id) if session_id is not None else None
+                )
             except Exception as e:
-                logger.error(f"API error on call {api_calls}: {e}")
-                # Continue with partial data instead of breaking
-                await asyncio.sleep(1.0)
-                continue
+                # Partial totals would be wrong totals - fail the job instead
+                logger.error(f"❌ Polygon fetch for {ticker} failed on call {api_calls}: {e}")
+                if session_id is not None:
+                    try:
+                        await finish_fetch_session(session_id, cached_trades, api_calls, error=str(e))
+                    except Exception:
+                        pass  # left 'processing'; reclaimed after FETCH_SESSION_STALE_AFTER
+                raise
             
-            results = data.get("results", [])
-            if not results:
+            if not page_size:
                 logger.info(f"No more results after {api_calls} calls")
                 break
             
-            # Process trades in memory
-            for trade in results:
-                qty = trade.get('size')
-                price = trade.get('price')
-                
-                if not (qty and price):
-                    continue
-                
-                # Apply price filter immediately
-                if min_price <= price <= max_price:
-                    total_volume += qty
-                    total_value += (qty * price)
-                    total_trades += 1
-                    
-                    # Track actual price range
-                    min_actual_price = min(min_actual_price, price)
-                    max_actual_price = max(max_actual_price, price)
+            page_volume, page_value, page_trades, page_min, page_max = page_totals
+            band_fraction = page_trades / page_size
+            total_volume += page_volume
+            total_value += page_value
+            total_trades += page_trades
+            min_actual_price = min(min_actual_price, page_min)
+            max_actual_price = max(max_actual_price, page_max)
+            
+            if cache_page and cache_page[0]:
+                try:
+                    await cache_trade_page(cache_page[1])
+                    cached_trades += cache_page[0]
+                except Exception as e:
+                    # Keep computing; the session is marked failed so nothing reads a partial cache
+                    logger.warning(f"Tick cache write failed, continuing uncached: {e}")
+                    try:
+                        await finish_fetch_session(session_id, cached_trades, api_calls, error=str(e))
+                    except Exception:
+                        pass  # left 'processing'; reclaimed after FETCH_SESSION_STALE_AFTER
+                    session_id = None
             
             # Check for next page
-            next_url = data.get('next_url')
             if next_url:
                 url = f"{next_url}&apiKey={POLYGON_API_KEY}"
-                await asyncio.sleep(0.03)  # Reduced delay for faster processing
             else:
                 logger.info(f"Reached end of data after {api_calls} calls")
                 break
@@ -451,6 +2042,10 @@ async def unlimited_fast_calculate_level_volume(ticker: str, level_price: float,
             if api_calls % 100 == 0:
                 logger.info(f"📊 UNLIMITED Progress: {api_calls} calls, {total_trades:,} trades found")
     
+    if session_id is not None:
+        await finish_fetch_session(session_id, cached_trades, api_calls)
+        logger.info(f"💾 Cached {cached_trades:,} {ticker_upper} trades for {start_date} to {end_date}")
+    
     # Format price range
     if total_trades > 0 and min_actual_price != float('inf'):
         price_range = f"${min_actual_price:.2f} - ${max_actual_price:.2f}"
@@ -466,21 +2061,25 @@ async def unlimited_fast_calculate_level_volume(ticker: str, level_price: float,
         'price_range': price_range,
         'api_calls_made': api_calls,
         'data_source': 'unlimited_direct_api_calculation',
-        'processing_method': 'unlimited_fast_memory_only'
+        'processing_method': 'unlimited_fast_memory_only',
+        'cached_trades': cached_trades
     }
 
 async def create_absorption_job_segment(level_id: int, job_id: str, volume_data: Dict, 
                                        start_date: str, end_date: str) -> None:
-    """Create a new absorption job segment for timeline tracking"""
+    """Create (or, for a retried job, overwrite) the absorption job segment for timeline tracking"""
     if sd_db_pool is None:
         raise RuntimeError("SD database pool not initialized")
     
-    async with sd_db_pool.acquire() as conn:
+    async with acquire_sd_connection(primary=True) as conn:
         await conn.execute(
             """
             INSERT INTO absorption_job_segments 
             (job_id, level_id, volume, value, trades, date_start, date_end, created_at)
             VALUES ($1, $2, $3, $4, $5, $6, $7, NOW())
+            ON CONFLICT (job_id, level_id) DO UPDATE
+            SET volume = EXCLUDED.volume, value = EXCLUDED.value, trades = EXCLUDED.trades,
+                date_start = EXCLUDED.date_start, date_end = EXCLUDED.date_end, created_at = NOW()
             """,
             job_id, level_id, volume_data['total_volume'], volume_data['total_value'],
             volume_data['total_trades'], parse_date_string(start_date), 
@@ -492,7 +2091,7 @@ async def get_absorption_segments_for_level(level_id: int) -> List[Dict]:
     if sd_db_pool is None:
         raise RuntimeError("SD database pool not initialized")
     
-    async with sd_db_pool.acquire() as conn:
+    async with acquire_sd_connection() as conn:
         segments = await conn.fetch(
             """
             SELECT job_id, volume, value, trades, date_start, date_end, created_at
@@ -516,12 +2115,13 @@ async def get_absorption_segments_for_level(level_id: int) -> List[Dict]:
             for seg in segments
         ]
 
+@coalesced(lambda ticker: ticker.upper())
 async def get_enhanced_sd_levels_for_timeline(ticker: str) -> List[Dict]:
     """Get SD levels with enhanced data including job segments"""
     if sd_db_pool is None:
         raise RuntimeError("SD database pool not initialized")
     
-    async with sd_db_pool.acquire() as conn:
+    async with acquire_sd_connection() as conn:
         levels = await conn.fetch(
             """
             SELECT l.id, l.ticker, l.level_price, l.level_type, l.level_name, 
@@ -593,103 +2193,739 @@ async def get_enhanced_sd_levels_for_timeline(ticker: str) -> List[Dict]:
         
         return enhanced_levels
 
-async def check_data_availability(ticker: str, start_date: str, end_date: str) -> Dict:
-    """Check if we have data for this ticker/date range in SD database"""
+async def check_data_availability(ticker: str, start_date: str, end_date: str) -> Dict:
+    """Check if we have data for this ticker/date range in SD database"""
+    if sd_db_pool is None:
+        raise RuntimeError("SD database pool not initialized")
+    
+    # Convert string dates to date objects
+    start_date_obj = parse_date_string(start_date)
+    end_date_obj = parse_date_string(end_date)
+    
+    async with acquire_sd_connection() as conn:
+        # Check if we have a completed fetch session for this range
+        session = await conn.fetchrow(
+            """
+            SELECT id, status, total_trades_fetched, total_api_calls, completed_at
+            FROM fetch_sessions 
+            WHERE ticker = $1 AND start_date = $2 AND end_date = $3 
+            AND status = 'completed'
+            ORDER BY completed_at DESC 
+            LIMIT 1
+            """,
+            ticker.upper(), start_date_obj, end_date_obj
+        )
+        
+        if session:
+            # Check actual trade count in cache
+            trade_count = await conn.fetchval(
+                """
+                SELECT COUNT(*) FROM market_data_cache 
+                WHERE ticker = $1 AND date_range_start = $2 AND date_range_end = $3
+                """,
+                ticker.upper(), start_date_obj, end_date_obj
+            )
+            
+            return {
+                'has_data': True,
+                'session_id': session['id'],
+                'total_trades': trade_count,
+                'api_calls_used': session['total_api_calls'],
+                'fetched_at': session['completed_at'].isoformat(),
+                'status': 'available'
+            }
+        
+        return {
+            'has_data': False,
+            'status': 'not_available'
+        }
+
+async def calculate_level_volume_from_cache(ticker: str, level_price: float, 
+                                          start_date: str, end_date: str, 
+                                          tolerance: float = 0.025) -> Dict:
+    """Calculate volume at price level from cached data in SD database"""
+    if sd_db_pool is None:
+        raise RuntimeError("SD database pool not initialized")
+    
+    # Convert string dates to date objects
+    start_date_obj = parse_date_string(start_date)
+    end_date_obj = parse_date_string(end_date)
+    
+    min_price = level_price - tolerance
+    max_price = level_price + tolerance
+    
+    async with acquire_sd_connection() as conn:
+        result = await conn.fetchrow(
+            """
+            SELECT 
+                COUNT(*) as total_trades,
+                COALESCE(SUM(quantity), 0) as total_volume,
+                COALESCE(SUM(trade_value), 0) as total_value,
+                MIN(price) as min_price,
+                MAX(price) as max_price
+            FROM market_data_cache
+            WHERE ticker = $1 
+            AND date_range_start = $2 
+            AND date_range_end = $3
+            AND price BETWEEN $4 AND $5
+            """,
+            ticker.upper(), start_date_obj, end_date_obj, min_price, max_price
+        )
+        
+        total_volume = result['total_volume'] or 0
+        total_value = result['total_value'] or 0
+        total_trades = result['total_trades'] or 0
+        
+        if total_trades > 0 and result['min_price'] and result['max_price']:
+            price_range = f"${float(result['min_price']):.2f} - ${float(result['max_price']):.2f}"
+        else:
+            price_range = f"${level_price:.2f} (no trades found)"
+        
+        return {
+            'total_volume': share_volume(total_volume),
+            'total_value': float(total_value),
+            'total_trades': int(total_trades),
+            'price_range': price_range,
+            'level_price': level_price,
+            'tolerance': tolerance,
+            'api_calls_made': 0,
+            'data_source': 'market_data_cache'
+        }
+
+# Trades are rounded to the nearest bucket, so a level band can only misplace
+# sub-penny prints within half a bucket of its edges
+PROFILE_BUCKET_SIZE = 0.01
+PROFILE_COLUMNS = ['ticker', 'trade_date', 'price_bucket', 'volume', 'value', 'trade_count']
+# A still-growing day (today) built this recently is reused rather than refetched
+PROFILE_PARTIAL_REUSE = timedelta(minutes=1)
+
+def profile_bucket(price: float) -> int:
+    """Bucket index of a price (round half up to PROFILE_BUCKET_SIZE)"""
+    return int(price / PROFILE_BUCKET_SIZE + 0.5)
+
+def profile_days(start_date: str, end_date: str) -> List[date]:
+    """Weekdays of the range up to today (NY) - weekends and future days have no tape"""
+    day = parse_date_string(start_date)
+    last = min(parse_date_string(end_date), datetime.now(NY_TZ).date())
+    days = []
+    while day <= last:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+async def profile_buckets_from_cache(ticker: str, day_start: datetime,
+                                     day_end: datetime) -> Optional[Tuple[Dict[int, list], int]]:
+    """Bucket a day out of market_data_cache when a completed fetch session spans it"""
+    async with acquire_sd_connection() as conn:
+        # Sessions are dated in server-local time, so only days strictly inside one are whole
+        session_id = await conn.fetchval(
+            """
+            SELECT id FROM fetch_sessions
+            WHERE ticker = $1 AND status = 'completed'
+              AND start_date < $2::date AND end_date > $2::date
+            ORDER BY completed_at DESC
+            LIMIT 1
+            """,
+            ticker, day_start.date()
+        )
+        if session_id is None:
+            return None
+        rows = await conn.fetch(
+            """
+            -- Same float8 arithmetic as profile_bucket(), so both sources agree on half-cent prints
+            SELECT floor(price::float8 / $4 + 0.5)::bigint AS bucket, SUM(quantity) AS volume,
+                   SUM(trade_value) AS value, COUNT(*) AS trade_count
+            FROM market_data_cache
+            WHERE fetch_session_id = $1 AND trade_time >= $2 AND trade_time < $3
+            GROUP BY 1
+            """,
+            session_id, day_start, day_end, PROFILE_BUCKET_SIZE
+        )
+    buckets = {row['bucket']: [share_volume(row['volume']), float(row['value']), row['trade_count']] for row in rows}
+    return buckets, sum(row['trade_count'] for row in rows)
+
+async def profile_buckets_from_polygon(ticker: str, day_start: datetime,
+                                       day_end: datetime) -> Tuple[Dict[int, list], int, int]:
+    """Stream one day of tape and fold it into buckets - memory stays O(buckets)"""
+    if not POLYGON_API_KEY:
+        raise ValueError("POLYGON_API_KEY not set")
+    
+    url = (
+        f"https://api.polygon.io/v3/trades/{ticker}"
+        f"?timestamp.gte={int(day_start.timestamp() * 1e9)}"
+        f"&timestamp.lt={int(day_end.timestamp() * 1e9)}&limit=50000"
+        f"&apiKey={POLYGON_API_KEY}"
+    )
+    buckets: Dict[int, list] = {}
+    trades = 0
+    api_calls = 0
+    
+    async with httpx.AsyncClient(timeout=200.0) as client:
+        while url:
+            api_calls += 1
+            # Raises once polygon_get gives up - a partial day must never be stored as the day's profile
+            resp = await polygon_get(client, url)
+            page_buckets, page_trades, next_url = await run_cpu(profile_page_kernel, resp.content)
+            
+            # Pages come back as a few thousand buckets at most, cheap to merge here
+            for key, (volume, value, count) in page_buckets.items():
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = [volume, value, count]
+                else:
+                    bucket[0] += volume
+                    bucket[1] += value
+                    bucket[2] += count
+            trades += page_trades
+            
+            url = f"{next_url}&apiKey={POLYGON_API_KEY}" if next_url else None
+    
+    return buckets, trades, api_calls
+
+async def store_profile_day(ticker: str, day: date, buckets: Dict[int, list], trades: int,
+                            source: str, is_complete: bool):
+    """Replace the day's buckets and mark it built, atomically"""
+    records = [
+        (ticker, day, round(bucket * PROFILE_BUCKET_SIZE, 4), volume, value, count)
+        for bucket, (volume, value, count) in buckets.items()
+    ]
+    async with acquire_sd_connection(primary=True) as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "DELETE FROM price_volume_profile WHERE ticker = $1 AND trade_date = $2", ticker, day
+            )
+            if records:
+                await conn.copy_records_to_table('price_volume_profile', records=records, columns=PROFILE_COLUMNS)
+            await conn.execute(
+                """
+                INSERT INTO price_volume_profile_days (ticker, trade_date, bucket_count, trade_count, source, is_complete)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                ON CONFLICT (ticker, trade_date) DO UPDATE SET
+                    bucket_count = EXCLUDED.bucket_count, trade_count = EXCLUDED.trade_count,
+                    source = EXCLUDED.source, is_complete = EXCLUDED.is_complete, built_at = NOW()
+                """,
+                ticker, day, len(records), trades, source, is_complete
+            )
+
+@coalesced(lambda ticker, day: (ticker, day))
+async def build_profile_day(ticker: str, day: date) -> int:
+    """
+    Build price_volume_profile for one NY trading day. Returns Polygon calls made.
+    Jobs in this process share one build (coalesced); across processes the session
+    advisory lock makes a second builder wait for the first and then reuse its day,
+    so overlapping jobs walk each day's tape once whatever their price bands.
+    The lock lives on a dedicated connection, not a pooled one: the build holds it for
+    minutes while _build_profile_day checks out pool connections of its own.
+    """
+    lock_key = f"profile:{ticker}:{day}"
+    lock_conn = await asyncpg.connect(
+        host=SD_DB_HOST, port=SD_DB_PORT, user=SD_DB_USER,
+        password=SD_DB_PASS, database=SD_DB_NAME
+    )
+    try:
+        await lock_conn.execute("SELECT pg_advisory_lock(hashtext($1))", lock_key)
+        fresh = await lock_conn.fetchval(
+            """
+            SELECT is_complete OR built_at > NOW() - $3::interval
+            FROM price_volume_profile_days
+            WHERE ticker = $1 AND trade_date = $2
+            """,
+            ticker, day, PROFILE_PARTIAL_REUSE
+        )
+        if fresh:
+            coalesced_calls_total['build_profile_day'] = coalesced_calls_total.get('build_profile_day', 0) + 1
+            logger.info(f"📊 {ticker} {day} profile was just built by another worker - reusing it")
+            return 0
+        return await _build_profile_day(ticker, day)
+    finally:
+        lock_conn.terminate()  # ends the session, which releases the lock - no await to be cancelled
+
+async def _build_profile_day(ticker: str, day: date) -> int:
+    day_start = datetime.combine(day, datetime.min.time(), NY_TZ)
+    day_end = datetime.combine(day + timedelta(days=1), datetime.min.time(), NY_TZ)
+    # Today's tape is still growing - stored, but rebuilt by the next job that needs it
+    is_complete = day_end <= datetime.now(NY_TZ)
+    
+    api_calls = 0
+    source = 'market_data_cache'
+    cached = await profile_buckets_from_cache(ticker, day_start, day_end)
+    if cached is not None:
+        buckets, trades = cached
+    else:
+        source = 'polygon'
+        buckets, trades, api_calls = await profile_buckets_from_polygon(ticker, day_start, day_end)
+    
+    await store_profile_day(ticker, day, buckets, trades, source, is_complete)
+    logger.info(f"📊 Built {ticker} {day} profile from {source}: {trades:,} trades -> {len(buckets):,} buckets")
+    return api_calls
+
+async def calculate_level_volume_from_profile(ticker: str, level_price: float,
+                                              start_date: str, end_date: str,
+                                              tolerance: float = 0.025) -> Dict:
+    """
+    Volume at level ± tolerance by summing price_volume_profile buckets.
+    Days not yet profiled are built first (once per ticker/day, shared by every level).
+    """
+    if sd_db_pool is None:
+        raise RuntimeError("SD database pool not initialized")
+    
+    ticker_upper = ticker.upper()
+    days_built, api_calls = await ensure_profile_days(ticker_upper, profile_days(start_date, end_date))
+    
+    async with acquire_sd_connection(primary=days_built > 0) as conn:
+        result = await conn.fetchrow(
+            """
+            SELECT
+                COALESCE(SUM(trade_count), 0) AS total_trades,
+                COALESCE(SUM(volume), 0) AS total_volume,
+                COALESCE(SUM(value), 0) AS total_value,
+                MIN(price_bucket) AS min_price,
+                MAX(price_bucket) AS max_price
+            FROM price_volume_profile
+            WHERE ticker = $1
+              AND trade_date BETWEEN $2 AND $3
+              AND price_bucket BETWEEN ROUND($4::numeric, 4) AND ROUND($5::numeric, 4)
+            """,
+            ticker_upper, parse_date_string(start_date), parse_date_string(end_date),
+            round(level_price - tolerance, 4), round(level_price + tolerance, 4)
+        )
+    
+    total_trades = int(result['total_trades'])
+    if total_trades > 0:
+        price_range = f"${float(result['min_price']):.2f} - ${float(result['max_price']):.2f}"
+    else:
+        price_range = f"${level_price:.2f} (no trades found)"
+    
+    return {
+        'total_volume': share_volume(result['total_volume']),
+        'total_value': float(result['total_value']),
+        'total_trades': total_trades,
+        'price_range': price_range,
+        'level_price': level_price,
+        'tolerance': tolerance,
+        'api_calls_made': api_calls,
+        'profile_days_built': days_built,
+        'data_source': 'price_volume_profile'
+    }
+
+class BandIndex:
+    """
+    Sorted-interval lookup over closed price bands (which may overlap).
+    The sorted band edges split the line into slots - each edge itself and each open gap
+    between neighbours - and every slot lists the bands covering it, so a price costs
+    one bisect. Edges and prices are compared at 4 decimals (the NUMERIC scale).
+    """
+    def __init__(self, bands: List[Tuple[float, float]]):
+        self.edges = sorted({round(edge, 4) for band in bands for edge in band})
+        self.slots: List[List[int]] = [[] for _ in range(2 * len(self.edges) - 1)]
+        for band_index, (low, high) in enumerate(bands):
+            first = 2 * bisect.bisect_left(self.edges, round(low, 4))
+            last = 2 * bisect.bisect_left(self.edges, round(high, 4))
+            for slot in range(first, last + 1):
+                self.slots[slot].append(band_index)
+    
+    def lookup(self, price: float) -> List[int]:
+        """Indexes of every band containing price"""
+        price = round(price, 4)
+        position = bisect.bisect_left(self.edges, price)
+        if position < len(self.edges) and self.edges[position] == price:
+            return self.slots[2 * position]
+        if position == 0 or position == len(self.edges):
+            return []
+        return self.slots[2 * position - 1]
+
+async def ensure_profile_days(ticker: str, days: List[date]) -> Tuple[int, int]:
+    """Build any of the days not yet profiled. Returns (days built, Polygon calls)"""
+    async with acquire_sd_connection() as conn:
+        built = await conn.fetch(
+            """
+            SELECT trade_date FROM price_volume_profile_days
+            WHERE ticker = $1 AND trade_date = ANY($2::date[]) AND is_complete
+            """,
+            ticker, days
+        )
+    built_days = {row['trade_date'] for row in built}
+    missing = [day for day in days if day not in built_days]
+    
+    api_calls = 0
+    for day in missing:
+        api_calls += await build_profile_day(ticker, day)
+    return len(missing), api_calls
+
+async def calculate_band_volumes(ticker: str, bands: List[Tuple[float, float]],
+                                 start_date: str, end_date: str,
+                                 by_day: bool = False) -> Tuple[List[Dict], int]:
+    """
+    Volume in many price bands from one pass over the range's profile: the buckets
+    spanning all bands are read once, price-ordered, and each is credited to every
+    band containing it. Returns (per-band totals in input order, Polygon calls made).
+    by_day also splits each band's totals into 'days': {trade_date: [volume, value, trades]}.
+    """
+    if sd_db_pool is None:
+        raise RuntimeError("SD database pool not initialized")
+    
+    ticker_upper = ticker.upper()
+    days_built, api_calls = await ensure_profile_days(ticker_upper, profile_days(start_date, end_date))
+    
+    index = BandIndex(bands)
+    totals = [
+        {'total_volume': 0, 'total_value': 0.0, 'total_trades': 0, 'min_price': None, 'max_price': None, 'days': {}}
+        for _ in bands
+    ]
+    
+    day_column = "trade_date" if by_day else "NULL::date"
+    async with acquire_sd_connection(primary=days_built > 0) as conn:
+        rows = await conn.fetch(
+            f"""
+            SELECT {day_column} AS trade_date, price_bucket,
+                   SUM(volume) AS volume, SUM(value) AS value, SUM(trade_count) AS trade_count
+            FROM price_volume_profile
+            WHERE ticker = $1
+              AND trade_date BETWEEN $2 AND $3
+              AND price_bucket BETWEEN ROUND($4::numeric, 4) AND ROUND($5::numeric, 4)
+            GROUP BY 1, 2
+            ORDER BY price_bucket
+            """,
+            ticker_upper, parse_date_string(start_date), parse_date_string(end_date),
+            index.edges[0], index.edges[-1]
+        )
+    
+    for row in rows:
+        price = float(row['price_bucket'])
+        volume, value, trades = share_volume(row['volume']), float(row['value']), int(row['trade_count'])
+        for band_index in index.lookup(price):
+            band = totals[band_index]
+            band['total_volume'] += volume
+            band['total_value'] += value
+            band['total_trades'] += trades
+            if band['min_price'] is None:
+                band['min_price'] = price  # rows are price-ordered
+            band['max_price'] = price
+            if by_day:
+                day = band['days'].setdefault(row['trade_date'], [0, 0.0, 0])
+                day[0] += volume
+                day[1] += value
+                day[2] += trades
+    for band in totals:
+        band['total_volume'] = share_volume(band['total_volume'])
+    
+    return totals, api_calls
+
+async def write_daily_level_volume(conn, level_id: int, ticker: str, low: float, high: float,
+                                   days: List[date], day_totals: Dict[date, Any]) -> None:
+    """
+    Upsert one daily_level_volume row per day (zero rows included, so the day counts as
+    covered) for the band low..high, then refresh the level's running cumulative_volume
+    """
+    today = datetime.now(NY_TZ).date()
+    await conn.executemany(
+        """
+        INSERT INTO daily_level_volume
+        (level_id, ticker, trade_date, daily_volume, daily_value, daily_trade_count,
+         price_range_low, price_range_high, is_complete, last_updated)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, NOW())
+        ON CONFLICT (level_id, trade_date) DO UPDATE SET
+            daily_volume = EXCLUDED.daily_volume, daily_value = EXCLUDED.daily_value,
+            daily_trade_count = EXCLUDED.daily_trade_count,
+            price_range_low = EXCLUDED.price_range_low, price_range_high = EXCLUDED.price_range_high,
+            is_complete = EXCLUDED.is_complete, last_updated = NOW()
+        """,
+        [
+            (level_id, ticker, day, *(day_totals.get(day) or (0, 0.0, 0)), low, high, day < today)
+            for day in days
+        ]
+    )
+    await conn.execute(
+        """
+        UPDATE daily_level_volume d SET cumulative_volume = running.total
+        FROM (
+            SELECT id, SUM(daily_volume) OVER (ORDER BY trade_date) AS total
+            FROM daily_level_volume WHERE level_id = $1
+        ) running
+        WHERE d.id = running.id AND d.cumulative_volume IS DISTINCT FROM running.total
+        """,
+        level_id
+    )
+
+async def calculate_daily_level_volume(level_id: int, ticker: str, level_price: float,
+                                       start_date: str, end_date: str,
+                                       tolerance: float = 0.025) -> Dict:
+    """
+    Absorption over the range as the sum of the level's daily_level_volume rows. Only days
+    without a complete row for this band are computed (from the price profile), so
+    extending a window by a day touches one day of tape.
+    """
     if sd_db_pool is None:
         raise RuntimeError("SD database pool not initialized")
     
-    # Convert string dates to date objects
-    start_date_obj = parse_date_string(start_date)
-    end_date_obj = parse_date_string(end_date)
+    ticker_upper = ticker.upper()
+    low, high = round(level_price - tolerance, 4), round(level_price + tolerance, 4)
+    days = profile_days(start_date, end_date)
+    start_date_obj, end_date_obj = parse_date_string(start_date), parse_date_string(end_date)
     
-    async with sd_db_pool.acquire() as conn:
-        # Check if we have a completed fetch session for this range
-        session = await conn.fetchrow(
+    async with acquire_sd_connection() as conn:
+        covered = await conn.fetch(
             """
-            SELECT id, status, total_trades_fetched, total_api_calls, completed_at
-            FROM fetch_sessions 
-            WHERE ticker = $1 AND start_date = $2 AND end_date = $3 
-            AND status = 'completed'
-            ORDER BY completed_at DESC 
-            LIMIT 1
+            -- Float params arrive as exact binary Decimals (99.975 -> 99.97499999...), so round
+            -- them to the columns' DECIMAL(12,4) scale or a stored band never matches itself
+            SELECT trade_date FROM daily_level_volume
+            WHERE level_id = $1 AND trade_date = ANY($2::date[]) AND is_complete
+              AND price_range_low = ROUND($3::numeric, 4) AND price_range_high = ROUND($4::numeric, 4)
             """,
-            ticker.upper(), start_date_obj, end_date_obj
+            level_id, days, low, high
         )
-        
-        if session:
-            # Check actual trade count in cache
-            trade_count = await conn.fetchval(
+    covered_days = {row['trade_date'] for row in covered}
+    missing = [day for day in days if day not in covered_days]
+    
+    api_calls = 0
+    if missing:
+        _, api_calls = await ensure_profile_days(ticker_upper, missing)
+        async with acquire_sd_connection(primary=True) as conn:
+            rows = await conn.fetch(
                 """
-                SELECT COUNT(*) FROM market_data_cache 
-                WHERE ticker = $1 AND date_range_start = $2 AND date_range_end = $3
+                SELECT trade_date, SUM(volume) AS volume, SUM(value) AS value, SUM(trade_count) AS trade_count
+                FROM price_volume_profile
+                WHERE ticker = $1 AND trade_date = ANY($2::date[])
+                  AND price_bucket BETWEEN ROUND($3::numeric, 4) AND ROUND($4::numeric, 4)
+                GROUP BY trade_date
                 """,
-                ticker.upper(), start_date_obj, end_date_obj
+                ticker_upper, missing, low, high
             )
-            
-            return {
-                'has_data': True,
-                'session_id': session['id'],
-                'total_trades': trade_count,
-                'api_calls_used': session['total_api_calls'],
-                'fetched_at': session['completed_at'].isoformat(),
-                'status': 'available'
-            }
-        
-        return {
-            'has_data': False,
-            'status': 'not_available'
-        }
-
-async def calculate_level_volume_from_cache(ticker: str, level_price: float, 
-                                          start_date: str, end_date: str, 
-                                          tolerance: float = 0.025) -> Dict:
-    """Calculate volume at price level from cached data in SD database"""
-    if sd_db_pool is None:
-        raise RuntimeError("SD database pool not initialized")
-    
-    # Convert string dates to date objects
-    start_date_obj = parse_date_string(start_date)
-    end_date_obj = parse_date_string(end_date)
-    
-    min_price = level_price - tolerance
-    max_price = level_price + tolerance
+            async with conn.transaction():
+                await write_daily_level_volume(
+                    conn, level_id, ticker_upper, low, high, missing,
+                    {row['trade_date']: (share_volume(row['volume']), float(row['value']), int(row['trade_count'])) for row in rows}
+                )
     
-    async with sd_db_pool.acquire() as conn:
+    async with acquire_sd_connection(primary=bool(missing)) as conn:
         result = await conn.fetchrow(
             """
-            SELECT 
-                COUNT(*) as total_trades,
-                COALESCE(SUM(quantity), 0) as total_volume,
-                COALESCE(SUM(trade_value), 0) as total_value,
-                MIN(price) as min_price,
-                MAX(price) as max_price
-            FROM market_data_cache
-            WHERE ticker = $1 
-            AND date_range_start = $2 
-            AND date_range_end = $3
-            AND price BETWEEN $4 AND $5
+            SELECT
+                COALESCE(SUM(daily_volume), 0) AS total_volume,
+                COALESCE(SUM(daily_value), 0) AS total_value,
+                COALESCE(SUM(daily_trade_count), 0) AS total_trades
+            FROM daily_level_volume
+            WHERE level_id = $1 AND trade_date BETWEEN $2 AND $3
             """,
-            ticker.upper(), start_date_obj, end_date_obj, min_price, max_price
+            level_id, start_date_obj, end_date_obj
         )
-        
-        total_volume = result['total_volume'] or 0
-        total_value = result['total_value'] or 0
-        total_trades = result['total_trades'] or 0
-        
-        if total_trades > 0 and result['min_price'] and result['max_price']:
-            price_range = f"${float(result['min_price']):.2f} - ${float(result['max_price']):.2f}"
+    
+    logger.info(f"📅 Level {level_id}: {len(missing)} days computed, {len(days) - len(missing)} reused from daily_level_volume")
+    return {
+        'total_volume': share_volume(result['total_volume']),
+        'total_value': float(result['total_value']),
+        'total_trades': int(result['total_trades']),
+        'price_range': f"${low:.2f} - ${high:.2f}",
+        'level_price': level_price,
+        'tolerance': tolerance,
+        'api_calls_made': api_calls,
+        'days_computed': len(missing),
+        'days_reused': len(days) - len(missing),
+        'data_source': 'daily_level_volume'
+    }
+
+async def calculate_absorption_volume(level_id: int, ticker: str, level_price: float,
+                                      start_date: str, end_date: str,
+                                      tolerance: float = 0.025) -> Dict:
+    """Daily rollups first; the plain range calculation until update_sd_schema.py has run"""
+    try:
+        return await calculate_daily_level_volume(level_id, ticker, level_price, start_date, end_date, tolerance)
+    except (asyncpg.exceptions.UndefinedTableError, asyncpg.exceptions.UndefinedColumnError) as e:
+        logger.warning(f"Daily absorption rollups unavailable ({e}) - computing the whole range")
+    return await calculate_level_volume(ticker, level_price, start_date, end_date, tolerance)
+
+# (ticker, start, end) -> in-flight per-range fetch, for the pre-profile fallback path
+_range_fetches: Dict[Tuple[str, str, str], asyncio.Future] = {}
+
+async def calculate_level_volume(ticker: str, level_price: float, start_date: str,
+                                 end_date: str, tolerance: float = 0.025) -> Dict:
+    """Profile first; the per-range tick cache / full fetch only until update_sd_schema.py has run"""
+    try:
+        return await calculate_level_volume_from_profile(ticker, level_price, start_date, end_date, tolerance)
+    except asyncpg.exceptions.UndefinedTableError as e:
+        logger.warning(f"price_volume_profile unavailable ({e}) - falling back to per-range fetch")
+    
+    # Same ticker/range already being fetched here: wait for it, then read its tick cache
+    key = (ticker.upper(), start_date, end_date)
+    leader = _range_fetches.get(key)
+    if leader is not None:
+        coalesced_calls_total['range_fetch'] = coalesced_calls_total.get('range_fetch', 0) + 1
+        await asyncio.wait([leader])
+    
+    # A completed fetch of this ticker/range is answered by one aggregate query
+    availability = await check_data_availability(ticker, start_date, end_date)
+    if availability['has_data']:
+        return await calculate_level_volume_from_cache(ticker, level_price, start_date, end_date, tolerance)
+    
+    fetch = asyncio.ensure_future(
+        unlimited_fast_calculate_level_volume(ticker, level_price, start_date, end_date, tolerance)
+    )
+    if key not in _range_fetches:
+        _range_fetches[key] = fetch
+        fetch.add_done_callback(lambda _: _range_fetches.pop(key, None))
+    return await fetch
+
+# Volume/absorption job modes: the exact tape, a minute-bar estimate, or the estimate
+# refined with exact trades from just the minutes whose bars touch the band
+JOB_MODES = ('exact', 'approximate', 'refined')
+APPROXIMATE_JOB_PRIORITY = 200  # estimates take seconds - run them ahead of tape jobs
+REFINE_MERGE_GAP_MS = 5 * 60 * 1000  # touching minutes this close share one trades window
+REFINE_CONCURRENCY = 4
+POLYGON_PAGE_LIMIT = 50000
+
+async def fetch_minute_bar_estimate(ticker: str, min_price: float, max_price: float,
+                                    start_date: str, end_date: str) -> Tuple[list, List[Tuple[int, int]], int, int]:
+    """Minute bars over start..end folded by minute_bar_page_kernel: (totals, touched bars, bars, api calls)"""
+    if not POLYGON_API_KEY:
+        raise ValueError("POLYGON_API_KEY not set")
+
+    # Unadjusted, so bar prices are on the same scale as the trades tape
+    url = (
+        f"https://api.polygon.io/v2/aggs/ticker/{ticker.upper()}/range/1/minute/{start_date}/{end_date}"
+        f"?adjusted=false&sort=asc&limit={POLYGON_PAGE_LIMIT}&apiKey={POLYGON_API_KEY}"
+    )
+    totals = [0.0, 0.0, 0.0, 0, 0, 0]
+    touched: List[Tuple[int, int]] = []
+    bars = 0
+    api_calls = 0
+
+    async with httpx.AsyncClient(timeout=200.0) as client:
+        while url:
+            api_calls += 1
+            resp = await polygon_get(client, url)
+            page_bars, page_totals, page_touched, next_url = await run_cpu(
+                minute_bar_page_kernel, resp.content, min_price, max_price
+            )
+            bars += page_bars
+            for i, amount in enumerate(page_totals):
+                totals[i] += amount
+            touched.extend(page_touched)
+            url = f"{next_url}&apiKey={POLYGON_API_KEY}" if next_url else None
+
+    return totals, touched, bars, api_calls
+
+def refine_windows(touched: List[Tuple[int, int]]) -> List[Tuple[int, int, int]]:
+    """Touched bars -> (start ms, end ms, trades) windows, merging minutes within REFINE_MERGE_GAP_MS"""
+    windows: List[list] = []
+    for start_ms, bar_trades in sorted(touched):
+        if windows and start_ms - windows[-1][1] <= REFINE_MERGE_GAP_MS:
+            windows[-1][1] = start_ms + 60000
+            windows[-1][2] += bar_trades
         else:
-            price_range = f"${level_price:.2f} (no trades found)"
-        
-        return {
-            'total_volume': int(total_volume),
-            'total_value': float(total_value),
-            'total_trades': int(total_trades),
-            'price_range': price_range,
-            'level_price': level_price,
-            'tolerance': tolerance,
-            'data_source': 'market_data_cache'
-        }
+            windows.append([start_ms, start_ms + 60000, bar_trades])
+    return [tuple(window) for window in windows]
+
+async def band_totals_in_windows(ticker: str, windows: List[Tuple[int, int, int]],
+                                 min_price: float, max_price: float) -> Tuple[tuple, int]:
+    """Exact band totals from the trades tape inside each window: (totals, api calls)"""
+    semaphore = asyncio.Semaphore(REFINE_CONCURRENCY)
+
+    async def fetch_window(client: httpx.AsyncClient, start_ms: int, end_ms: int):
+        url = (
+            f"https://api.polygon.io/v3/trades/{ticker.upper()}"
+            f"?timestamp.gte={start_ms * 1000000}&timestamp.lt={end_ms * 1000000}"
+            f"&limit={POLYGON_PAGE_LIMIT}&apiKey={POLYGON_API_KEY}"
+        )
+        totals = [0, 0.0, 0, float('inf'), 0.0]
+        api_calls = 0
+        band_fraction = 0.0
+        async with semaphore:
+            while url:
+                api_calls += 1
+                resp = await polygon_get(client, url)
+                page_size, page_totals, next_url, _ = await run_cpu(
+                    band_page_kernel, resp.content, min_price, max_price,
+                    band_fraction >= VECTORIZE_MIN_BAND_FRACTION, None
+                )
+                if page_size:
+                    band_fraction = page_totals[2] / page_size
+                    totals[0] += page_totals[0]
+                    totals[1] += page_totals[1]
+                    totals[2] += page_totals[2]
+                    totals[3] = min(totals[3], page_totals[3])
+                    totals[4] = max(totals[4], page_totals[4])
+                url = f"{next_url}&apiKey={POLYGON_API_KEY}" if next_url else None
+        return totals, api_calls
+
+    async with httpx.AsyncClient(timeout=200.0) as client:
+        results = await asyncio.gather(*(fetch_window(client, start, end) for start, end, _ in windows))
+
+    volume = sum(totals[0] for totals, _ in results)
+    value = sum(totals[1] for totals, _ in results)
+    trades = sum(totals[2] for totals, _ in results)
+    low = min((totals[3] for totals, _ in results), default=float('inf'))
+    high = max((totals[4] for totals, _ in results), default=0.0)
+    return (volume, value, trades, low, high), sum(calls for _, calls in results)
+
+async def calculate_level_volume_from_minute_bars(ticker: str, level_price: float, start_date: str,
+                                                  end_date: str, tolerance: float = 0.025,
+                                                  refine: bool = False) -> Dict:
+    """
+    Estimate band volume from minute aggregates, each bar's volume spread evenly over its
+    low-high range. The true volume lies between volume_lower_bound (bars wholly inside the
+    band) and volume_upper_bound (every bar touching it).
+    refine=True swaps the estimate for exact trades from only the touching minutes - or for
+    calculate_level_volume when those windows would cost as many calls as the whole tape.
+    """
+    min_price = level_price - tolerance
+    max_price = level_price + tolerance
+    totals, touched, bars, api_calls = await fetch_minute_bar_estimate(
+        ticker, min_price, max_price, start_date, end_date
+    )
+    volume, value, trades, floor, ceiling, tape_trades = totals
+    estimate = {
+        'total_volume': int(round(volume)),
+        'total_value': value,
+        'total_trades': int(round(trades)),
+        'price_range': f"${min_price:.2f} - ${max_price:.2f}",
+        'level_price': level_price,
+        'tolerance': tolerance,
+        'api_calls_made': api_calls,
+        'volume_lower_bound': int(floor),
+        'volume_upper_bound': int(ceiling),
+        'error_bound': int(round(max(volume - floor, ceiling - volume))),
+        'bars_scanned': bars,
+        'bars_touching_band': len(touched),
+        'data_source': 'minute_bars_estimate'
+    }
+    logger.info(f"📐 {ticker} ${level_price:.2f} minute-bar estimate: {estimate['total_volume']:,} "
+                f"(±{estimate['error_bound']:,}) from {bars:,} bars, {api_calls} API calls")
+    if not refine:
+        return estimate
+
+    windows = refine_windows(touched)
+    window_calls = sum(max(1, -(-window_trades // POLYGON_PAGE_LIMIT)) for _, _, window_trades in windows)
+    tape_calls = max(1, -(-tape_trades // POLYGON_PAGE_LIMIT))
+    if window_calls >= tape_calls:
+        logger.info(f"📐 Refining {ticker} needs ~{window_calls} calls vs ~{tape_calls} for the tape - using the tape")
+        result = await calculate_level_volume(ticker, level_price, start_date, end_date, tolerance)
+        result['api_calls_made'] += api_calls
+        result['estimated_volume'] = estimate['total_volume']
+        return result
+
+    (volume, value, trades, low, high), refine_calls = await band_totals_in_windows(
+        ticker, windows, min_price, max_price
+    )
+    if trades:
+        price_range = f"${low:.2f} - ${high:.2f}"
+    else:
+        price_range = f"${level_price:.2f} (no trades found)"
+    logger.info(f"🎯 {ticker} ${level_price:.2f} refined: {volume:,} from {len(windows)} windows, {refine_calls} API calls")
+
+    return {
+        'total_volume': volume,
+        'total_value': value,
+        'total_trades': trades,
+        'price_range': price_range,
+        'level_price': level_price,
+        'tolerance': tolerance,
+        'api_calls_made': api_calls + refine_calls,
+        'estimated_volume': estimate['total_volume'],
+        'refine_windows': len(windows),
+        'bars_touching_band': len(touched),
+        'data_source': 'minute_bars_refined'
+    }
 
 async def create_sd_level(ticker: str, level_price: float, level_type: str, 
                          level_name: Optional[str] = None) -> int:
@@ -697,7 +2933,7 @@ async def create_sd_level(ticker: str, level_price: float, level_type: str,
     if sd_db_pool is None:
         raise RuntimeError("SD database pool not initialized")
     
-    async with sd_db_pool.acquire() as conn:
+    async with acquire_sd_connection(primary=True) as conn:
         level_id = await conn.fetchval(
             """
             INSERT INTO supply_demand_levels 
@@ -707,14 +2943,43 @@ async def create_sd_level(ticker: str, level_price: float, level_type: str,
             """,
             ticker.upper(), level_price, level_type, level_name, datetime.now().date()
         )
-        return level_id
+    await sync_level_mirror(ticker)
+    return level_id
 
+async def sync_level_mirror(ticker: Optional[str] = None):
+    """
+    Copy active levels into darkpool_data.sd_level_bands (one ticker after a level
+    write, everything at startup). A failed sync is logged, never raised - the
+    level write already succeeded, and the next startup re-syncs in full.
+    """
+    if sd_db_pool is None or darkpool_db_pool is None:
+        return
+    try:
+        async with acquire_sd_connection(primary=True) as conn:
+            levels = await conn.fetch(
+                """
+                SELECT id, ticker, level_price, level_type, level_name
+                FROM supply_demand_levels
+                WHERE is_active = true AND ($1::text IS NULL OR ticker = $1)
+                """,
+                ticker.upper() if ticker else None
+            )
+        if not await asyncio.to_thread(replace_mirrored_levels, [dict(l) for l in levels], ticker):
+            logger.info("Another worker is mirroring all levels into darkpool_data - skipped")
+            return
+        logger.info(f"Mirrored {len(levels)} active levels{f' for {ticker.upper()}' if ticker else ''} into darkpool_data")
+    except psycopg2.errors.UndefinedTable:
+        logger.warning("sd_level_bands missing - run update_dp_schema.py to enable /levels/{ticker}/nearby-prints")
+    except Exception as e:
+        logger.warning(f"Level mirror sync failed: {e}")
+
+@coalesced(lambda ticker: ticker.upper())
 async def get_sd_levels(ticker: str) -> List[Dict]:
     """Get SD levels from SD database"""
     if sd_db_pool is None:
         raise RuntimeError("SD database pool not initialized")
     
-    async with sd_db_pool.acquire() as conn:
+    async with acquire_sd_connection() as conn:
         levels = await conn.fetch(
             """
             SELECT l.id, l.ticker, l.level_price, l.level_type, l.level_name, 
@@ -756,7 +3021,7 @@ async def delete_sd_level(level_id: int) -> Dict:
     if sd_db_pool is None:
         raise RuntimeError("SD database pool not initialized")
     
-    async with sd_db_pool.acquire() as conn:
+    async with acquire_sd_connection(primary=True) as conn:
         # Check if level exists and get info
         level_info = await conn.fetchrow(
             "SELECT ticker, level_price, level_type, level_name FROM supply_demand_levels WHERE id = $1",
@@ -784,6 +3049,8 @@ async def delete_sd_level(level_id: int) -> Dict:
             level_id
         )
         
+        await sync_level_mirror(level_info['ticker'])
+        
         return {
             'level_id': level_id,
             'ticker': level_info['ticker'],
@@ -797,21 +3064,24 @@ async def delete_sd_level(level_id: int) -> Dict:
 
 async def delete_job_and_data(job_id: str) -> Dict:
     """Delete background job and associated data"""
-    if job_id not in jobs_db:
+    job = await get_job(job_id)
+    if job is None:
         raise ValueError(f"Job {job_id} not found")
     
-    job_info = jobs_db[job_id].copy()
+    job_info = job.copy()
     
     # Remove from memory
-    del jobs_db[job_id]
+    jobs_db.pop(job_id, None)
     
     # Remove from database
     if sd_db_pool is not None:
-        async with sd_db_pool.acquire() as conn:
-            deleted = await conn.execute(
-                "DELETE FROM background_jobs WHERE job_id = $1",
-                job_id
-            )
+        async with acquire_sd_connection(primary=True) as conn:
+            async with conn.transaction():
+                deleted = await conn.execute(
+                    "DELETE FROM background_jobs WHERE job_id = $1",
+                    job_id
+                )
+                await conn.execute("SELECT pg_notify($1, $2)", JOB_CHANNEL, job_id)
     
     return {
         'job_id': job_id,
@@ -825,7 +3095,7 @@ async def find_level_by_ticker_and_price(ticker: str, level_price: float, tolera
     if sd_db_pool is None:
         raise RuntimeError("SD database pool not initialized")
     
-    async with sd_db_pool.acquire() as conn:
+    async with acquire_sd_connection() as conn:
         level_id = await conn.fetchval(
             """
             SELECT id FROM supply_demand_levels 
@@ -839,6 +3109,18 @@ async def find_level_by_ticker_and_price(ticker: str, level_price: float, tolera
         )
         return level_id
 
+async def foreign_level_ids(conn, ticker: str, level_ids: List[int]) -> List[int]:
+    """The level_ids that don't exist or belong to another ticker"""
+    rows = await conn.fetch(
+        """
+        SELECT u.id FROM unnest($2::bigint[]) AS u(id)
+        LEFT JOIN supply_demand_levels l ON l.id = u.id AND l.ticker = $1
+        WHERE l.id IS NULL
+        """,
+        ticker.upper(), level_ids
+    )
+    return [row['id'] for row in rows]
+
 async def update_level_volume_tracking(level_id: int, ticker: str, level_price: float, 
                                      volume_data: Dict, tolerance: float, 
                                      start_date: str, end_date: str, 
@@ -847,69 +3129,127 @@ async def update_level_volume_tracking(level_id: int, ticker: str, level_price:
     if sd_db_pool is None:
         raise RuntimeError("SD database pool not initialized")
     
+    async with acquire_sd_connection(primary=True) as conn:
+        await write_level_volume_tracking(
+            conn, level_id, ticker, level_price, volume_data, tolerance,
+            start_date, end_date, is_absorption
+        )
+
+async def write_level_volume_tracking(conn, level_id: int, ticker: str, level_price: float,
+                                      volume_data: Dict, tolerance: float,
+                                      start_date: str, end_date: str,
+                                      is_absorption: bool = False) -> None:
+    """level_volume_tracking write on the caller's connection (and transaction)"""
     start_date_obj = parse_date_string(start_date)
     end_date_obj = parse_date_string(end_date)
     
-    async with sd_db_pool.acquire() as conn:
-        if is_absorption:
-            # Get current original volume to calculate absorption percentage
-            current_data = await conn.fetchrow(
-                "SELECT original_volume FROM level_volume_tracking WHERE level_id = $1",
-                level_id
-            )
+    if is_absorption:
+        # Get current original volume to calculate absorption percentage
+        current_data = await conn.fetchrow(
+            "SELECT original_volume FROM level_volume_tracking WHERE level_id = $1",
+            level_id
+        )
+        
+        if current_data and current_data['original_volume']:
+            original_volume = current_data['original_volume']
+            absorbed_volume = volume_data['total_volume']
+            absorbed_value = volume_data['total_value']
             
-            if current_data and current_data['original_volume']:
-                original_volume = current_data['original_volume']
-                absorbed_volume = volume_data['total_volume']
-                absorbed_value = volume_data['total_value']
-                
-                # Calculate absorption percentage
-                if original_volume > 0:
-                    absorption_percentage = (absorbed_volume / original_volume) * 100
-                else:
-                    absorption_percentage = 0.0
-                
-                # FIXED: Update absorption_start_date to be the END date
-                await conn.execute(
-                    """
-                    UPDATE level_volume_tracking 
-                    SET absorbed_volume = $1, absorbed_value = $2, 
-                        absorption_percentage = $3, absorption_start_date = $4,
-                        last_updated = NOW()
-                    WHERE level_id = $5
-                    """,
-                    absorbed_volume, absorbed_value, absorption_percentage, end_date_obj, level_id
-                )
+            # Calculate absorption percentage
+            if original_volume > 0:
+                absorption_percentage = (absorbed_volume / original_volume) * 100
             else:
-                raise ValueError(f"Level {level_id} has no original volume data. Set original volume first.")
-        else:
-            # Standard volume tracking (original volume)
+                absorption_percentage = 0.0
+            
+            # FIXED: Update absorption_start_date to be the END date
             await conn.execute(
                 """
-                INSERT INTO level_volume_tracking 
-                (level_id, ticker, level_price, price_range_low, price_range_high,
-                 original_volume, original_value, absorbed_volume, absorbed_value,
-                 absorption_percentage, original_date_start, original_date_end,
-                 absorption_start_date, last_updated)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, NOW())
-                ON CONFLICT (level_id) DO UPDATE SET
-                original_volume = $6, original_value = $7, 
-                original_date_start = $11, original_date_end = $12,
-                last_updated = NOW()
+                UPDATE level_volume_tracking 
+                SET absorbed_volume = $1, absorbed_value = $2, 
+                    absorption_percentage = $3, absorption_start_date = $4,
+                    last_updated = NOW()
+                WHERE level_id = $5
                 """,
-                level_id, ticker.upper(), level_price,
-                level_price - tolerance, level_price + tolerance,
-                volume_data['total_volume'], volume_data['total_value'],
-                0, 0.0, 0.0,  # Keep existing absorption data
-                start_date_obj, end_date_obj, end_date_obj  # Use end_date for absorption_start_date
+                absorbed_volume, absorbed_value, absorption_percentage, end_date_obj, level_id
             )
+        else:
+            raise ValueError(f"Level {level_id} has no original volume data. Set original volume first.")
+    else:
+        # Standard volume tracking (original volume)
+        await conn.execute(
+            """
+            INSERT INTO level_volume_tracking 
+            (level_id, ticker, level_price, price_range_low, price_range_high,
+             original_volume, original_value, absorbed_volume, absorbed_value,
+             absorption_percentage, original_date_start, original_date_end,
+             absorption_start_date, last_updated)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, NOW())
+            ON CONFLICT (level_id) DO UPDATE SET
+            original_volume = $6, original_value = $7, 
+            original_date_start = $11, original_date_end = $12,
+            last_updated = NOW()
+            """,
+            level_id, ticker.upper(), level_price,
+            level_price - tolerance, level_price + tolerance,
+            volume_data['total_volume'], volume_data['total_value'],
+            0, 0.0, 0.0,  # Keep existing absorption data
+            start_date_obj, end_date_obj, end_date_obj  # Use end_date for absorption_start_date
+        )
+
+async def store_batch_volume_results(job_id: str, ticker: str, bands: List[VolumeBand],
+                                     results: List[Dict], start_date: str, end_date: str,
+                                     is_absorption: bool,
+                                     daily: Optional[List[Dict[date, list]]] = None) -> None:
+    """
+    Every band's tracking row (and absorption segment plus daily_level_volume rows)
+    in one transaction - all or nothing
+    """
+    if sd_db_pool is None:
+        raise RuntimeError("SD database pool not initialized")
+    
+    async with acquire_sd_connection(primary=True) as conn:
+        async with conn.transaction():
+            # Rechecked here: a level can be deleted or moved while the job sat in the queue
+            foreign = await foreign_level_ids(conn, ticker, [band.level_id for band in bands])
+            if foreign:
+                raise ValueError(f"Levels {foreign} are not {ticker.upper()} levels")
+            for band, result in zip(bands, results):
+                await write_level_volume_tracking(
+                    conn, band.level_id, ticker, band.level_price, result, band.price_tolerance,
+                    start_date, end_date, is_absorption
+                )
+            if is_absorption:
+                await conn.executemany(
+                    """
+                    INSERT INTO absorption_job_segments 
+                    (job_id, level_id, volume, value, trades, date_start, date_end, created_at)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, NOW())
+                    ON CONFLICT (job_id, level_id) DO UPDATE
+                    SET volume = EXCLUDED.volume, value = EXCLUDED.value, trades = EXCLUDED.trades,
+                        date_start = EXCLUDED.date_start, date_end = EXCLUDED.date_end, created_at = NOW()
+                    """,
+                    [
+                        (job_id, band.level_id, result['total_volume'], result['total_value'],
+                         result['total_trades'], parse_date_string(start_date), parse_date_string(end_date))
+                        for band, result in zip(bands, results)
+                    ]
+                )
+            if daily is not None:
+                days = profile_days(start_date, end_date)
+                for band, day_totals in zip(bands, daily):
+                    await write_daily_level_volume(
+                        conn, band.level_id, ticker.upper(),
+                        round(band.level_price - band.price_tolerance, 4),
+                        round(band.level_price + band.price_tolerance, 4),
+                        days, day_totals
+                    )
 
 # ─── ENHANCED BACKGROUND JOB PROCESSING ─────────────────────────
 
 async def enhanced_absorption_job(job_id: str, ticker: str, level_price: float,
                                 start_date: str, end_date: str, tolerance: float,
-                                level_id: int):
-    """Enhanced absorption job with segments and unlimited API calls"""
+                                level_id: int, mode: str = 'exact'):
+    """Enhanced absorption job with segments; mode 'approximate' reports an estimate and writes nothing"""
     try:
         logger.info(f"🔥 Starting ENHANCED absorption job {job_id} for {ticker} at ${level_price:.2f}")
         
@@ -924,42 +3264,39 @@ async def enhanced_absorption_job(job_id: str, ticker: str, level_price: float,
         jobs_db[job_id]['progress'] = 30
         await update_job_in_db(job_id)
         
-        try:
-            result = await unlimited_fast_calculate_level_volume(
-                ticker, level_price, start_date, end_date, tolerance
+        if mode == 'exact':
+            result = await calculate_absorption_volume(level_id, ticker, level_price, start_date, end_date, tolerance)
+        else:
+            result = await calculate_level_volume_from_minute_bars(
+                ticker, level_price, start_date, end_date, tolerance, refine=(mode == 'refined')
             )
-            logger.info(f"⚡ UNLIMITED absorption calculation: {result['total_trades']:,} trades, {result['api_calls_made']} API calls")
-            
-        except Exception as e:
-            logger.warning(f"Unlimited method failed for absorption: {e}")
-            # Fall back to cache if available
-            availability = await check_data_availability(ticker, start_date, end_date)
-            if availability['has_data']:
-                result = await calculate_level_volume_from_cache(
-                    ticker, level_price, start_date, end_date, tolerance
-                )
-            else:
-                raise e
-        
-        jobs_db[job_id]['status'] = 'updating_level_and_segments'
-        jobs_db[job_id]['progress'] = 85
-        await update_job_in_db(job_id)
-        
-        # Update level tracking with absorption data
-        await update_level_volume_tracking(
-            level_id, ticker, level_price, result, tolerance, 
-            start_date, end_date, is_absorption=True
-        )
-        
-        # CREATE ABSORPTION JOB SEGMENT
-        await create_absorption_job_segment(
-            level_id, job_id, result, start_date, end_date
-        )
+        logger.info(f"⚡ Absorption from {result['data_source']}: {result['total_trades']:,} trades, {result['api_calls_made']} API calls")
         
         result['level_id'] = level_id
-        result['level_updated'] = True
-        result['segment_created'] = True
+        if mode == 'approximate':
+            # An estimate never lands in the level's tracked volume or timeline
+            result['level_updated'] = False
+            result['segment_created'] = False
+        else:
+            jobs_db[job_id]['status'] = 'updating_level_and_segments'
+            jobs_db[job_id]['progress'] = 85
+            await update_job_in_db(job_id)
+            
+            # Update level tracking with absorption data
+            await update_level_volume_tracking(
+                level_id, ticker, level_price, result, tolerance, 
+                start_date, end_date, is_absorption=True
+            )
+            
+            # CREATE ABSORPTION JOB SEGMENT
+            await create_absorption_job_segment(
+                level_id, job_id, result, start_date, end_date
+            )
+            result['level_updated'] = True
+            result['segment_created'] = True
+        
         result['analysis_type'] = 'absorption'
+        result['mode'] = mode
         result['job_segment_id'] = job_id
         result['absorption_end_date'] = end_date  # Track the correct end date
         
@@ -980,11 +3317,13 @@ async def enhanced_absorption_job(job_id: str, ticker: str, level_price: float,
         jobs_db[job_id]['status'] = 'failed'
         jobs_db[job_id]['error'] = str(e)
         await update_job_in_db(job_id)
+    finally:
+        _local_jobs.discard(job_id)
 
 async def enhanced_volume_job(job_id: str, ticker: str, level_price: float,
                             start_date: str, end_date: str, tolerance: float,
-                            level_id: Optional[int] = None):
-    """Enhanced volume job with unlimited API calls"""
+                            level_id: Optional[int] = None, mode: str = 'exact'):
+    """Enhanced volume job; mode 'approximate' reports an estimate without touching level tracking"""
     try:
         logger.info(f"🎯 Starting ENHANCED volume job {job_id} for {ticker} at ${level_price:.2f}")
         
@@ -998,28 +3337,23 @@ async def enhanced_volume_job(job_id: str, ticker: str, level_price: float,
         jobs_db[job_id]['progress'] = 30
         await update_job_in_db(job_id)
         
-        try:
-            result = await unlimited_fast_calculate_level_volume(
-                ticker, level_price, start_date, end_date, tolerance
+        if mode == 'exact':
+            result = await calculate_level_volume(ticker, level_price, start_date, end_date, tolerance)
+        else:
+            result = await calculate_level_volume_from_minute_bars(
+                ticker, level_price, start_date, end_date, tolerance, refine=(mode == 'refined')
             )
-            logger.info(f"⚡ UNLIMITED volume calculation: {result['total_trades']:,} trades, {result['api_calls_made']} API calls")
-            
-        except Exception as e:
-            logger.warning(f"Unlimited volume method failed, checking cache: {e}")
-            availability = await check_data_availability(ticker, start_date, end_date)
-            if availability['has_data']:
-                result = await calculate_level_volume_from_cache(
-                    ticker, level_price, start_date, end_date, tolerance
-                )
-            else:
-                raise e
+        logger.info(f"⚡ Volume from {result['data_source']}: {result['total_trades']:,} trades, {result['api_calls_made']} API calls")
         
         # Update level tracking
         target_level_id = level_id
         if not target_level_id:
             target_level_id = await find_level_by_ticker_and_price(ticker, level_price, 0.10)
         
-        if target_level_id:
+        if mode == 'approximate':
+            result['level_id'] = target_level_id
+            result['level_updated'] = False
+        elif target_level_id:
             logger.info(f"🔄 Updating level {target_level_id} with volume data")
             await update_level_volume_tracking(
                 target_level_id, ticker, level_price, result, tolerance, 
@@ -1032,24 +3366,288 @@ async def enhanced_volume_job(job_id: str, ticker: str, level_price: float,
             result['level_updated'] = False
         
         result['analysis_type'] = 'volume'
+        result['mode'] = mode
+        
+        # Mark as completed
+        jobs_db[job_id]['status'] = 'completed'
+        jobs_db[job_id]['progress'] = 100
+        jobs_db[job_id]['api_calls_used'] = result['api_calls_made']
+        jobs_db[job_id]['result'] = {
+            'market_data': result,
+            'message': f'ENHANCED Volume calculation completed: {result["total_trades"]:,} trades analyzed with unlimited API calls'
+        }
+        await update_job_in_db(job_id)
+        
+        logger.info(f"✅ ENHANCED volume job {job_id} completed: {result['total_trades']:,} trades")
+        
+    except Exception as e:
+        logger.error(f"❌ ENHANCED volume job {job_id} failed: {e}")
+        jobs_db[job_id]['status'] = 'failed'
+        jobs_db[job_id]['error'] = str(e)
+        await update_job_in_db(job_id)
+    finally:
+        _local_jobs.discard(job_id)
+
+async def enhanced_batch_volume_job(job_id: str, ticker: str, start_date: str, end_date: str,
+                                    bands: List[VolumeBand], is_absorption: bool):
+    """Many levels of one ticker/range from a single pass over its volume profile"""
+    try:
+        logger.info(f"🎯 Starting batch {'absorption' if is_absorption else 'volume'} job {job_id}: {ticker} x {len(bands)} levels")
+        
+        jobs_db[job_id]['status'] = 'batch_calculation_in_progress'
+        jobs_db[job_id]['progress'] = 30
+        await update_job_in_db(job_id)
+        
+        totals, api_calls = await calculate_band_volumes(
+            ticker,
+            [(band.level_price - band.price_tolerance, band.level_price + band.price_tolerance) for band in bands],
+            start_date, end_date, by_day=is_absorption
+        )
+        
+        results = []
+        for band, total in zip(bands, totals):
+            if total['total_trades'] > 0:
+                price_range = f"${total['min_price']:.2f} - ${total['max_price']:.2f}"
+            else:
+                price_range = f"${band.level_price:.2f} (no trades found)"
+            results.append({
+                'level_id': band.level_id,
+                'level_price': band.level_price,
+                'tolerance': band.price_tolerance,
+                'total_volume': total['total_volume'],
+                'total_value': total['total_value'],
+                'total_trades': total['total_trades'],
+                'price_range': price_range,
+                'analysis_type': 'absorption' if is_absorption else 'volume'
+            })
+        
+        jobs_db[job_id]['status'] = 'updating_levels' + ('_and_segments' if is_absorption else '')
+        jobs_db[job_id]['progress'] = 85
+        await update_job_in_db(job_id)
+        
+        await store_batch_volume_results(
+            job_id, ticker, bands, results, start_date, end_date, is_absorption,
+            daily=[total['days'] for total in totals] if is_absorption else None
+        )
         
-        # Mark as completed
         jobs_db[job_id]['status'] = 'completed'
         jobs_db[job_id]['progress'] = 100
-        jobs_db[job_id]['api_calls_used'] = result['api_calls_made']
+        jobs_db[job_id]['api_calls_used'] = api_calls
         jobs_db[job_id]['result'] = {
-            'market_data': result,
-            'message': f'ENHANCED Volume calculation completed: {result["total_trades"]:,} trades analyzed with unlimited API calls'
+            'levels': results,
+            'api_calls_made': api_calls,
+            'data_source': 'price_volume_profile',
+            'message': f'Batch calculation completed for {len(results)} levels'
         }
         await update_job_in_db(job_id)
         
-        logger.info(f"✅ ENHANCED volume job {job_id} completed: {result['total_trades']:,} trades")
+        logger.info(f"✅ Batch job {job_id} completed: {len(results)} levels, {api_calls} API calls")
         
     except Exception as e:
-        logger.error(f"❌ ENHANCED volume job {job_id} failed: {e}")
+        logger.error(f"❌ Batch job {job_id} failed: {e}")
         jobs_db[job_id]['status'] = 'failed'
         jobs_db[job_id]['error'] = str(e)
         await update_job_in_db(job_id)
+    finally:
+        _local_jobs.discard(job_id)
+
+# ─── PERSISTENT JOB QUEUE ────────────────────────────────────────
+
+# Jobs are rows in job_queue, claimed by worker loops (in each API process when
+# JOB_RUNNER=inline, else in `python main.py worker`). A running job heartbeats; one
+# whose worker died goes back on the queue and is re-run from the start.
+
+JOB_PRIORITIES = {'absorption': 100, 'volume': 50, 'batch': 10}  # interactive before bulk
+JOB_POLL_SECONDS = 1.0
+JOB_HEARTBEAT_SECONDS = 15
+JOB_STALE_AFTER = timedelta(seconds=90)
+JOB_MAX_ATTEMPTS = 3
+JOB_WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+JOB_HANDLERS: Dict[str, Callable[..., Any]] = {
+    'volume': enhanced_volume_job,
+    'absorption': enhanced_absorption_job,
+    'batch': lambda job_id, bands, **kwargs: enhanced_batch_volume_job(
+        job_id, bands=[VolumeBand(**band) for band in bands], **kwargs
+    ),
+}
+
+_job_queue_wakeup = asyncio.Event()
+
+async def enqueue_job(job_id: str, kind: str, ticker: str, payload: Dict,
+                      priority: Optional[int] = None):
+    """Queue a job whose background_jobs row already exists; payload = handler kwargs"""
+    async with acquire_sd_connection(primary=True) as conn:
+        await conn.execute(
+            """
+            INSERT INTO job_queue (job_id, kind, ticker, priority, payload)
+            VALUES ($1, $2, $3, $4, $5)
+            """,
+            job_id, kind, ticker.upper(),
+            JOB_PRIORITIES[kind] if priority is None else priority,
+            json.dumps(payload)
+        )
+    _job_queue_wakeup.set()
+
+async def claim_next_job():
+    """
+    Highest priority first; within a priority, tickers with fewer running jobs first, then
+    oldest. A ticker already at JOB_MAX_PER_TICKER running jobs is skipped. Claims are
+    serialized so those counts can't race between workers.
+    """
+    async with acquire_sd_connection(primary=True) as conn:
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext('job_queue_claim'))")
+            return await conn.fetchrow(
+                """
+                WITH running AS (
+                    SELECT ticker, COUNT(*) AS jobs FROM job_queue
+                    WHERE status = 'running'
+                    GROUP BY ticker
+                ), candidate AS (
+                    SELECT q.job_id FROM job_queue q
+                    LEFT JOIN running r ON r.ticker = q.ticker
+                    WHERE q.status = 'queued' AND COALESCE(r.jobs, 0) < $2
+                    ORDER BY q.priority DESC, COALESCE(r.jobs, 0), q.enqueued_at
+                    LIMIT 1
+                    FOR UPDATE OF q SKIP LOCKED
+                )
+                UPDATE job_queue SET
+                    status = 'running', worker_id = $1, attempts = job_queue.attempts + 1,
+                    started_at = NOW(), heartbeat_at = NOW()
+                FROM candidate
+                WHERE job_queue.job_id = candidate.job_id
+                RETURNING job_queue.job_id, job_queue.kind, job_queue.payload, job_queue.attempts
+                """,
+                JOB_WORKER_ID, JOB_MAX_PER_TICKER
+            )
+
+async def set_queue_status(job_id: str, status: str):
+    """done / failed when a run ends, queued to hand a job back on shutdown"""
+    async with acquire_sd_connection(primary=True) as conn:
+        await conn.execute(
+            """
+            UPDATE job_queue SET status = $2, worker_id = NULL,
+                finished_at = CASE WHEN $2 IN ('done', 'failed') THEN NOW() END
+            WHERE job_id = $1
+            """,
+            job_id, status
+        )
+
+async def heartbeat_job(job_id: str):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            async with acquire_sd_connection(primary=True) as conn:
+                await conn.execute("UPDATE job_queue SET heartbeat_at = NOW() WHERE job_id = $1", job_id)
+        except Exception as e:
+            logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+
+async def requeue_stale_jobs():
+    """Jobs whose worker stopped heartbeating: back on the queue, or failed after JOB_MAX_ATTEMPTS"""
+    async with acquire_sd_connection(primary=True) as conn:
+        rows = await conn.fetch(
+            """
+            UPDATE job_queue SET
+                status = CASE WHEN attempts >= $2 THEN 'failed' ELSE 'queued' END,
+                worker_id = NULL,
+                finished_at = CASE WHEN attempts >= $2 THEN NOW() END
+            WHERE status = 'running' AND heartbeat_at < NOW() - $1::interval
+            RETURNING job_id, kind, status, attempts
+            """,
+            JOB_STALE_AFTER, JOB_MAX_ATTEMPTS
+        )
+    
+    for row in rows:
+        job = await get_job(row['job_id'])
+        if job is None:
+            continue
+        if row['status'] == 'failed':
+            logger.error(f"❌ Job {row['job_id']} lost its worker {row['attempts']} times - giving up")
+            job.update(status='failed', error=f"Worker lost {row['attempts']} times")
+            jobs_finished_total[(row['kind'], 'failed')] = jobs_finished_total.get((row['kind'], 'failed'), 0) + 1
+        else:
+            logger.warning(f"🔄 Job {row['job_id']} lost its worker - requeued (attempt {row['attempts']})")
+            job.update(status='queued', progress=0)
+            jobs_requeued_total[row['kind']] = jobs_requeued_total.get(row['kind'], 0) + 1
+        await save_job_to_db(row['job_id'], job)
+    if rows:
+        _job_queue_wakeup.set()
+
+async def run_queued_job(job_id: str, kind: str, payload: Dict):
+    job = await get_job(job_id)
+    if job is None:
+        await set_queue_status(job_id, 'failed')  # deleted while queued
+        return
+    
+    jobs_db[job_id] = job
+    _local_jobs.add(job_id)
+    heartbeat = asyncio.create_task(heartbeat_job(job_id))
+    try:
+        await JOB_HANDLERS[kind](job_id, **payload)
+    except asyncio.CancelledError:
+        # Shutting down: hand the job back now instead of waiting for it to go stale
+        await set_queue_status(job_id, 'queued')
+        raise
+    finally:
+        heartbeat.cancel()
+        _local_jobs.discard(job_id)
+    
+    outcome = 'done' if jobs_db.get(job_id, {}).get('status') == 'completed' else 'failed'
+    await set_queue_status(job_id, outcome)
+    jobs_finished_total[(kind, outcome)] = jobs_finished_total.get((kind, outcome), 0) + 1
+    if not job_listener_connected:
+        jobs_db.pop(job_id, None)  # nothing would invalidate it; get_job reads through
+
+async def job_worker_loop(slot: int):
+    while True:
+        try:
+            row = await claim_next_job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Job worker {slot} could not claim: {e}")
+            row = None
+        
+        if row is None:
+            _job_queue_wakeup.clear()
+            try:
+                await asyncio.wait_for(_job_queue_wakeup.wait(), JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        
+        logger.info(f"🧵 Worker {slot} running {row['kind']} job {row['job_id']} (attempt {row['attempts']})")
+        try:
+            await run_queued_job(row['job_id'], row['kind'], json.loads(row['payload']))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Job {row['job_id']} crashed its worker: {e}")
+
+async def reap_stale_jobs_forever():
+    while True:
+        try:
+            await requeue_stale_jobs()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Stale job check failed: {e}")
+        await asyncio.sleep(JOB_STALE_AFTER.total_seconds() / 3)
+
+async def run_job_workers(concurrency: int):
+    """concurrency claim-and-run loops plus the stale-job reaper, until cancelled"""
+    logger.info(f"🧵 Starting {concurrency} job workers ({JOB_WORKER_ID})")
+    await asyncio.gather(reap_stale_jobs_forever(), *(job_worker_loop(slot) for slot in range(concurrency)))
+
+async def run_job_worker_process():
+    """`python main.py worker` - job CPU stays out of the API processes' event loops"""
+    await init_sd_db_pool()
+    try:
+        await run_job_workers(JOB_CONCURRENCY)
+    finally:
+        await close_db_pools()
+        shutdown_cpu_pool()
 
 # ─── FASTAPI APP CREATION ────────────────────────────────────────
 
@@ -1068,6 +3666,353 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def resolve_route_path(scope) -> str:
+    """Route template (e.g. /dp/allblocks/{ticker}) so metrics don't explode per ticker"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, 'path', scope['path'])
+    return 'unmatched'
+
+class AdmissionControlMiddleware:
+    """
+    Pure ASGI middleware (BaseHTTPMiddleware can't observe disconnects mid-request):
+    - per-route concurrency caps, answering 503 + Retry-After instead of queueing on the pool
+    - per-route statement_timeout, picked up by the DB connection helpers
+    - client disconnect before the response completes cancels in-flight psycopg2 queries
+      (conn.cancel()) and the handler task, which makes asyncpg cancel server-side too.
+      Queries of a coalesced call that other requests still wait on are left running;
+      the handler task only stops waiting for them.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self.in_flight: Dict[str, int] = {}
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        route = resolve_route_path(scope)
+        limit = ROUTE_LIMITS.get(route)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        if limit.max_concurrent is not None and self.in_flight.get(route, 0) >= limit.max_concurrent:
+            requests_rejected_total[route] = requests_rejected_total.get(route, 0) + 1
+            response = JSONResponse(
+                {'detail': f'Too many concurrent requests for {route}, retry shortly'},
+                status_code=503,
+                headers={'Retry-After': str(ADMISSION_RETRY_AFTER)}
+            )
+            await response(scope, receive, send)
+            return
+        
+        self.in_flight[route] = self.in_flight.get(route, 0) + 1
+        request_statement_timeout.set(limit.statement_timeout)
+        active_connections: Dict[Any, Any] = {}
+        request_active_connections.set(active_connections)
+        
+        # Pump the client's messages ourselves so a disconnect is seen while the handler runs
+        messages: asyncio.Queue = asyncio.Queue()
+        disconnected = asyncio.Event()
+        response_started = False
+        response_complete = False
+        
+        async def pump_receive():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message['type'] == 'http.disconnect':
+                    disconnected.set()
+                    return
+        
+        async def send_wrapper(message):
+            nonlocal response_started, response_complete
+            if message['type'] == 'http.response.start':
+                response_started = True
+            elif message['type'] == 'http.response.body' and not message.get('more_body', False):
+                response_complete = True
+            await send(message)
+        
+        pump_task = asyncio.create_task(pump_receive())
+        app_task = asyncio.create_task(self.app(scope, messages.get, send_wrapper))
+        disconnect_task = asyncio.create_task(disconnected.wait())
+        try:
+            done, _ = await asyncio.wait({app_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+            # After the response is sent the server reports a disconnect too - background
+            # tasks still running inside app_task must not be cancelled by that
+            if app_task not in done and not response_complete:
+                requests_cancelled_total[route] = requests_cancelled_total.get(route, 0) + 1
+                with _active_connections_lock:
+                    held = list(active_connections.items())
+                # A coalesced query other requests are waiting on keeps running for them
+                to_cancel = [(conn, flight) for conn, flight in held if flight is None or flight.waiters <= 1]
+                logger.info(f"Client disconnected from {route}; cancelling {len(to_cancel)} of {len(held)} queries")
+                for conn, flight in to_cancel:
+                    if flight is not None:
+                        flight.cancelled = True  # anyone who joins late re-runs instead of failing
+                    try:
+                        conn.cancel()
+                    except Exception as e:
+                        logger.warning(f"Query cancel failed: {e}")
+                app_task.cancel()
+                await asyncio.gather(app_task, return_exceptions=True)
+                if not response_started:
+                    # Nobody is listening, but outer middleware still expects a response
+                    await JSONResponse({'detail': 'Client closed request'}, status_code=499)(scope, receive, send)
+                return
+            await asyncio.gather(app_task, return_exceptions=True)
+            if not app_task.cancelled() and app_task.exception():
+                raise app_task.exception()
+        finally:
+            self.in_flight[route] -= 1
+            pump_task.cancel()
+            disconnect_task.cancel()
+
+app.add_middleware(AdmissionControlMiddleware)
+
+# ─── CONDITIONAL GET (ETAGS) ─────────────────────────────────────
+
+# Cheap per-resource version stamps. The ETag hashes the stamp with the full request
+# path and query, so different pages/formats/filters never share a tag.
+VERSION_STAMP_TIMEOUT = 2  # seconds; stamps run before admission control, so not under a route's limit
+
+def darkpool_version(table_name: str, scope: str, params: Tuple = ()) -> str:
+    """Newest trade_time and id for one ticker, a ticker list, or the whole table"""
+    conn = get_darkpool_connection()
+    try:
+        with conn.cursor() as cur:
+            execute_prepared(cur, version_statement(table_name, scope), params)
+            row = cur.fetchone()
+    finally:
+        release_darkpool_connection(conn)
+    return str(row[0] if row else None)
+
+async def sd_levels_version(ticker: str) -> str:
+    """Active level ids plus the newest volume/segment write for the ticker's levels"""
+    async with acquire_sd_connection() as conn:
+        row = await conn.fetchrow(
+            """
+            SELECT
+                (SELECT string_agg(l.id::text, ',' ORDER BY l.id)
+                 FROM supply_demand_levels l WHERE l.ticker = $1 AND l.is_active) AS level_ids,
+                (SELECT max(v.last_updated)
+                 FROM level_volume_tracking v JOIN supply_demand_levels l ON l.id = v.level_id
+                 WHERE l.ticker = $1 AND l.is_active) AS volume_updated,
+                (SELECT count(*) || ':' || COALESCE(max(s.id), 0)
+                 FROM absorption_job_segments s JOIN supply_demand_levels l ON l.id = s.level_id
+                 WHERE l.ticker = $1 AND l.is_active) AS segments
+            """,
+            ticker.upper()
+        )
+    return "|".join(str(value) for value in row)
+
+def _ticker_stamp(table_name: str, dated: bool = False):
+    # dated: the response covers "the last N days", so it also changes at NY midnight
+    async def stamp(path_params: Dict[str, str], query: Dict[str, str]) -> str:
+        version = await asyncio.to_thread(darkpool_version, table_name, 'ticker', (path_params['ticker'].upper(),))
+        return f"{version}|{datetime.now(NY_TZ).date()}" if dated else version
+    return stamp
+
+def _batch_stamp(table_name: str):
+    async def stamp(path_params: Dict[str, str], query: Dict[str, str]) -> str:
+        tickers = parse_ticker_list(query.get('tickers', ''))
+        return await asyncio.to_thread(darkpool_version, table_name, 'tickers', (tickers,))
+    return stamp
+
+def _table_stamp(table_name: str):
+    async def stamp(path_params: Dict[str, str], query: Dict[str, str]) -> str:
+        version = await asyncio.to_thread(darkpool_version, table_name, 'all')
+        return f"{version}|{datetime.now(NY_TZ).date()}"
+    return stamp
+
+async def _levels_stamp(path_params: Dict[str, str], query: Dict[str, str]) -> str:
+    return await sd_levels_version(path_params['ticker'])
+
+# route path -> async (path_params, query_params) -> version string
+RESOURCE_VERSIONS: Dict[str, Callable] = {
+    '/dp/allblocks/{ticker}': _ticker_stamp('block_trades'),
+    '/dp/alldp/{ticker}': _ticker_stamp('block_trades'),
+    '/lit/all/{ticker}': _ticker_stamp('lit_trades'),
+    '/dp/daily/{ticker}': _ticker_stamp('block_trades', dated=True),
+    '/lit/daily/{ticker}': _ticker_stamp('lit_trades', dated=True),
+    '/dp/allblocks/{ticker}/daily': _ticker_stamp('block_trades'),
+    '/lit/all/{ticker}/daily': _ticker_stamp('lit_trades'),
+    '/dp/batch/allblocks': _batch_stamp('block_trades'),
+    '/dp/batch/alldp': _batch_stamp('block_trades'),
+    '/lit/batch/all': _batch_stamp('lit_trades'),
+    '/dp/bigprints': _table_stamp('block_trades'),
+    '/lit/bigprints': _table_stamp('lit_trades'),
+    '/levels/{ticker}': _levels_stamp,
+    '/levels/{ticker}/enhanced-timeline': _levels_stamp,
+    '/levels/{ticker}/timeline': _levels_stamp,
+}
+
+def make_etag(scope, version: str) -> str:
+    material = f"{scope['path']}?{scope.get('query_string', b'').decode()}|{version}"
+    return 'W/"' + hashlib.sha1(material.encode()).hexdigest()[:20] + '"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as RFC 9110 requires for If-None-Match"""
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return any(tag.removeprefix('W/') == etag.removeprefix('W/') for tag in candidates)
+
+def resolve_route_match(scope) -> Tuple[str, Dict[str, Any]]:
+    """resolve_route_path plus the matched path parameters"""
+    for route in app.router.routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, 'path', scope['path']), child_scope.get('path_params', {})
+    return 'unmatched', {}
+
+class ConditionalGetMiddleware:
+    """
+    ETag on versioned GET resources. A matching If-None-Match is answered 304 after
+    the stamp query alone - the handler, its queries and serialization never run.
+    Sits outside admission control so revalidations don't take a concurrency slot; the
+    stamp queries run under VERSION_STAMP_TIMEOUT instead of the route's statement_timeout.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD'):
+            await self.app(scope, receive, send)
+            return
+        
+        route, path_params = resolve_route_match(scope)
+        stamp = RESOURCE_VERSIONS.get(route)
+        if stamp is None:
+            await self.app(scope, receive, send)
+            return
+        
+        query = dict(parse_qsl(scope.get('query_string', b'').decode()))
+        token = request_statement_timeout.set(VERSION_STAMP_TIMEOUT)
+        try:
+            etag = make_etag(scope, await stamp(path_params, query))
+        except Exception as e:
+            # Bad input (the handler will report it) or the stamp query failed - serve uncached
+            logger.debug(f"No ETag for {route}: {e}")
+            etag = None
+        finally:
+            request_statement_timeout.reset(token)
+        if etag is None:
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict((k.decode().lower(), v.decode()) for k, v in scope['headers'])
+        if_none_match = headers.get('if-none-match')
+        if if_none_match and etag_matches(if_none_match, etag):
+            not_modified_total[route] = not_modified_total.get(route, 0) + 1
+            await Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})(scope, receive, send)
+            return
+        
+        async def send_with_etag(message):
+            if message['type'] == 'http.response.start' and message['status'] == 200:
+                message['headers'] = list(message.get('headers', [])) + [
+                    (b'etag', etag.encode()), (b'cache-control', b'no-cache')
+                ]
+            await send(message)
+        
+        await self.app(scope, receive, send_with_etag)
+
+app.add_middleware(ConditionalGetMiddleware)
+
+class ReadReplicaRoutingMiddleware:
+    """Mark GET/HEAD requests as replica-eligible; the DB helpers still apply the lag guard per checkout"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD')
+                or resolve_route_path(scope) in PRIMARY_ONLY_GET_ROUTES):
+            await self.app(scope, receive, send)
+            return
+        
+        token = request_prefers_replica.set(True)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_prefers_replica.reset(token)
+
+app.add_middleware(ReadReplicaRoutingMiddleware)
+
+class RequestInstrumentationMiddleware:
+    """
+    Per-route latency, in-flight gauge, DB wait/held split and the slow-request ring buffer.
+    Pure ASGI so the clock stops at the last body message - a streamed response counts
+    until it has finished streaming, not when its headers go out.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope['method']
+        route = resolve_route_path(scope)
+        key = (method, route)
+        timing = {'db_wait': 0.0, 'db_exec': 0.0, 'db_calls': 0}
+        token = request_db_timing.set(timing)
+        requests_in_flight[key] = requests_in_flight.get(key, 0) + 1
+        started = time.perf_counter()
+        status_code = 500
+        finished = None
+        
+        async def send_wrapper(message):
+            nonlocal status_code, finished
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                finished = time.perf_counter()
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Background tasks run after the last body message - they aren't the client's wait
+            elapsed = (finished or time.perf_counter()) - started
+            requests_in_flight[key] -= 1
+            request_db_timing.reset(token)
+            REQUEST_LATENCY.observe(key, elapsed)
+            REQUEST_DB_TIME.observe(key, timing['db_exec'])
+            requests_total[(method, route, status_code)] = requests_total.get((method, route, status_code), 0) + 1
+            
+            if elapsed >= SLOW_REQUEST_SECONDS:
+                slow_requests.append({
+                    'completed_at': datetime.now(timezone.utc).isoformat(),
+                    'method': method,
+                    'route': route,
+                    'path': scope['path'],
+                    'query': scope.get('query_string', b'').decode(),
+                    'status': status_code,
+                    'duration_ms': round(elapsed * 1000, 1),
+                    'db_wait_ms': round(timing['db_wait'] * 1000, 1),
+                    'db_exec_ms': round(timing['db_exec'] * 1000, 1),
+                    'app_ms': round((elapsed - timing['db_wait'] - timing['db_exec']) * 1000, 1),
+                    'db_checkouts': timing['db_calls']
+                })
+
+app.add_middleware(RequestInstrumentationMiddleware)
+
+@app.exception_handler(psycopg2.errors.QueryCanceled)
+@app.exception_handler(asyncpg.exceptions.QueryCanceledError)
+async def statement_timeout_handler(request: Request, exc: Exception):
+    return JSONResponse(
+        {'detail': 'Query exceeded the statement timeout for this endpoint'},
+        status_code=504
+    )
+
 # ─── API ENDPOINTS ───────────────────────────────────────────────
 
 @app.get("/")
@@ -1096,6 +4041,8 @@ async def health_check():
         "sd_db": SD_DB_NAME,
         "unified": True,
         "enhanced": True,
+        "read_replicas": {db: status for db, status in replica_status.items() if status['configured']},
+        "job_runner": JOB_RUNNER,
         "features": [
             "unlimited_api_calls",
             "job_segments",
@@ -1106,87 +4053,193 @@ async def health_check():
         "version": "20.0.0-ENHANCED"
     }
 
-# ─── ORIGINAL DARKPOOL ENDPOINTS (UNCHANGED) ─────────────────────
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    return render_prometheus_metrics()
 
-@app.get("/dp/allblocks/{ticker}", response_model=List[BlockTrade], summary="Block trades outside NYSE hours")
-def get_all_blocks(ticker: str, percentile: float = Query(0.98, ge=0, le=1)):
-    floor = get_dynamic_threshold(ticker, percentile, 'block_trades')
-    conn = get_darkpool_connection()
+@app.get("/debug/slow-requests")
+async def get_slow_requests(limit: int = Query(50, ge=1, le=SLOW_REQUEST_BUFFER_SIZE)):
+    """Most recent requests slower than SLOW_REQUEST_SECONDS, newest first"""
+    return {
+        'threshold_seconds': SLOW_REQUEST_SECONDS,
+        'requests': list(reversed(slow_requests))[:limit]
+    }
+
+@app.get("/debug/profile", include_in_schema=False)
+async def profile_live_process(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    fmt: str = Query("speedscope", alias="format", pattern="^(speedscope|collapsed)$"),
+    x_debug_token: Optional[str] = Header(None)
+):
+    """Sample all threads (including the event loop) of the running process for N seconds"""
+    if not DEBUG_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling disabled - set DEBUG_API_TOKEN")
+    if not x_debug_token or not hmac.compare_digest(x_debug_token, DEBUG_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+    if not profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile capture is already running")
+    
     try:
-        sql = """
-            SELECT
-              ticker, quantity, price::float, trade_value::float,
-              (trade_time AT TIME ZONE 'America/New_York') AS trade_time,
-              conditions
-            FROM block_trades
-            WHERE ticker = %s AND trade_value >= %s
-              AND (trade_time AT TIME ZONE 'America/New_York')::time NOT BETWEEN '09:30:00' AND '16:00:00'
-            ORDER BY trade_time DESC LIMIT 500;
-        """
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql, (ticker.upper(), floor))
-            return cur.fetchall()
+        # Sampling runs in a worker thread; this coroutine's own thread is the event loop
+        stacks, elapsed = await asyncio.to_thread(
+            sample_thread_stacks, seconds, PROFILE_INTERVAL, threading.get_ident()
+        )
     finally:
-        release_darkpool_connection(conn)
+        profile_lock.release()
+    
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    if fmt == 'collapsed':
+        return PlainTextResponse(
+            to_collapsed_stacks(stacks),
+            headers={'Content-Disposition': f'attachment; filename="profile-{stamp}.collapsed.txt"'}
+        )
+    return Response(
+        dumps_json(to_speedscope(stacks, elapsed, PROFILE_INTERVAL)),
+        media_type="application/json",
+        headers={'Content-Disposition': f'attachment; filename="profile-{stamp}.speedscope.json"'}
+    )
+
+# ─── DARKPOOL ENDPOINTS ──────────────────────────────────────────
+
+@app.get("/dp/allblocks/{ticker}", response_model=List[BlockTrade], summary="Block trades outside NYSE hours")
+def get_all_blocks(
+    ticker: str,
+    response: Response,
+    percentile: float = Query(0.98, ge=0, le=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+    stream: bool = Query(False, description="Stream full history as NDJSON")
+):
+    floor = get_dynamic_threshold(ticker, percentile, 'block_trades')
+    return ticker_trades_response('block_trades', ticker, floor, 'off_hours', response, limit, cursor, stream, fmt)
+
+@app.get("/dp/allblocks/{ticker}/daily", response_model=List[ListingDayTotal],
+         summary="Day totals of the /dp/allblocks population")
+def get_all_blocks_daily(
+    ticker: str,
+    start_date: str = Query(..., description="YYYY-MM-DD, New York"),
+    end_date: str = Query(..., description="YYYY-MM-DD, New York"),
+    percentile: float = Query(0.98, ge=0, le=1),
+    min_value: Optional[float] = Query(None, description="X-Value-Floor of the listing page (overrides percentile)")
+):
+    floor = min_value if min_value is not None else get_dynamic_threshold(ticker, percentile, 'block_trades')
+    return listing_day_totals_response('block_trades', ticker, floor, 'off_hours', start_date, end_date)
 
 @app.get("/dp/alldp/{ticker}", response_model=List[BlockTrade], summary="Block trades during market hours")
-def get_all_dark_pool(ticker: str, percentile: float = Query(0.98, ge=0, le=1)):
+def get_all_dark_pool(
+    ticker: str,
+    response: Response,
+    percentile: float = Query(0.98, ge=0, le=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+    stream: bool = Query(False, description="Stream full history as NDJSON")
+):
     floor = get_dynamic_threshold(ticker, percentile, 'block_trades')
-    conn = get_darkpool_connection()
-    try:
-        sql = """
-            SELECT
-              ticker, quantity, price::float, trade_value::float,
-              (trade_time AT TIME ZONE 'America/New_York') AS trade_time,
-              conditions
-            FROM block_trades
-            WHERE ticker = %s AND trade_value >= %s
-              AND (trade_time AT TIME ZONE 'America/New_York')::time BETWEEN '09:30:00' AND '16:00:00'
-            ORDER BY trade_time DESC LIMIT 500;
-        """
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql, (ticker.upper(), floor))
-            return cur.fetchall()
-    finally:
-        release_darkpool_connection(conn)
+    return ticker_trades_response('block_trades', ticker, floor, 'market_hours', response, limit, cursor, stream, fmt)
+
+@app.get("/dp/batch/allblocks", response_model=Dict[str, List[BlockTrade]], summary="Off-hours block trades for a watchlist")
+def get_batch_all_blocks(
+    tickers: str = Query(..., description="Comma-separated tickers, e.g. NVDA,AAPL,TSLA"),
+    percentile: float = Query(0.98, ge=0, le=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Trades per ticker"),
+    fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN)
+):
+    return batch_trades_response('block_trades', tickers, percentile, 'off_hours', limit, fmt)
+
+@app.get("/dp/batch/alldp", response_model=Dict[str, List[BlockTrade]], summary="Market-hours block trades for a watchlist")
+def get_batch_all_dark_pool(
+    tickers: str = Query(..., description="Comma-separated tickers, e.g. NVDA,AAPL,TSLA"),
+    percentile: float = Query(0.98, ge=0, le=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Trades per ticker"),
+    fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN)
+):
+    return batch_trades_response('block_trades', tickers, percentile, 'market_hours', limit, fmt)
 
 @app.get("/dp/bigprints", response_model=List[BlockTrade], summary="Top block trades by value")
 def get_dp_big_prints(
     days: int = Query(1, ge=1, le=30),
-    market_hours_only: bool = Query(False)
+    market_hours_only: bool = Query(False),
+    fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN)
 ):
+    if fmt != 'json':
+        return fast_trades_response(
+            big_prints_query('block_trades', days, market_hours_only=market_hours_only, raw=True), fmt
+        )
     return big_prints_query('block_trades', days, market_hours_only=market_hours_only)
 
 @app.get("/lit/all/{ticker}", response_model=List[BlockTrade], summary="All lit-market trades for a ticker")
-def get_all_lit(ticker: str, percentile: Optional[float] = Query(None, ge=0, le=1)):
+def get_all_lit(
+    ticker: str,
+    response: Response,
+    percentile: Optional[float] = Query(None, ge=0, le=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+    stream: bool = Query(False, description="Stream full history as NDJSON")
+):
     floor = DEFAULT_MIN_VALUE
     if percentile is not None:
         floor = get_dynamic_threshold(ticker, percentile, 'lit_trades')
-    conn = get_darkpool_connection()
-    try:
-        sql = """
-            SELECT
-              ticker, quantity, price::float, trade_value::float,
-              (trade_time AT TIME ZONE 'America/New_York') AS trade_time,
-              conditions
-            FROM lit_trades
-            WHERE ticker = %s AND trade_value >= %s
-            ORDER BY trade_time DESC LIMIT 500;
-        """
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql, (ticker.upper(), floor))
-            return cur.fetchall()
-    finally:
-        release_darkpool_connection(conn)
+    return ticker_trades_response('lit_trades', ticker, floor, 'all', response, limit, cursor, stream, fmt)
+
+@app.get("/lit/all/{ticker}/daily", response_model=List[ListingDayTotal],
+         summary="Day totals of the /lit/all population")
+def get_all_lit_daily(
+    ticker: str,
+    start_date: str = Query(..., description="YYYY-MM-DD, New York"),
+    end_date: str = Query(..., description="YYYY-MM-DD, New York"),
+    percentile: Optional[float] = Query(None, ge=0, le=1),
+    min_value: Optional[float] = Query(None, description="X-Value-Floor of the listing page (overrides percentile)")
+):
+    floor = DEFAULT_MIN_VALUE
+    if min_value is not None:
+        floor = min_value
+    elif percentile is not None:
+        floor = get_dynamic_threshold(ticker, percentile, 'lit_trades')
+    return listing_day_totals_response('lit_trades', ticker, floor, 'all', start_date, end_date)
+
+@app.get("/lit/batch/all", response_model=Dict[str, List[BlockTrade]], summary="Lit-market trades for a watchlist")
+def get_batch_all_lit(
+    tickers: str = Query(..., description="Comma-separated tickers, e.g. NVDA,AAPL,TSLA"),
+    percentile: Optional[float] = Query(None, ge=0, le=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Trades per ticker"),
+    fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN)
+):
+    return batch_trades_response('lit_trades', tickers, percentile, 'all', limit, fmt)
 
 @app.get("/lit/bigprints", response_model=List[BlockTrade], summary="Top lit trades by value")
 def get_lit_big_prints(
     days: int = Query(1, ge=1, le=30), 
     under_400m: bool = False,
-    market_hours_only: bool = Query(False)
+    market_hours_only: bool = Query(False),
+    fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN)
 ):
+    if fmt != 'json':
+        return fast_trades_response(
+            big_prints_query('lit_trades', days, under_400m, market_hours_only, raw=True), fmt
+        )
     return big_prints_query('lit_trades', days, under_400m, market_hours_only)
 
+SESSION_PATTERN = "^(premarket|regular|afterhours)$"
+
+@app.get("/dp/daily/{ticker}", response_model=List[DailySummary], summary="Exact daily block-trade totals per session")
+def get_dp_daily(
+    ticker: str,
+    days: int = Query(30, ge=1, le=365),
+    session: Optional[str] = Query(None, pattern=SESSION_PATTERN)
+):
+    return daily_summary_query('block_trades_daily', ticker, days, session)
+
+@app.get("/lit/daily/{ticker}", response_model=List[DailySummary], summary="Exact daily lit-trade totals per session")
+def get_lit_daily(
+    ticker: str,
+    days: int = Query(30, ge=1, le=365),
+    session: Optional[str] = Query(None, pattern=SESSION_PATTERN)
+):
+    return daily_summary_query('lit_trades_daily', ticker, days, session)
+
 # ─── ENHANCED SD ENDPOINTS ────────────────────────────────────────
 
 @app.post("/levels/create")
@@ -1252,6 +4305,53 @@ async def get_levels_for_timeline_legacy(ticker: str):
     """Legacy timeline endpoint - redirects to enhanced version"""
     return await get_enhanced_levels_for_timeline(ticker)
 
+@app.get("/levels/{ticker}/nearby-prints")
+def get_prints_near_levels(
+    ticker: str,
+    start_date: str = Query(..., description="YYYY-MM-DD (inclusive, New York time)"),
+    end_date: str = Query(..., description="YYYY-MM-DD (inclusive, New York time)"),
+    tolerance_pct: float = Query(0.025, gt=0, le=0.25, description="Band half-width as a fraction of the level price (0.025 = ±2.5%)"),
+    source: str = Query("both", pattern="^(block|lit|both)$"),
+    min_value: float = Query(0, ge=0, description="Ignore prints below this notional"),
+    limit: int = Query(100, ge=0, le=MAX_PAGE_SIZE, description="Newest prints returned per level (totals cover all)")
+):
+    """Block and lit prints inside each active level's tolerance band, joined in darkpool_data"""
+    try:
+        start_ny = datetime.combine(parse_date_string(start_date), datetime.min.time(), NY_TZ)
+        end_ny = datetime.combine(parse_date_string(end_date) + timedelta(days=1), datetime.min.time(), NY_TZ)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if end_ny <= start_ny:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    
+    tables = {'block': ['block_trades'], 'lit': ['lit_trades'], 'both': ['block_trades', 'lit_trades']}[source]
+    levels: Dict[int, Dict] = {}
+    for table_name in tables:
+        rows = level_prints_query(table_name, ticker, start_ny.astimezone(timezone.utc),
+                                  end_ny.astimezone(timezone.utc), tolerance_pct, min_value, limit)
+        for row in rows:
+            level = levels.setdefault(row['level_id'], {
+                'level_id': row['level_id'],
+                'level_price': row['level_price'],
+                'level_type': row['level_type'],
+                'level_name': row['level_name'],
+                'band': [round(row['level_price'] * (1 - tolerance_pct), 4), round(row['level_price'] * (1 + tolerance_pct), 4)]
+            })
+            level['block' if table_name == 'block_trades' else 'lit'] = {
+                'print_count': row['print_count'],
+                'total_volume': row['total_volume'],
+                'total_notional': row['total_notional'],
+                'prints': row['prints']
+            }
+    
+    return {
+        'ticker': ticker.upper(),
+        'start_date': start_date,
+        'end_date': end_date,
+        'tolerance_pct': tolerance_pct,
+        'levels': list(levels.values())
+    }
+
 @app.delete("/levels/{level_id}")
 async def delete_level(level_id: int):
     """Delete a supply/demand level and all associated data"""
@@ -1273,7 +4373,7 @@ async def deactivate_level(level_id: int):
         raise HTTPException(status_code=500, detail="SD database pool not initialized")
     
     try:
-        async with sd_db_pool.acquire() as conn:
+        async with acquire_sd_connection(primary=True) as conn:
             level_info = await conn.fetchrow(
                 "SELECT ticker, level_price, level_type FROM supply_demand_levels WHERE id = $1",
                 level_id
@@ -1286,6 +4386,7 @@ async def deactivate_level(level_id: int):
                 "UPDATE supply_demand_levels SET is_active = false WHERE id = $1",
                 level_id
             )
+            await sync_level_mirror(level_info['ticker'])
             
             return {
                 'message': f'Enhanced level {level_id} deactivated successfully',
@@ -1301,14 +4402,15 @@ async def deactivate_level(level_id: int):
 
 @app.get("/market-volume-job-enhanced/{ticker}")
 async def start_enhanced_market_volume_job(
-    background_tasks: BackgroundTasks,
     ticker: str,
     level_price: float = Query(...),
     start_date: str = Query(...),
     end_date: str = Query(...),
     price_tolerance: float = Query(0.025),
     level_id: Optional[int] = Query(None, description="Level ID to update (required for absorption)"),
-    is_absorption: bool = Query(False, description="Whether this is absorption analysis")
+    is_absorption: bool = Query(False, description="Whether this is absorption analysis"),
+    priority: Optional[int] = Query(None, description="Queue priority (default: absorption 100, volume 50, approximate 200)"),
+    mode: str = Query('exact', description="exact (full tape), approximate (minute-bar estimate with error bound) or refined (estimate + exact trades in the band's minutes)")
 ):
     """Enhanced market volume job with unlimited API calls and job segments"""
     
@@ -1318,6 +4420,10 @@ async def start_enhanced_market_volume_job(
             status_code=400, 
             detail="level_id is required for absorption analysis. Please provide a valid level_id."
         )
+    if mode not in JOB_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(JOB_MODES)}")
+    if mode == 'approximate' and priority is None:
+        priority = APPROXIMATE_JOB_PRIORITY
     
     job_id = str(uuid.uuid4())
     
@@ -1325,7 +4431,13 @@ async def start_enhanced_market_volume_job(
     availability = await check_data_availability(ticker, start_date, end_date)
     
     # Enhanced time estimates for unlimited API calls
-    if not is_absorption:
+    if mode == 'approximate':
+        estimated_time = "1-5 seconds (minute-bar estimate)"
+        complexity = "minute_bar_estimate"
+    elif mode == 'refined':
+        estimated_time = "5 seconds - 2 minutes (minute-bar estimate refined with exact trades)"
+        complexity = "minute_bar_refined"
+    elif not is_absorption:
         estimated_time = "30 seconds - 10 minutes (unlimited API calls for maximum coverage)"
         complexity = "enhanced_unlimited_volume"
     else:
@@ -1335,9 +4447,9 @@ async def start_enhanced_market_volume_job(
     analysis_type = "absorption" if is_absorption else "volume"
     
     # Initialize enhanced job status
-    jobs_db[job_id] = {
+    job = {
         'job_id': job_id,
-        'status': 'starting_enhanced',
+        'status': 'queued',
         'progress': 0,
         'created_at': datetime.now().isoformat(),
         'ticker': ticker.upper(),
@@ -1348,25 +4460,19 @@ async def start_enhanced_market_volume_job(
         'estimated_time': estimated_time,
         'analysis_type': analysis_type,
         'is_absorption': is_absorption,
+        'mode': mode,
         'enhancement': 'unlimited_api_calls_with_segments',
         'api_calls_used': 0
     }
     
-    # Save job to database
-    await save_job_to_db(job_id, jobs_db[job_id])
-    
-    # Start enhanced background task
-    if is_absorption:
-        # At this point, level_id is guaranteed to be not None due to validation above
-        background_tasks.add_task(
-            enhanced_absorption_job, 
-            job_id, ticker, level_price, start_date, end_date, price_tolerance, level_id  # type: ignore
-        )
-    else:
-        background_tasks.add_task(
-            enhanced_volume_job, 
-            job_id, ticker, level_price, start_date, end_date, price_tolerance, level_id
-        )
+    # Save job to database, then queue it for the job workers (whichever runs it keeps it current)
+    await save_job_to_db(job_id, job)
+    cache_job(job_id, job)
+    await enqueue_job(job_id, analysis_type, ticker, {
+        'ticker': ticker, 'level_price': level_price, 'start_date': start_date,
+        'end_date': end_date, 'tolerance': price_tolerance, 'level_id': level_id,
+        'mode': mode
+    }, priority)
     
     return {
         'job_id': job_id,
@@ -1375,16 +4481,79 @@ async def start_enhanced_market_volume_job(
         'complexity': complexity,
         'data_availability': availability,
         'analysis_type': analysis_type,
+        'mode': mode,
         'enhancement': 'Unlimited Polygon API calls + Job segments + Correct date handling + Supply/demand visualization'
     }
 
+@app.post("/market-volume-job-enhanced/{ticker}/batch")
+async def start_batch_market_volume_job(
+    ticker: str,
+    request: BatchVolumeJobRequest
+):
+    """One job for many levels of a ticker: the tape is fetched once, every band updated together"""
+    if not request.bands:
+        raise HTTPException(status_code=400, detail="At least one band is required")
+    if any(band.price_tolerance < 0 for band in request.bands):
+        raise HTTPException(status_code=400, detail="price_tolerance must not be negative")
+    level_ids = [band.level_id for band in request.bands]
+    if len(set(level_ids)) != len(level_ids):
+        raise HTTPException(status_code=400, detail="Each level_id may appear only once per batch")
+    try:
+        parse_date_string(request.start_date)
+        parse_date_string(request.end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    async with acquire_sd_connection(primary=True) as conn:
+        foreign = await foreign_level_ids(conn, ticker, level_ids)
+    if foreign:
+        raise HTTPException(
+            status_code=400,
+            detail=f"level_id {', '.join(map(str, foreign))} not found for {ticker.upper()}"
+        )
+    
+    job_id = str(uuid.uuid4())
+    analysis_type = "absorption" if request.is_absorption else "volume"
+    
+    job = {
+        'job_id': job_id,
+        'status': 'queued',
+        'progress': 0,
+        'created_at': datetime.now().isoformat(),
+        'ticker': ticker.upper(),
+        'level_ids': level_ids,
+        'date_range': f"{request.start_date} to {request.end_date}",
+        'analysis_type': analysis_type,
+        'is_absorption': request.is_absorption,
+        'enhancement': 'batch_price_volume_profile',
+        'api_calls_used': 0
+    }
+    
+    await save_job_to_db(job_id, job)
+    cache_job(job_id, job)
+    await enqueue_job(job_id, 'batch', ticker, {
+        'ticker': ticker, 'start_date': request.start_date, 'end_date': request.end_date,
+        'bands': [
+            {'level_id': band.level_id, 'level_price': band.level_price, 'price_tolerance': band.price_tolerance}
+            for band in request.bands
+        ],
+        'is_absorption': request.is_absorption
+    }, request.priority)
+    
+    return {
+        'job_id': job_id,
+        'status': 'started_batch',
+        'levels': len(request.bands),
+        'analysis_type': analysis_type
+    }
+
 @app.get("/jobs/{job_id}/status")
 async def get_job_status(job_id: str):
     """Get status of an enhanced background job"""
-    if job_id not in jobs_db:
+    job = await get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return jobs_db[job_id]
+    return job
 
 @app.delete("/jobs/{job_id}")
 async def delete_job(job_id: str):
@@ -1403,10 +4572,10 @@ async def delete_job(job_id: str):
 @app.post("/jobs/{job_id}/link-to-level")
 async def link_job_to_level(job_id: str, request: LinkJobRequest):
     """Link a completed job to a level (for retroactive updates)"""
-    if job_id not in jobs_db:
+    job = await get_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs_db[job_id]
     if job['status'] != 'completed':
         raise HTTPException(status_code=400, detail="Job must be completed to link to level")
     
@@ -1441,9 +4610,35 @@ async def check_ticker_data_availability(
     availability = await check_data_availability(ticker, start_date, end_date)
     return availability
 
+def darkpool_row_count(cur, table_name: str, exact: bool = False) -> int:
+    """Timescale's chunk-statistics estimate for a hypertable, or a full COUNT(*) when exact"""
+    if table_name not in ('block_trades', 'lit_trades'):
+        raise ValueError("Invalid table name")
+    if exact:
+        cur.execute(f"SELECT COUNT(*) FROM {table_name}")
+    else:
+        cur.execute("SELECT approximate_row_count(%s::regclass)", (table_name,))
+    return cur.fetchone()[0]
+
+async def sd_row_count(conn, table_name: str, exact: bool = False) -> int:
+    """Planner estimate (pg_class.reltuples) for an SD table, or COUNT(*) when exact"""
+    if table_name not in ('market_data_cache', 'background_jobs', 'absorption_job_segments'):
+        raise ValueError("Invalid table name")
+    if not exact:
+        estimate = await conn.fetchval(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = $1::regclass", table_name
+        )
+        # -1 means never vacuumed/analyzed - such tables are small enough to count
+        if estimate is not None and estimate >= 0:
+            return estimate
+    return await conn.fetchval(f"SELECT COUNT(*) FROM {table_name}")
+
 @app.get("/db/status")
-async def get_database_status():
-    """Get status of both databases"""
+async def get_database_status(
+    exact: bool = Query(False, description="Run full COUNT(*) scans instead of using statistics")
+):
+    """Get status of both databases (row counts are estimates unless exact=true)"""
+    count_method = 'exact' if exact else 'approximate'
     status = {
         'darkpool_db': {
             'name': DARKPOOL_DB_NAME,
@@ -1476,14 +4671,13 @@ async def get_database_status():
             conn = get_darkpool_connection()
             try:
                 with conn.cursor() as cur:
-                    cur.execute("SELECT COUNT(*) FROM block_trades")
-                    block_count = cur.fetchone()[0]
-                    cur.execute("SELECT COUNT(*) FROM lit_trades")
-                    lit_count = cur.fetchone()[0]
+                    block_count = darkpool_row_count(cur, 'block_trades', exact)
+                    lit_count = darkpool_row_count(cur, 'lit_trades', exact)
                     
                 status['darkpool_db']['stats'] = {
                     'block_trades': block_count,
-                    'lit_trades': lit_count
+                    'lit_trades': lit_count,
+                    'count_method': count_method
                 }
             finally:
                 release_darkpool_connection(conn)
@@ -1493,17 +4687,18 @@ async def get_database_status():
     # Get enhanced SD stats
     if sd_db_pool:
         try:
-            async with sd_db_pool.acquire() as conn:
+            async with acquire_sd_connection() as conn:
                 level_count = await conn.fetchval("SELECT COUNT(*) FROM supply_demand_levels WHERE is_active = true")
-                cache_count = await conn.fetchval("SELECT COUNT(*) FROM market_data_cache")
-                job_count = await conn.fetchval("SELECT COUNT(*) FROM background_jobs")
-                segment_count = await conn.fetchval("SELECT COUNT(*) FROM absorption_job_segments")
+                cache_count = await sd_row_count(conn, 'market_data_cache', exact)
+                job_count = await sd_row_count(conn, 'background_jobs', exact)
+                segment_count = await sd_row_count(conn, 'absorption_job_segments', exact)
                 
                 status['sd_db']['stats'] = {
                     'active_levels': level_count,
                     'cached_trades': cache_count,
                     'tracked_jobs': job_count,
-                    'absorption_segments': segment_count
+                    'absorption_segments': segment_count,
+                    'count_method': count_method
                 }
         except Exception as e:
             status['sd_db']['error'] = str(e)
@@ -1512,11 +4707,20 @@ async def get_database_status():
 
 # ─── SERVER STARTUP ──────────────────────────────────────────────
 
-if __name__ == "__main__":
+if __name__ == "__main__" and sys.argv[1:] == ["worker"]:
+    # Job queue worker process (pair with JOB_RUNNER=external on the API)
+    asyncio.run(run_job_worker_process())
+elif __name__ == "__main__":
+    # API_WORKERS processes share port 8001 (job state lives in Postgres, see get_job).
+    # API_RELOAD=1 is for development: one auto-reloading worker.
+    reload = os.environ.get('API_RELOAD') == '1'
+    workers = 1 if reload else int(os.environ.get('API_WORKERS', os.cpu_count() or 1))
+    os.environ['API_WORKERS'] = str(workers)  # read by each worker to size its pools
     uvicorn.run(
         "main:app",
         host="127.0.0.1",
         port=8001,
-        reload=True,
+        reload=reload,
+        workers=workers,
         log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Shared Polygon REST access for main.py and backfill.py
+Every GET goes through one policy:
+1. Global rate limiter - a token bucket shared by everything in the process
+2. Per-host circuit breaker - consecutive 5xx/transport failures open it, calls then fail fast
+   until a single probe request gets through
+3. Classified retries - 429 waits (Retry-After when sent), 5xx and transport errors back off
+   exponentially with full jitter, any other 4xx (bad key, bad ticker) raises at once
+Retry and throttle counters live in module dicts; main.py renders them on /metrics.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# ─── CONFIGURATION ───────────────────────────────────────────────
+
+POLYGON_MAX_ATTEMPTS = int(os.environ.get('POLYGON_MAX_ATTEMPTS', '6'))
+POLYGON_BACKOFF_BASE = float(os.environ.get('POLYGON_BACKOFF_BASE', '0.5'))  # seconds, doubles per retry
+POLYGON_BACKOFF_MAX = float(os.environ.get('POLYGON_BACKOFF_MAX', '30'))
+POLYGON_RATE_LIMIT = float(os.environ.get('POLYGON_RATE_LIMIT', '50'))  # requests/second, 0 = unlimited
+POLYGON_RATE_BURST = int(os.environ.get('POLYGON_RATE_BURST', '10'))
+POLYGON_BREAKER_THRESHOLD = int(os.environ.get('POLYGON_BREAKER_THRESHOLD', '5'))  # consecutive failures
+POLYGON_BREAKER_COOLDOWN = float(os.environ.get('POLYGON_BREAKER_COOLDOWN', '30'))  # seconds open
+
+# ─── METRICS ─────────────────────────────────────────────────────
+
+polygon_requests_total: Dict[Tuple[str, str], int] = {}   # (host, ok/throttled/server_error/transport_error/client_error)
+polygon_retries_total: Dict[Tuple[str, str], int] = {}    # (host, reason)
+polygon_breaker_opened_total: Dict[str, int] = {}
+polygon_breaker_rejected_total: Dict[str, int] = {}
+polygon_throttle_seconds_total: Dict[str, float] = {}     # limiter / retry_after -> seconds waited
+
+_metrics_lock = threading.Lock()
+
+def _count(counter: Dict, key, amount=1):
+    with _metrics_lock:
+        counter[key] = counter.get(key, 0) + amount
+
+# ─── ERRORS ──────────────────────────────────────────────────────
+
+class PolygonError(Exception):
+    """A Polygon request that will not succeed by retrying now"""
+
+class PolygonRequestError(PolygonError):
+    """4xx other than 429 - the request itself is wrong (key, plan, ticker, params)"""
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+class PolygonRetriesExhausted(PolygonError):
+    pass
+
+class PolygonCircuitOpen(PolygonError):
+    pass
+
+# ─── RATE LIMITER & CIRCUIT BREAKER ──────────────────────────────
+
+class RateLimiter:
+    """Token bucket. reserve() books the next slot and returns how long to wait for it."""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            # Negative tokens are callers already queued ahead of this one
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class CircuitBreaker:
+    """
+    Closed until POLYGON_BREAKER_THRESHOLD consecutive failures, then open (calls rejected)
+    for POLYGON_BREAKER_COOLDOWN. After that it is half open: one caller's request goes
+    through as a probe while the rest are still rejected. The probe failing re-opens it,
+    succeeding closes it. A probe that never reports back (cancelled mid-request) is
+    given up on after another cooldown.
+    """
+    def __init__(self, host: str):
+        self.host = host
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < POLYGON_BREAKER_COOLDOWN:
+            return 'open'
+        return 'half_open'
+
+    def check(self):
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return
+            now = time.monotonic()
+            if state == 'half_open' and (self.probe_started is None
+                                         or now - self.probe_started >= POLYGON_BREAKER_COOLDOWN):
+                self.probe_started = now
+                return
+        _count(polygon_breaker_rejected_total, self.host)
+        if state == 'open':
+            remaining = POLYGON_BREAKER_COOLDOWN - (now - self.opened_at)
+            raise PolygonCircuitOpen(f"Polygon circuit for {self.host} open for another {remaining:.0f}s")
+        raise PolygonCircuitOpen(f"Polygon circuit for {self.host} half open, waiting on its probe")
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probe_started = None
+            if self.opened_at is not None or self.failures >= POLYGON_BREAKER_THRESHOLD:
+                if self.state != 'open':
+                    logger.error(f"🔌 Polygon circuit for {self.host} opened after {self.failures} failures")
+                    _count(polygon_breaker_opened_total, self.host)
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """The probe was throttled - the host is up but hasn't answered yet; let the next call probe"""
+        with self.lock:
+            self.probe_started = None
+
+rate_limiter = RateLimiter(POLYGON_RATE_LIMIT, POLYGON_RATE_BURST)
+breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(host: str) -> CircuitBreaker:
+    breaker = breakers.get(host)
+    if breaker is None:
+        breaker = breakers.setdefault(host, CircuitBreaker(host))
+    return breaker
+
+# ─── RETRY POLICY ────────────────────────────────────────────────
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full jitter over base * 2^(attempt-1), capped; a server Retry-After is a floor"""
+    delay = random.uniform(0, min(POLYGON_BACKOFF_MAX, POLYGON_BACKOFF_BASE * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, POLYGON_BACKOFF_MAX))
+    return delay
+
+def parse_retry_after(resp: httpx.Response) -> Optional[float]:
+    try:
+        return float(resp.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
+
+def classify(resp: Optional[httpx.Response], error: Optional[Exception]) -> str:
+    if error is not None:
+        return 'transport_error'
+    if resp.status_code < 400:
+        return 'ok'
+    if resp.status_code == 429:
+        return 'throttled'
+    if resp.status_code >= 500:
+        return 'server_error'
+    return 'client_error'
+
+def safe_url(url: str) -> str:
+    """The URL without its query string - never log apiKey"""
+    return url.split('?', 1)[0]
+
+def after_attempt(host: str, url: str, attempt: int, resp: Optional[httpx.Response],
+                  error: Optional[Exception]) -> Optional[float]:
+    """
+    Record one attempt's outcome. Returns None when resp is the answer, else the delay
+    before the next attempt; raises when there is no next attempt.
+    """
+    outcome = classify(resp, error)
+    _count(polygon_requests_total, (host, outcome))
+    breaker = get_breaker(host)
+
+    if outcome == 'ok':
+        breaker.record_success()
+        return None
+    if outcome == 'client_error':
+        breaker.record_success()  # the host answered; retrying won't change the answer
+        raise PolygonRequestError(resp.status_code, f"Polygon {resp.status_code} for {safe_url(url)}: {resp.text[:200]}")
+
+    retry_after = None
+    if outcome == 'throttled':
+        retry_after = parse_retry_after(resp)  # a throttled host is healthy - breaker untouched
+        breaker.release_probe()
+    else:
+        breaker.record_failure()
+    detail = str(error) if error is not None else f"HTTP {resp.status_code}"
+
+    if attempt >= POLYGON_MAX_ATTEMPTS:
+        raise PolygonRetriesExhausted(f"Polygon {safe_url(url)} failed {attempt} times, last: {detail}")
+    delay = backoff_delay(attempt, retry_after)
+    _count(polygon_retries_total, (host, outcome))
+    if outcome == 'throttled':
+        _count(polygon_throttle_seconds_total, 'retry_after', delay)
+    logger.warning(f"⏳ Polygon {outcome} on {safe_url(url)} (attempt {attempt}: {detail}) - retrying in {delay:.1f}s")
+    return delay
+
+# ─── CLIENT CALLS ────────────────────────────────────────────────
+
+async def polygon_get(client: httpx.AsyncClient, url: str) -> httpx.Response:
+    """GET under the shared policy; returns a 2xx/3xx response or raises PolygonError"""
+    host = httpx.URL(url).host
+    attempt = 0
+    while True:
+        attempt += 1
+        get_breaker(host).check()
+        wait = rate_limiter.reserve()
+        if wait:
+            _count(polygon_throttle_seconds_total, 'limiter', wait)
+            await asyncio.sleep(wait)
+
+        resp = error = None
+        try:
+            resp = await client.get(url)
+        except httpx.TransportError as e:
+            error = e
+        delay = after_attempt(host, url, attempt, resp, error)
+        if delay is None:
+            return resp
+        await asyncio.sleep(delay)
+
+def polygon_get_sync(client: httpx.Client, url: str) -> httpx.Response:
+    """polygon_get for synchronous scripts"""
+    host = httpx.URL(url).host
+    attempt = 0
+    while True:
+        attempt += 1
+        get_breaker(host).check()
+        wait = rate_limiter.reserve()
+        if wait:
+            _count(polygon_throttle_seconds_total, 'limiter', wait)
+            time.sleep(wait)
+
+        resp = error = None
+        try:
+            resp = client.get(url)
+        except httpx.TransportError as e:
+            error = e
+        delay = after_attempt(host, url, attempt, resp, error)
+        if delay is None:
+            return resp
+        time.sleep(delay)
@@ -0,0 +1,21 @@
+#!/bin/sh
+# Hot standby for docker-compose: clone the primary once, then follow it over streaming replication.
+# Point main.py at it with DARKPOOL_REPLICA_DSN / SD_REPLICA_DSN (port 5433).
+set -e
+
+mkdir -p "$PGDATA"
+chown postgres:postgres "$PGDATA"
+chmod 700 "$PGDATA"
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    echo "Cloning primary into $PGDATA..."
+    # -R writes standby.signal and primary_conninfo; -X stream keeps the WAL needed to start
+    until su-exec postgres pg_basebackup -h db -U "$REPLICATION_USER" -D "$PGDATA" -R -X stream -P; do
+        echo "Primary not ready, retrying..."
+        rm -rf "$PGDATA"/*
+        sleep 2
+    done
+fi
+
+# hot_standby_feedback stops the primary's vacuum from cancelling long dashboard reads
+exec su-exec postgres postgres -c hot_standby=on -c hot_standby_feedback=on
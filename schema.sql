@@ -1,9 +1,8 @@
--- This first line will delete the old, broken table if it exists,
--- ensuring we can re-run this script cleanly.
-DROP TABLE IF EXISTS block_trades;
+-- Managed darkpool_data schema. Safe to re-run: nothing here drops data.
+-- Compression, retention and the daily aggregates are applied by update_dp_schema.py.
 
--- This is the corrected table definition
-CREATE TABLE block_trades (
+-- Dark-pool block prints (ingestor.py / backfill.py --mode block)
+CREATE TABLE IF NOT EXISTS block_trades (
     id BIGSERIAL,
     trade_time TIMESTAMPTZ NOT NULL,
     ticker TEXT NOT NULL, -- Using TEXT as recommended by the warning you saw
@@ -11,12 +10,31 @@ CREATE TABLE block_trades (
     quantity BIGINT NOT NULL,
     trade_value NUMERIC(20, 2) NOT NULL,
     conditions INTEGER[],
+    exchange INTEGER,
+    trf_id INTEGER,
+    trf_timestamp BIGINT,
     -- This composite primary key satisfies the TimescaleDB requirement
     PRIMARY KEY (id, trade_time)
 );
 
--- This will now succeed without error
-SELECT create_hypertable('block_trades', 'trade_time');
+SELECT create_hypertable('block_trades', 'trade_time', if_not_exists => TRUE);
 
 -- This index is still useful for fast lookups by ticker
-CREATE INDEX idx_ticker_time ON block_trades (ticker, trade_time DESC);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_ticker_time ON block_trades (ticker, trade_time DESC);
+
+-- Lit-market prints (ingestor.py / backfill.py --mode lit)
+CREATE TABLE IF NOT EXISTS lit_trades (
+    id BIGSERIAL,
+    trade_time TIMESTAMPTZ NOT NULL,
+    ticker TEXT NOT NULL,
+    price NUMERIC(15, 5) NOT NULL,
+    quantity BIGINT NOT NULL,
+    trade_value NUMERIC(20, 2) NOT NULL,
+    conditions INTEGER[],
+    exchange INTEGER,
+    PRIMARY KEY (id, trade_time)
+);
+
+SELECT create_hypertable('lit_trades', 'trade_time', if_not_exists => TRUE);
+
+CREATE INDEX IF NOT EXISTS idx_lit_ticker_time ON lit_trades (ticker, trade_time DESC);
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Regression check - daily absorption rollups are reused by the next job on the same band
+Runs main.calculate_daily_level_volume twice for one level and range against an in-memory
+stand-in for the SD database that keeps asyncpg's parameter encoding: a float bound to a
+NUMERIC comparison arrives as Decimal(float), so 99.975 is 99.97499999... and only equals
+a stored DECIMAL(12,4) 99.9750 once the query rounds it.
+
+1. First job - every day is computed from price_volume_profile and written
+2. Second job, same band - every day is reused, no profile days are built
+
+Run from the repo root: python -m pytest test_daily_level_volume.py (or python test_daily_level_volume.py)
+"""
+
+import asyncio
+import contextlib
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+import main
+
+LEVEL_ID = 1
+TICKER = 'SPY'
+LEVEL_PRICE = 100.0
+TOLERANCE = 0.025  # band 99.975 - 100.025, neither edge exact in binary
+START_DATE, END_DATE = '2024-06-03', '2024-06-07'
+SCALE = Decimal('0.0001')
+
+def numeric_param(sql: str, position: int, value: float) -> Decimal:
+    """A float parameter as Postgres sees it - exact, unless the query rounds it to 4 places"""
+    if re.search(rf"ROUND\(\${position}::numeric, 4\)", sql):
+        return Decimal(value).quantize(SCALE, ROUND_HALF_UP)
+    return Decimal(value)
+
+class FakeSDConnection:
+    """Just the daily_level_volume / price_volume_profile statements the rollup path runs"""
+    def __init__(self, profile):
+        self.profile = profile  # (trade_date, price_bucket) -> (volume, value, trade_count)
+        self.daily = {}         # (level_id, trade_date) -> row
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def fetch(self, sql, *args):
+        if 'FROM daily_level_volume' in sql:
+            level_id, days = args[0], args[1]
+            low, high = numeric_param(sql, 3, args[2]), numeric_param(sql, 4, args[3])
+            return [
+                {'trade_date': day} for (row_level, day), row in self.daily.items()
+                if row_level == level_id and day in days and row['is_complete']
+                and row['price_range_low'] == low and row['price_range_high'] == high
+            ]
+        if 'FROM price_volume_profile' in sql:
+            days = args[1]
+            low, high = numeric_param(sql, 3, args[2]), numeric_param(sql, 4, args[3])
+            totals = {}
+            for (day, bucket), (volume, value, count) in self.profile.items():
+                if day in days and low <= bucket <= high:
+                    total = totals.setdefault(day, [0, 0.0, 0])
+                    total[0] += volume
+                    total[1] += value
+                    total[2] += count
+            return [
+                {'trade_date': day, 'volume': volume, 'value': value, 'trade_count': count}
+                for day, (volume, value, count) in totals.items()
+            ]
+        raise AssertionError(f"unexpected fetch: {sql}")
+
+    async def executemany(self, sql, records):
+        assert 'INSERT INTO daily_level_volume' in sql
+        for level_id, ticker, day, volume, value, count, low, high, is_complete in records:
+            # DECIMAL(12,4) columns store the rounded value
+            self.daily[(level_id, day)] = {
+                'daily_volume': volume, 'daily_value': value, 'daily_trade_count': count,
+                'price_range_low': Decimal(low).quantize(SCALE, ROUND_HALF_UP),
+                'price_range_high': Decimal(high).quantize(SCALE, ROUND_HALF_UP),
+                'is_complete': is_complete
+            }
+
+    async def execute(self, sql, *args):
+        assert 'cumulative_volume' in sql
+
+    async def fetchrow(self, sql, *args):
+        level_id, start, end = args
+        rows = [row for (row_level, day), row in self.daily.items() if row_level == level_id and start <= day <= end]
+        return {
+            'total_volume': sum(row['daily_volume'] for row in rows),
+            'total_value': sum(row['daily_value'] for row in rows),
+            'total_trades': sum(row['daily_trade_count'] for row in rows)
+        }
+
+def run_job(conn: FakeSDConnection, profile_builds: list) -> dict:
+    @contextlib.asynccontextmanager
+    async def acquire_sd_connection(primary: bool = False):
+        yield conn
+
+    async def ensure_profile_days(ticker, days):
+        profile_builds.append(list(days))
+        return len(days), 0
+
+    patched = {'sd_db_pool': object(), 'acquire_sd_connection': acquire_sd_connection,
+               'ensure_profile_days': ensure_profile_days}
+    saved = {name: getattr(main, name) for name in patched}
+    for name, value in patched.items():
+        setattr(main, name, value)
+    try:
+        return asyncio.run(main.calculate_daily_level_volume(
+            LEVEL_ID, TICKER, LEVEL_PRICE, START_DATE, END_DATE, TOLERANCE
+        ))
+    finally:
+        for name, value in saved.items():
+            setattr(main, name, value)
+
+def test_second_job_reuses_days():
+    days = main.profile_days(START_DATE, END_DATE)
+    # One bucket on each band edge and one just outside it, every day
+    profile = {}
+    for day in days:
+        profile[(day, Decimal('99.9750'))] = (100, 9997.5, 1)
+        profile[(day, Decimal('100.0250'))] = (200, 20005.0, 2)
+        profile[(day, Decimal('100.0300'))] = (400, 40012.0, 4)
+    conn = FakeSDConnection(profile)
+    profile_builds = []
+
+    first = run_job(conn, profile_builds)
+    assert first['days_computed'] == len(days) and first['days_reused'] == 0
+    assert first['total_volume'] == 300 * len(days)  # both edge buckets, not the one outside
+
+    second = run_job(conn, profile_builds)
+    assert second['days_computed'] == 0 and second['days_reused'] == len(days)
+    assert second['total_volume'] == first['total_volume']
+    assert profile_builds == [days]  # only the first job touched the profile
+
+if __name__ == '__main__':
+    test_second_job_reuses_days()
+    print("✅ Second job on the same band reused every day")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The API is a single top-level module (main.py) - make it importable from tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
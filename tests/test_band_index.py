@@ -0,0 +1,52 @@
+"""BandIndex lookups against a linear scan: overlapping bands, shared and inclusive edges"""
+
+import random
+
+import pytest
+
+from main import BandIndex
+
+def covering(bands, price):
+    price = round(price, 4)
+    return [i for i, (low, high) in enumerate(bands) if round(low, 4) <= price <= round(high, 4)]
+
+def test_edges_are_inclusive():
+    index = BandIndex([(99.975, 100.025)])
+    assert index.lookup(99.975) == [0]
+    assert index.lookup(100.025) == [0]
+    assert index.lookup(100.0) == [0]
+    assert index.lookup(99.9749) == []
+    assert index.lookup(100.0251) == []
+
+def test_overlapping_and_nested_bands():
+    bands = [(100.0, 101.0), (100.5, 102.0), (100.6, 100.7), (101.0, 101.0)]
+    index = BandIndex(bands)
+    assert index.lookup(100.4) == [0]
+    assert index.lookup(100.5) == [0, 1]
+    assert index.lookup(100.65) == [0, 1, 2]
+    assert index.lookup(100.7) == [0, 1, 2]
+    assert index.lookup(101.0) == [0, 1, 3]  # shared edge, and a zero-width band
+    assert index.lookup(101.5) == [1]
+    assert index.lookup(102.0) == [1]
+
+def test_disjoint_bands_leave_gaps_empty():
+    index = BandIndex([(10.0, 11.0), (12.0, 13.0)])
+    assert index.lookup(11.5) == []
+    assert index.lookup(9.0) == [] and index.lookup(14.0) == []
+
+def test_edges_compared_at_numeric_scale():
+    index = BandIndex([(100.00001, 100.02499)])  # rounds to [100.0, 100.025]
+    assert index.lookup(100.0) == [0]
+    assert index.lookup(100.02504) == [0]
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_linear_scan(seed):
+    rng = random.Random(seed)
+    bands = []
+    for _ in range(40):
+        low = rng.randint(9000, 11000) / 100
+        bands.append((low, low + rng.randint(0, 300) / 100))
+    index = BandIndex(bands)
+    prices = [edge for band in bands for edge in band] + [rng.randint(8900, 11400) / 100 for _ in range(500)]
+    for price in prices:
+        assert index.lookup(price) == covering(bands, price), price
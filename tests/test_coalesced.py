@@ -0,0 +1,206 @@
+"""Single-flight coalescing (main.coalesced) - shared execution, cancellation and context isolation"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import main
+
+def wait_for_sync_waiters(count: int):
+    """Block until the (single) sync flight has count callers on it"""
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        flights = list(main._inflight_sync.values())
+        if flights and flights[0].waiters >= count:
+            return
+        time.sleep(0.001)
+    raise AssertionError(f"sync flight never reached {count} waiters")
+
+def test_async_callers_share_one_execution():
+    calls = []
+
+    @main.coalesced(lambda key: key)
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return {'key': key}
+
+    async def scenario():
+        return await asyncio.gather(fetch('a'), fetch('a'), fetch('b'))
+
+    first, second, other = asyncio.run(scenario())
+    assert calls == ['a', 'b']
+    assert first is second and other == {'key': 'b'}
+    assert main._inflight_async == {}
+
+def test_async_nothing_cached_after_leader_returns():
+    calls = []
+
+    @main.coalesced(lambda: 'k')
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        return await fetch(), await fetch()
+
+    assert asyncio.run(scenario()) == (1, 2)
+
+def test_async_exception_fans_out_to_every_waiter():
+    calls = []
+
+    @main.coalesced(lambda: 'k')
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(fail(), fail(), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_async_cancelled_leader_leaves_waiters_their_result():
+    started = []
+
+    @main.coalesced(lambda: 'k')
+    async def slow():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return 'done'
+
+    async def scenario():
+        leader = asyncio.ensure_future(slow())
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(slow())
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == 'done'
+    assert len(started) == 1
+
+def test_async_flight_cancelled_when_last_waiter_leaves():
+    finished = []
+
+    @main.coalesced(lambda: 'k')
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            finished.append('cancelled')
+            raise
+
+    async def scenario():
+        callers = [asyncio.ensure_future(slow()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert finished == ['cancelled']
+    assert main._inflight_async == {}
+
+def test_async_flight_does_not_inherit_request_context():
+    seen = {}
+
+    @main.coalesced(lambda: 'k')
+    async def probe():
+        seen['timeout'] = main.request_statement_timeout.get()
+        seen['connections'] = main.request_active_connections.get()
+        seen['replica'] = main.request_prefers_replica.get()
+        seen['flight'] = main.current_flight.get()
+        return 'ok'
+
+    async def scenario():
+        main.request_statement_timeout.set(10)
+        main.request_active_connections.set({})
+        main.request_prefers_replica.set(True)
+        return await probe()
+
+    assert asyncio.run(scenario()) == 'ok'
+    assert seen['timeout'] is None and seen['connections'] is None and seen['replica'] is False
+    assert seen['flight'] is not None
+
+def test_sync_threads_share_one_execution_and_exception():
+    calls = []
+    entered = threading.Event()
+    release = threading.Event()
+
+    @main.coalesced(lambda: 'k')
+    def blocking():
+        calls.append(1)
+        entered.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    results = []
+
+    def caller():
+        try:
+            blocking()
+        except ValueError as e:
+            results.append(e)
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    entered.wait(5)
+    follower = threading.Thread(target=caller)
+    follower.start()
+    wait_for_sync_waiters(2)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 2 and results[0] is results[1]
+    assert main._inflight_sync == {}
+
+def test_sync_follower_reruns_a_cancelled_flight():
+    calls = []
+    entered = threading.Event()
+    release = threading.Event()
+
+    @main.coalesced(lambda: 'k')
+    def query():
+        calls.append(1)
+        if len(calls) == 1:
+            entered.set()
+            release.wait(5)
+            # What a disconnect looks like to the leader: its flight is marked, its query fails
+            main.current_flight.get().cancelled = True
+            raise RuntimeError("canceling statement due to user request")
+        return 'rows'
+
+    outcome = {}
+
+    def leader():
+        try:
+            query()
+        except RuntimeError as e:
+            outcome['leader'] = e
+
+    def follower():
+        outcome['follower'] = query()
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    entered.wait(5)
+    threads.append(threading.Thread(target=follower))
+    threads[1].start()
+    wait_for_sync_waiters(2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert isinstance(outcome['leader'], RuntimeError)
+    assert outcome['follower'] == 'rows'
+    assert len(calls) == 2
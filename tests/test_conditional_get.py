@@ -0,0 +1,53 @@
+"""ETag stamps: what they're made of and the statement timeout they run under"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+@pytest.fixture
+def allblocks(monkeypatch):
+    """/dp/allblocks with the stamp and handler queries recording their statement timeout"""
+    seen = {'stamp': [], 'handler': []}
+    version = {'value': '2024-06-03 20:00:00+00:00:41'}
+
+    def darkpool_version(table_name, scope, params=()):
+        seen['stamp'].append(main.request_statement_timeout.get())
+        return version['value']
+
+    def get_dynamic_threshold(ticker, percentile, table_name):
+        seen['handler'].append(main.request_statement_timeout.get())
+        return 1000.0
+
+    def ticker_trades_query(table_name, ticker, floor, session, limit=main.DEFAULT_PAGE_SIZE, cursor=None, raw=False):
+        return [], None
+
+    monkeypatch.setattr(main, 'darkpool_version', darkpool_version)
+    monkeypatch.setattr(main, 'get_dynamic_threshold', get_dynamic_threshold)
+    monkeypatch.setattr(main, 'ticker_trades_query', ticker_trades_query)
+    return seen, version
+
+def test_stamp_has_its_own_timeout_and_handler_keeps_the_routes(allblocks):
+    seen, _ = allblocks
+    resp = TestClient(main.app).get("/dp/allblocks/SPY")
+    assert resp.status_code == 200 and 'etag' in resp.headers
+    assert seen['stamp'] == [main.VERSION_STAMP_TIMEOUT]
+    assert seen['handler'] == [main.ROUTE_LIMITS['/dp/allblocks/{ticker}'].statement_timeout]
+
+def test_backfilled_rows_change_the_etag(allblocks):
+    seen, version = allblocks
+    client = TestClient(main.app)
+    etag = client.get("/dp/allblocks/SPY").headers['etag']
+
+    resp = client.get("/dp/allblocks/SPY", headers={'If-None-Match': etag})
+    assert resp.status_code == 304 and len(seen['handler']) == 1
+
+    # An older print lands: same newest trade_time, higher id
+    version['value'] = '2024-06-03 20:00:00+00:00:42'
+    resp = client.get("/dp/allblocks/SPY", headers={'If-None-Match': etag})
+    assert resp.status_code == 200 and resp.headers['etag'] != etag
+
+@pytest.mark.parametrize('scope', ['ticker', 'tickers', 'all'])
+def test_version_statements_include_newest_id(scope):
+    sql = main.PREPARED_STATEMENTS[main.version_statement('block_trades', scope)].sql
+    assert 'max(trade_time)' in sql and 'max(id)' in sql
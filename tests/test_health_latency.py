@@ -0,0 +1,108 @@
+"""
+Event-loop isolation - /health p99 stays flat while a large SD job runs
+Runs main.unlimited_fast_calculate_level_volume in-process against a fake Polygon that
+serves 50,000-trade pages, probing /health (through the full middleware stack) every few
+ms, and compares the probe p99 with an idle baseline. With SD_CPU_WORKERS=0 (kernels
+inline on the loop) the same job pushes p99 to a page's decode time and this fails.
+"""
+
+import asyncio
+import json
+from typing import List
+
+import httpx
+import pytest
+
+import main
+from benchmark_aggregation import make_page
+
+PAGES = 8
+TRADES_PER_PAGE = 50000
+LEVEL_PRICE = 512.35
+PROBE_INTERVAL = 0.005
+FETCH_LATENCY = 0.002  # per fake Polygon call
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class FakePolygonResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+
+def fake_polygon(pages: int):
+    """polygon_get stand-in: pages chained by next_url, the last one without"""
+    results = json.dumps(make_page(TRADES_PER_PAGE, LEVEL_PRICE)).encode()
+
+    def body(next_url):
+        return b'{"results":' + results + b',"next_url":' + json.dumps(next_url).encode() + b'}'
+
+    middle = body("https://api.polygon.io/v3/trades/SPY?cursor=next")
+    last = body(None)
+    calls = []
+
+    async def polygon_get(client, url):
+        calls.append(url)
+        await asyncio.sleep(FETCH_LATENCY)
+        return FakePolygonResponse(last if len(calls) >= pages else middle)
+
+    return polygon_get, calls
+
+async def probe_health(client: httpx.AsyncClient, stop: asyncio.Event) -> List[float]:
+    loop = asyncio.get_running_loop()
+    latencies = []
+    while not stop.is_set():
+        started = loop.time()
+        resp = await client.get("/health")
+        assert resp.status_code == 200
+        latencies.append(loop.time() - started)
+        await asyncio.sleep(PROBE_INTERVAL)
+    return latencies
+
+async def probe_while(client: httpx.AsyncClient, work) -> List[float]:
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_health(client, stop))
+    try:
+        result = await work
+    finally:
+        stop.set()
+    return await probe, result
+
+@pytest.fixture
+def sd_job_environment(monkeypatch):
+    if main.SD_CPU_WORKERS <= 0:
+        pytest.skip("SD_CPU_WORKERS=0 runs kernels inline - nothing to isolate")
+    polygon_get, calls = fake_polygon(PAGES)
+    monkeypatch.setattr(main, 'polygon_get', polygon_get)
+    monkeypatch.setattr(main, 'POLYGON_API_KEY', 'test')
+    monkeypatch.setattr(main, 'sd_db_pool', None)  # no tick cache
+    yield calls
+    main.shutdown_cpu_pool()
+
+def test_health_p99_flat_during_large_job(sd_job_environment):
+    calls = sd_job_environment
+
+    async def scenario():
+        # Start the spawn workers before timing anything
+        await main.run_cpu(main.band_page_kernel, b'{"results": []}', 0.0, 0.0, False, None)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            idle, _ = await probe_while(client, asyncio.sleep(1.0))
+            busy, result = await probe_while(client, main.unlimited_fast_calculate_level_volume(
+                'SPY', LEVEL_PRICE, '2024-06-03', '2024-06-03'
+            ))
+        return idle, busy, result
+
+    idle, busy, result = asyncio.run(scenario())
+
+    assert len(calls) == PAGES and result['api_calls_made'] == PAGES
+    assert result['total_trades'] > 0
+    assert len(busy) >= 20
+
+    idle_p99 = percentile(idle, 99)
+    busy_p99 = percentile(busy, 99)
+    budget = max(idle_p99 * 3, idle_p99 + 0.025)
+    assert busy_p99 <= budget, (
+        f"/health p99 {busy_p99 * 1000:.1f}ms during the job vs {idle_p99 * 1000:.1f}ms idle "
+        f"(budget {budget * 1000:.1f}ms)"
+    )
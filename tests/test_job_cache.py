@@ -0,0 +1,49 @@
+"""New jobs are cached by the creating worker only while job notifications can invalidate them"""
+
+import contextlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+BATCH = {
+    'start_date': '2024-06-03', 'end_date': '2024-06-07',
+    'bands': [{'level_id': 1, 'level_price': 100.0}],
+}
+
+@pytest.fixture
+def batch_endpoint(monkeypatch):
+    saved, queued = {}, []
+
+    @contextlib.asynccontextmanager
+    async def acquire_sd_connection(primary: bool = False):
+        yield None
+
+    async def foreign_level_ids(conn, ticker, level_ids):
+        return []
+
+    async def save_job_to_db(job_id, job):
+        saved[job_id] = dict(job)
+
+    async def enqueue_job(job_id, kind, ticker, payload, priority=None):
+        queued.append(job_id)
+
+    monkeypatch.setattr(main, 'acquire_sd_connection', acquire_sd_connection)
+    monkeypatch.setattr(main, 'foreign_level_ids', foreign_level_ids)
+    monkeypatch.setattr(main, 'save_job_to_db', save_job_to_db)
+    monkeypatch.setattr(main, 'enqueue_job', enqueue_job)
+    monkeypatch.setattr(main, 'jobs_db', {})
+    return saved, queued
+
+@pytest.mark.parametrize('listener_connected', [False, True])
+def test_new_job_cached_only_while_listening(batch_endpoint, monkeypatch, listener_connected):
+    saved, queued = batch_endpoint
+    monkeypatch.setattr(main, 'job_listener_connected', listener_connected)
+
+    resp = TestClient(main.app).post("/market-volume-job-enhanced/SPY/batch", json=BATCH)
+    assert resp.status_code == 200
+    job_id = resp.json()['job_id']
+
+    assert saved[job_id]['status'] == 'queued' and queued == [job_id]
+    assert (job_id in main.jobs_db) is listener_connected
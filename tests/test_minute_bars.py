@@ -0,0 +1,92 @@
+"""minute_bar_page_kernel band shares and bounds, and refine_windows merging"""
+
+import json
+import random
+
+import pytest
+
+import main
+
+MIN_PRICE, MAX_PRICE = 99.975, 100.025
+MINUTE = 60000
+
+def page(bars, next_url=None) -> bytes:
+    return json.dumps({'results': bars, 'next_url': next_url}).encode()
+
+def bar(t, low, high, volume, trades=10):
+    return {'t': t, 'l': low, 'h': high, 'v': volume, 'n': trades}
+
+def test_bar_inside_band_counts_whole():
+    count, totals, touched, next_url = main.minute_bar_page_kernel(
+        page([bar(0, 99.98, 100.02, 1000)], 'https://next'), MIN_PRICE, MAX_PRICE
+    )
+    volume, value, trades, floor, ceiling, tape_trades = totals
+    assert count == 1 and next_url == 'https://next'
+    assert volume == floor == ceiling == 1000
+    assert value == pytest.approx(1000 * 100.0)
+    assert trades == 10 and tape_trades == 10
+    assert touched == [(0, 10)]
+
+def test_partial_overlap_gets_its_share_of_the_range():
+    # 99.95-100.05 overlaps the band on 99.975-100.025: half the range
+    _, totals, touched, _ = main.minute_bar_page_kernel(
+        page([bar(0, 99.95, 100.05, 1000, trades=8)]), MIN_PRICE, MAX_PRICE
+    )
+    volume, value, trades, floor, ceiling, _ = totals
+    assert volume == pytest.approx(500)
+    assert value == pytest.approx(500 * 100.0)
+    assert trades == pytest.approx(4)
+    assert floor == 0 and ceiling == 1000
+    assert touched == [(0, 8)]
+
+def test_one_sided_overlap_is_valued_at_the_overlap_midpoint():
+    # 100.0-100.1 overlaps on 100.0-100.025: a quarter of the range
+    _, totals, _, _ = main.minute_bar_page_kernel(page([bar(0, 100.0, 100.1, 400)]), MIN_PRICE, MAX_PRICE)
+    volume, value = totals[:2]
+    assert volume == pytest.approx(100)
+    assert value == pytest.approx(100 * 100.0125)
+
+def test_bars_outside_band_only_count_towards_the_tape():
+    bars = [bar(0, 100.03, 100.1, 1000, trades=5), bar(MINUTE, 99.0, 99.97, 1000, trades=7),
+            bar(2 * MINUTE, 99.0, 99.5, 0, trades=0)]
+    count, totals, touched, _ = main.minute_bar_page_kernel(page(bars), MIN_PRICE, MAX_PRICE)
+    assert count == 3
+    assert totals == (0.0, 0.0, 0.0, 0, 0, 12)
+    assert touched == []
+
+def test_bar_ending_on_band_edge_touches_it():
+    _, totals, touched, _ = main.minute_bar_page_kernel(page([bar(0, 100.025, 100.2, 700)]), MIN_PRICE, MAX_PRICE)
+    assert totals[4] == 700 and touched == [(0, 10)]
+    assert totals[0] == pytest.approx(0)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_estimate_between_floor_and_ceiling(seed):
+    rng = random.Random(seed)
+    bars = []
+    for i in range(500):
+        low = round(100 + rng.randint(-20, 15) / 100, 2)
+        high = round(low + rng.randint(0, 10) / 100, 2)
+        bars.append(bar(i * MINUTE, low, high, rng.randint(0, 5000), rng.randint(0, 50)))
+    _, (volume, value, trades, floor, ceiling, tape_trades), touched, _ = main.minute_bar_page_kernel(
+        page(bars), MIN_PRICE, MAX_PRICE
+    )
+    assert 0 < floor <= volume <= ceiling
+    assert MIN_PRICE * volume <= value <= MAX_PRICE * volume + 1e-6
+    assert trades <= sum(bar_trades for _, bar_trades in touched) <= tape_trades
+
+def test_empty_page():
+    assert main.minute_bar_page_kernel(page([]), MIN_PRICE, MAX_PRICE) == (0, (0.0, 0.0, 0.0, 0, 0, 0), [], None)
+
+def test_refine_windows_merges_close_minutes():
+    gap = main.REFINE_MERGE_GAP_MS
+    touched = [(10 * MINUTE, 3), (0, 5), (MINUTE, 2), (10 * MINUTE + gap + MINUTE + 1, 4)]
+    assert main.refine_windows(touched) == [
+        (0, 2 * MINUTE, 7),
+        (10 * MINUTE, 11 * MINUTE, 3),  # more than the gap after minute 1 ends
+        (10 * MINUTE + gap + MINUTE + 1, 10 * MINUTE + gap + 2 * MINUTE + 1, 4),
+    ]
+
+def test_refine_windows_merges_at_exactly_the_gap():
+    gap = main.REFINE_MERGE_GAP_MS
+    assert main.refine_windows([(0, 1), (MINUTE + gap, 1)]) == [(0, 2 * MINUTE + gap, 2)]
+    assert main.refine_windows([]) == []
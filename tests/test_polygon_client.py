@@ -0,0 +1,160 @@
+"""polygon_client retry classification and circuit breaker, against httpx.MockTransport"""
+
+import asyncio
+import itertools
+
+import httpx
+import pytest
+
+import polygon_client
+from polygon_client import (CircuitBreaker, PolygonCircuitOpen, PolygonRequestError,
+                            PolygonRetriesExhausted, polygon_get, polygon_get_sync)
+
+_hosts = itertools.count()
+
+@pytest.fixture
+def host(monkeypatch):
+    """A fresh host per test (breakers are per host), no rate limiting, sleeps recorded not slept"""
+    monkeypatch.setattr(polygon_client, 'rate_limiter', polygon_client.RateLimiter(0, 1))
+    monkeypatch.setattr(polygon_client, 'breakers', {})
+    monkeypatch.setattr(polygon_client, 'POLYGON_MAX_ATTEMPTS', 4)
+    monkeypatch.setattr(polygon_client, 'POLYGON_BREAKER_THRESHOLD', 3)
+    slept = []
+    monkeypatch.setattr(polygon_client.time, 'sleep', slept.append)
+    return f"polygon-{next(_hosts)}.test", slept
+
+def client_for(responses, calls):
+    """Sync client whose transport answers with the next item: a status, (status, headers) or an exception"""
+    script = iter(responses)
+
+    def handler(request):
+        calls.append(str(request.url))
+        item = next(script)
+        if isinstance(item, Exception):
+            raise item
+        status, headers = item if isinstance(item, tuple) else (item, {})
+        return httpx.Response(status, headers=headers, json={'status': status})
+
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+def test_ok_returns_first_response(host):
+    name, slept = host
+    calls = []
+    resp = polygon_get_sync(client_for([200], calls), f"https://{name}/v3/trades/SPY?apiKey=secret")
+    assert resp.status_code == 200 and len(calls) == 1 and slept == []
+
+def test_throttled_waits_at_least_retry_after(host):
+    name, slept = host
+    calls = []
+    resp = polygon_get_sync(client_for([(429, {'Retry-After': '7'}), 200], calls), f"https://{name}/x")
+    assert resp.status_code == 200 and len(calls) == 2
+    assert slept[0] >= 7
+    assert polygon_client.get_breaker(name).failures == 0  # throttling isn't a host failure
+
+def test_server_errors_retry_then_exhaust(host, monkeypatch):
+    name, slept = host
+    monkeypatch.setattr(polygon_client, 'POLYGON_BREAKER_THRESHOLD', 10)
+    calls = []
+    with pytest.raises(PolygonRetriesExhausted):
+        polygon_get_sync(client_for([503] * 4, calls), f"https://{name}/x")
+    assert len(calls) == 4 and len(slept) == 3
+    assert polygon_client.polygon_retries_total[(name, 'server_error')] == 3
+
+def test_transport_errors_are_retried(host):
+    name, _ = host
+    calls = []
+    resp = polygon_get_sync(client_for([httpx.ConnectError("refused"), 200], calls), f"https://{name}/x")
+    assert resp.status_code == 200 and len(calls) == 2
+
+def test_other_client_errors_raise_at_once_without_the_key(host):
+    name, slept = host
+    calls = []
+    with pytest.raises(PolygonRequestError) as error:
+        polygon_get_sync(client_for([403, 200], calls), f"https://{name}/x?apiKey=secret")
+    assert error.value.status_code == 403
+    assert 'secret' not in str(error.value)
+    assert len(calls) == 1 and slept == []
+
+def test_breaker_opens_and_fails_fast(host):
+    name, _ = host
+    calls = []
+    client = client_for([500] * 3, calls)
+    with pytest.raises(PolygonCircuitOpen):
+        polygon_get_sync(client, f"https://{name}/x")  # 3rd failure opens it, 4th attempt refused
+    assert len(calls) == 3
+    assert polygon_client.get_breaker(name).state == 'open'
+    with pytest.raises(PolygonCircuitOpen):
+        polygon_get_sync(client, f"https://{name}/x")
+    assert len(calls) == 3
+    assert polygon_client.polygon_breaker_opened_total[name] == 1
+
+def open_breaker(name: str) -> CircuitBreaker:
+    breaker = polygon_client.get_breaker(name)
+    for _ in range(polygon_client.POLYGON_BREAKER_THRESHOLD):
+        breaker.record_failure()
+    breaker.opened_at -= polygon_client.POLYGON_BREAKER_COOLDOWN  # cooldown over
+    assert breaker.state == 'half_open'
+    return breaker
+
+def test_half_open_lets_exactly_one_probe_through(host):
+    name, _ = host
+    breaker = open_breaker(name)
+    breaker.check()  # the probe
+    for _ in range(3):
+        with pytest.raises(PolygonCircuitOpen):
+            breaker.check()
+
+def test_probe_success_closes_and_failure_reopens(host):
+    name, _ = host
+    breaker = open_breaker(name)
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    breaker.opened_at -= polygon_client.POLYGON_BREAKER_COOLDOWN
+    breaker.check()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    breaker.check()
+    breaker.check()
+
+def test_throttled_probe_hands_the_probe_on(host):
+    name, _ = host
+    breaker = open_breaker(name)
+    calls = []
+    resp = polygon_get_sync(client_for([(429, {'Retry-After': '0'}), 200], calls), f"https://{name}/x")
+    assert resp.status_code == 200 and len(calls) == 2
+    assert breaker.state == 'closed'
+
+def test_lost_probe_is_replaced_after_a_cooldown(host):
+    name, _ = host
+    breaker = open_breaker(name)
+    breaker.check()  # probe never reports back
+    with pytest.raises(PolygonCircuitOpen):
+        breaker.check()
+    breaker.probe_started -= polygon_client.POLYGON_BREAKER_COOLDOWN
+    breaker.check()
+
+def test_concurrent_async_callers_send_one_probe(host):
+    name, _ = host
+    open_breaker(name)
+    calls = []
+    release = asyncio.Event()
+
+    async def handler(request):
+        calls.append(str(request.url))
+        await release.wait()
+        return httpx.Response(200)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            tasks = [asyncio.ensure_future(polygon_get(client, f"https://{name}/x")) for _ in range(5)]
+            await asyncio.sleep(0.01)
+            release.set()
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert sum(isinstance(result, httpx.Response) for result in results) == 1
+    assert sum(isinstance(result, PolygonCircuitOpen) for result in results) == 4
+    assert polygon_client.get_breaker(name).state == 'closed'
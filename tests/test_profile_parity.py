@@ -0,0 +1,124 @@
+"""
+Profile path vs direct fetch - the same tape must give the same band volume
+The profile side runs main.profile_page_kernel -> store_profile_day -> calculate_level_volume_from_profile
+against an in-memory connection that stores COPY values the way the declared column types
+would (BIGINT: asyncpg int()s the value, DECIMAL(20,4): kept to 4 places).
+"""
+
+import asyncio
+import contextlib
+import json
+import random
+import re
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+import pytest
+
+import main
+import update_sd_schema
+
+TICKER = 'SPY'
+DAY = date(2024, 6, 3)
+LEVEL_PRICE = 100.0
+TOLERANCE = 0.025
+SCALE = Decimal('0.0001')
+
+def make_tape(trades: int = 2000, seed: int = 11) -> bytes:
+    """Cent-grid prices around the level (both sides of each band edge), whole and fractional sizes"""
+    rng = random.Random(seed)
+    results = [
+        {'price': round(LEVEL_PRICE + rng.randint(-5, 5) / 100, 2),
+         'size': rng.choice((1, 100, 100, 500, 0.5, 0.25, 3.75)),
+         'sip_timestamp': 1717421400000000000 + i * 1000}
+        for i in range(trades)
+    ]
+    return json.dumps({'results': results, 'next_url': None}).encode()
+
+def stored(table: str, column: str, value) -> Decimal:
+    if (table, column) in update_sd_schema.FRACTIONAL_SHARE_COLUMNS:
+        return Decimal(value).quantize(SCALE, ROUND_HALF_UP)
+    return Decimal(int(value))  # asyncpg's int8 encoder
+
+def numeric_param(sql: str, position: int, value: float) -> Decimal:
+    if re.search(rf"ROUND\(\${position}::numeric, 4\)", sql):
+        return Decimal(value).quantize(SCALE, ROUND_HALF_UP)
+    return Decimal(value)
+
+class FakeProfileConnection:
+    def __init__(self):
+        self.rows = []
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, sql, *args):
+        if sql.startswith('DELETE FROM price_volume_profile'):
+            self.rows = [row for row in self.rows if (row['ticker'], row['trade_date']) != args]
+
+    async def copy_records_to_table(self, table, records, columns):
+        assert table == 'price_volume_profile'
+        for record in records:
+            row = dict(zip(columns, record))
+            row['price_bucket'] = Decimal(row['price_bucket']).quantize(SCALE, ROUND_HALF_UP)
+            row['volume'] = stored(table, 'volume', row['volume'])
+            row['value'] = Decimal(row['value']).quantize(SCALE, ROUND_HALF_UP)
+            self.rows.append(row)
+
+    async def fetchrow(self, sql, *args):
+        ticker, start, end = args[:3]
+        low, high = numeric_param(sql, 4, args[3]), numeric_param(sql, 5, args[4])
+        band = [row for row in self.rows
+                if row['ticker'] == ticker and start <= row['trade_date'] <= end and low <= row['price_bucket'] <= high]
+        return {
+            'total_trades': sum(row['trade_count'] for row in band),
+            'total_volume': sum((row['volume'] for row in band), Decimal(0)),
+            'total_value': sum((row['value'] for row in band), Decimal(0)),
+            'min_price': min((row['price_bucket'] for row in band), default=None),
+            'max_price': max((row['price_bucket'] for row in band), default=None),
+        }
+
+def profile_path_totals(tape: bytes) -> dict:
+    conn = FakeProfileConnection()
+
+    @contextlib.asynccontextmanager
+    async def acquire_sd_connection(primary: bool = False):
+        yield conn
+
+    async def ensure_profile_days(ticker, days):
+        return 0, 0
+
+    async def scenario():
+        buckets, trades, _ = main.profile_page_kernel(tape)
+        await main.store_profile_day(TICKER, DAY, buckets, trades, 'polygon', True)
+        return await main.calculate_level_volume_from_profile(
+            TICKER, LEVEL_PRICE, DAY.isoformat(), DAY.isoformat(), TOLERANCE
+        )
+
+    patched = {'sd_db_pool': object(), 'acquire_sd_connection': acquire_sd_connection,
+               'ensure_profile_days': ensure_profile_days}
+    saved = {name: getattr(main, name) for name in patched}
+    for name, value in patched.items():
+        setattr(main, name, value)
+    try:
+        return asyncio.run(scenario())
+    finally:
+        for name, value in saved.items():
+            setattr(main, name, value)
+
+@pytest.mark.parametrize('dense', [False, True])
+def test_profile_path_matches_direct_fetch_kernel(dense):
+    if dense and not main.NUMPY_AVAILABLE:
+        pytest.skip("numpy not installed")
+    tape = make_tape()
+    results = json.loads(tape)['results']
+    volume, value, trades, _, _ = main.aggregate_trade_page(
+        results, LEVEL_PRICE - TOLERANCE, LEVEL_PRICE + TOLERANCE, dense
+    )
+    profile = profile_path_totals(tape)
+
+    assert not float(volume).is_integer()  # the tape really has fractional volume in the band
+    assert profile['total_volume'] == main.share_volume(volume)
+    assert profile['total_trades'] == trades
+    assert profile['total_value'] == pytest.approx(value)
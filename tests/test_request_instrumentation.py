@@ -0,0 +1,59 @@
+"""Request latency covers the whole response body, streamed or not"""
+
+import asyncio
+from collections import deque
+
+import httpx
+import pytest
+from fastapi.responses import StreamingResponse
+
+import main
+
+CHUNK_DELAY = 0.05
+CHUNKS = 4
+
+async def streaming_app(scope, receive, send):
+    async def body():
+        for i in range(CHUNKS):
+            await asyncio.sleep(CHUNK_DELAY)
+            yield f'{{"chunk": {i}}}\n'.encode()
+    await StreamingResponse(body(), media_type="application/x-ndjson")(scope, receive, send)
+
+async def failing_app(scope, receive, send):
+    raise RuntimeError("handler blew up")
+
+@pytest.fixture
+def metrics(monkeypatch):
+    latency = main.Histogram("test_request_duration_seconds", "", ("method", "route"))
+    slow = deque(maxlen=10)
+    monkeypatch.setattr(main, 'REQUEST_LATENCY', latency)
+    monkeypatch.setattr(main, 'slow_requests', slow)
+    monkeypatch.setattr(main, 'requests_total', {})
+    monkeypatch.setattr(main, 'SLOW_REQUEST_SECONDS', CHUNK_DELAY)
+    return latency, slow
+
+def get(app, path: str) -> httpx.Response:
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.RequestInstrumentationMiddleware(app))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+    return asyncio.run(scenario())
+
+def test_streamed_response_timed_until_last_chunk(metrics):
+    latency, slow = metrics
+    resp = get(streaming_app, "/stream?format=ndjson")
+    assert resp.status_code == 200 and len(resp.content.splitlines()) == CHUNKS
+
+    (_, total, count), = latency._series.values()
+    assert count == 1
+    assert total >= CHUNKS * CHUNK_DELAY
+    entry = slow[-1]
+    assert entry['status'] == 200 and entry['path'] == '/stream' and entry['query'] == 'format=ndjson'
+    assert entry['duration_ms'] >= CHUNKS * CHUNK_DELAY * 1000
+    assert main.requests_total[('GET', 'unmatched', 200)] == 1
+
+def test_handler_error_counted_as_500(metrics):
+    with pytest.raises(RuntimeError):
+        get(failing_app, "/boom")
+    assert main.requests_total[('GET', 'unmatched', 500)] == 1
+    assert main.requests_in_flight[('GET', 'unmatched')] == 0
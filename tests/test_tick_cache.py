@@ -0,0 +1,64 @@
+"""Tick-cache COPY rows built by main.band_page_kernel keep fractional share sizes end to end"""
+
+import csv
+import io
+import json
+import uuid
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+import main
+import update_sd_schema
+
+CACHE_CONTEXT = ('SPY', date(2024, 6, 3), date(2024, 6, 7), uuid.uuid4())
+
+def trades_page(trades):
+    return json.dumps({'results': trades, 'next_url': None}).encode()
+
+def trade(price, size, ns):
+    return {'price': price, 'size': size, 'sip_timestamp': ns, 'participant_timestamp': ns - 1,
+            'exchange': 4, 'conditions': [12]}
+
+PAGE = trades_page([
+    trade(100.0, 100, 1717421400000000000),
+    trade(100.02, 0.25, 1717421400000001000),   # fractional-share print in the band
+    trade(100.5, 0.5, 1717421400000002000),     # fractional, outside the band
+    trade(99.99, 0, 1717421400000003000),       # zero-size - no record, no volume
+])
+
+@pytest.mark.parametrize('dense', [False, True])
+def test_fractional_sizes_survive_kernel_and_cache_rows(dense):
+    if dense and not main.NUMPY_AVAILABLE:
+        pytest.skip("numpy not installed")
+    page_size, totals, next_url, cache_page = main.band_page_kernel(PAGE, 99.9, 100.1, dense, CACHE_CONTEXT)
+    assert page_size == 4 and next_url is None
+
+    volume, value, trades, low, high = totals
+    assert volume == 100.25 and trades == 2
+    assert value == pytest.approx(100 * 100.0 + 0.25 * 100.02)
+
+    row_count, payload = cache_page
+    rows = [dict(zip(main.TICK_CACHE_COLUMNS, row)) for row in csv.reader(io.StringIO(payload.decode()))]
+    assert row_count == len(rows) == 3
+    by_price = {float(row['price']): row for row in rows}
+    assert sorted(by_price) == [100.0, 100.02, 100.5]
+    fractional = by_price[100.02]
+    assert fractional['quantity'] == '0.25'
+    assert float(fractional['trade_value']) == pytest.approx(0.25 * 100.02)  # value and quantity agree
+    assert fractional['trade_time'] == '2024-06-03T13:30:00.000001+00:00'
+    assert fractional['conditions'] == '{12}'
+    assert fractional['fetch_session_id'] == str(CACHE_CONTEXT[3])
+
+def test_cache_rows_skipped_without_context():
+    assert main.band_page_kernel(PAGE, 99.9, 100.1, False, None)[3] is None
+
+def test_cache_quantity_column_is_not_an_integer():
+    # A BIGINT quantity can't hold the 0.25 above
+    assert ('market_data_cache', 'quantity') in update_sd_schema.FRACTIONAL_SHARE_COLUMNS
+
+def test_cached_sums_read_back_as_shares():
+    assert main.share_volume(Decimal('100.2500')) == 100.25
+    assert main.share_volume(Decimal('300.0000')) == 300
+    assert isinstance(main.share_volume(Decimal('300.0000')), int)
@@ -0,0 +1,111 @@
+"""Keyset cursors for the per-ticker listings: encoding, (trade_time, id) paging and bad cursors"""
+
+import base64
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+T0 = datetime(2024, 6, 3, 20, 0, tzinfo=timezone.utc)
+
+# id -> trade_time; ids 3-5 share one timestamp, 7-8 another, so pages split ties
+TRADES = {
+    1: T0, 2: T0 + timedelta(seconds=1), 3: T0 + timedelta(seconds=2), 4: T0 + timedelta(seconds=2),
+    5: T0 + timedelta(seconds=2), 6: T0 + timedelta(seconds=3), 7: T0 + timedelta(seconds=4),
+    8: T0 + timedelta(seconds=4),
+}
+
+class FakeCursor:
+    def __init__(self, dict_rows: bool):
+        self.dict_rows = dict_rows
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+class FakeConnection:
+    def cursor(self, cursor_factory=None, **kwargs):
+        return FakeCursor(cursor_factory is not None)
+
+def execute_prepared(cur, name, params=()):
+    """The page statements' WHERE / ORDER BY / LIMIT over TRADES; anything else returns nothing"""
+    if '_page_' not in name:
+        cur.rows = []
+        return
+    if name.endswith('_after'):
+        ticker, floor, cursor_time, cursor_id, limit = params
+        keys = [(t, i) for i, t in TRADES.items() if (t, i) < (cursor_time, cursor_id)]
+    else:
+        ticker, floor, limit = params
+        keys = [(t, i) for i, t in TRADES.items()]
+    page = sorted(keys, reverse=True)[:limit]
+    rows = [(ticker, 100, 10.0, 1000.0, t, None, i, t) for t, i in page]
+    if cur.dict_rows:
+        columns = main.TRADE_FIELDS + ('id', 'cursor_time')
+        rows = [dict(zip(columns, row)) for row in rows]
+    cur.rows = rows
+
+@pytest.fixture
+def darkpool(monkeypatch):
+    monkeypatch.setattr(main, 'get_darkpool_connection', FakeConnection)
+    monkeypatch.setattr(main, 'release_darkpool_connection', lambda conn: None)
+    monkeypatch.setattr(main, 'execute_prepared', execute_prepared)
+    monkeypatch.setattr(main, 'get_dynamic_threshold', lambda ticker, percentile, table_name: 1000.0)
+
+def test_cursor_round_trip():
+    trade_time = datetime(2024, 6, 3, 13, 30, 0, 123456, tzinfo=timezone(timedelta(hours=-4)))
+    assert main.decode_trade_cursor(main.encode_trade_cursor(trade_time, 2 ** 62)) == (trade_time, 2 ** 62)
+
+def test_keyset_statement_breaks_ties_on_id():
+    sql = main.PREPARED_STATEMENTS[main.page_statement('block_trades', 'all', True)].sql
+    assert "(trade_time, id) < ($3, $4)" in sql
+    assert "ORDER BY trade_time DESC, id DESC" in sql
+
+@pytest.mark.parametrize('raw', [False, True])
+def test_pages_visit_every_row_once_across_ties(darkpool, raw):
+    seen, cursor = [], None
+    while True:
+        rows, cursor = main.ticker_trades_query('block_trades', 'SPY', 1000.0, 'all', 2, cursor, raw=raw)
+        seen += [row[-2] if raw else row['id'] for row in rows]
+        if cursor is None:
+            break
+    assert seen == [8, 7, 6, 5, 4, 3, 2, 1]
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    base64.urlsafe_b64encode(b'yesterday|12').decode(),
+    base64.urlsafe_b64encode(b'2024-06-03T20:00:00|12').decode(),              # naive time
+    base64.urlsafe_b64encode(b'2024-06-03T20:00:00+00:00|99999999999999999999').decode(),  # past bigint
+    base64.urlsafe_b64encode(b'2024-06-03T20:00:00+00:00|-1').decode(),
+])
+def test_bad_cursor_rejected(cursor):
+    with pytest.raises(ValueError):
+        main.decode_trade_cursor(cursor)
+
+def test_endpoint_follows_next_cursor_and_rejects_tampered(darkpool):
+    client = TestClient(main.app)
+    first = client.get("/dp/allblocks/SPY", params={'limit': 3})
+    assert first.status_code == 200
+    next_cursor = first.headers['X-Next-Cursor']
+    assert main.decode_trade_cursor(next_cursor) == (TRADES[6], 6)
+
+    second = client.get("/dp/allblocks/SPY", params={'limit': 3, 'cursor': next_cursor})
+    assert second.status_code == 200
+    assert len(second.json()) == 3
+
+    tampered = base64.urlsafe_b64encode(b'2024-06-03T20:00:00+00:00|99999999999999999999').decode()
+    for cursor in (tampered, next_cursor[:-3] + '!!!'):
+        resp = client.get("/dp/allblocks/SPY", params={'limit': 3, 'cursor': cursor})
+        assert resp.status_code == 400, resp.text
+        assert 'Invalid cursor' in resp.json()['detail']
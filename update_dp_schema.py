@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Update Dark Pool Database Schema - TIMESCALE FEATURES
+This updates your existing darkpool_data database with:
+1. Daily per-ticker/session continuous aggregates for block and lit prints
+2. Refresh policies so the aggregates stay current
+3. Keyset pagination indexes on (ticker, trade_time, id), and (ticker, id) for ETag stamps
+4. Native compression (segmentby ticker, orderby trade_time DESC) and retention
+5. EXPLAIN check that the API's ticker queries still filter compressed chunks by segment
+6. sd_level_bands - mirror of supply_demand_levels for the prints-near-levels range join
+
+Run schema.sql first on a fresh database - this script assumes both hypertables exist
+
+Safe to re-run - every step checks before it creates
+"""
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+# Database connection details (same as main.py)
+DB_HOST = "localhost"
+DB_PORT = "5432"
+DB_USER = "trader"
+DB_PASS = "Deltuhdarkpools!7"
+DP_DB_NAME = "darkpool_data"
+
+# Source hypertable -> continuous aggregate name
+DAILY_AGGREGATES = [
+    ("block_trades", "block_trades_daily"),
+    ("lit_trades", "lit_trades_daily"),
+]
+
+# Chunks older than this are compressed; must stay past the caggs' 7-day refresh window
+COMPRESS_AFTER = "14 days"
+
+# Raw prints older than this are dropped. The daily aggregates keep their rows because
+# neither the refresh policy nor refresh_history() reaches back past the oldest raw chunk.
+RETENTION_POLICIES = {
+    "block_trades": "5 years",
+    "lit_trades": "3 years",
+}
+
+def get_connection():
+    """Autocommit connection - continuous aggregates cannot be created inside a transaction"""
+    conn = psycopg2.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASS,
+        database=DP_DB_NAME
+    )
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    return conn
+
+def view_exists(cur, view_name: str) -> bool:
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT FROM timescaledb_information.continuous_aggregates
+            WHERE view_name = %s
+        )
+    """, (view_name,))
+    result = cur.fetchone()
+    return bool(result and result[0])
+
+def create_daily_aggregates() -> None:
+    """Create per-(ticker, day, session) continuous aggregates"""
+    conn = get_connection()
+    cur = conn.cursor()
+
+    for table_name, view_name in DAILY_AGGREGATES:
+        if view_exists(cur, view_name):
+            print(f"📁 {view_name} already exists")
+            continue
+
+        print(f"Creating {view_name}...")
+        # Session boundaries match the /dp/alldp market-hours filter (09:30-16:00 ET inclusive).
+        # materialized_only = false keeps the not-yet-materialized tail exact via real-time aggregation.
+        cur.execute(f"""
+            CREATE MATERIALIZED VIEW {view_name}
+            WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+            SELECT
+                ticker,
+                time_bucket(INTERVAL '1 day', trade_time, 'America/New_York') AS trade_day,
+                CASE
+                    WHEN (trade_time AT TIME ZONE 'America/New_York')::time < '09:30:00' THEN 'premarket'
+                    WHEN (trade_time AT TIME ZONE 'America/New_York')::time <= '16:00:00' THEN 'regular'
+                    ELSE 'afterhours'
+                END AS session,
+                COUNT(*) AS trade_count,
+                SUM(quantity) AS total_volume,
+                SUM(trade_value) AS total_notional
+            FROM {table_name}
+            GROUP BY ticker, trade_day, session
+            WITH NO DATA
+        """)
+        print(f"✅ Created {view_name}")
+
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{view_name}_ticker_day ON {view_name} (ticker, trade_day DESC)"
+        )
+        print(f"✅ Created index: {view_name} ticker/day")
+
+    cur.close()
+    conn.close()
+
+def add_refresh_policies() -> None:
+    """Keep the last week materialized; older days are immutable once backfilled"""
+    conn = get_connection()
+    cur = conn.cursor()
+
+    for _, view_name in DAILY_AGGREGATES:
+        cur.execute(f"""
+            SELECT add_continuous_aggregate_policy('{view_name}',
+                start_offset => INTERVAL '7 days',
+                end_offset => INTERVAL '1 hour',
+                schedule_interval => INTERVAL '15 minutes',
+                if_not_exists => true)
+        """)
+        print(f"✅ Refresh policy on {view_name}")
+
+    cur.close()
+    conn.close()
+
+def refresh_history() -> None:
+    """
+    Materialize history still backed by raw chunks (also re-run after a backfill).
+    Starts at the oldest remaining chunk: refreshing a window whose raw rows the retention
+    policy already dropped would delete the aggregate rows kept for those days.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+
+    for table_name, view_name in DAILY_AGGREGATES:
+        cur.execute("""
+            SELECT min(range_start) FROM timescaledb_information.chunks
+            WHERE hypertable_name = %s
+        """, (table_name,))
+        oldest_chunk = cur.fetchone()[0]
+        if oldest_chunk is None:
+            print(f"📁 {table_name} has no chunks - nothing to refresh")
+            continue
+
+        # Only whole buckets inside the window are refreshed, so a day straddling
+        # the oldest chunk boundary is left as it was
+        print(f"Refreshing {view_name} from {oldest_chunk}...")
+        cur.execute(f"CALL refresh_continuous_aggregate('{view_name}', %s, NULL)", (oldest_chunk,))
+        print(f"✅ Refreshed {view_name}")
+
+    cur.close()
+    conn.close()
+
+def create_keyset_indexes() -> None:
+    """
+    Indexes matching ORDER BY trade_time DESC, id DESC for cursor pagination, plus
+    (ticker, id) so the API's per-ticker ETag stamp reads max(id) off an index
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+
+    for table_name, _ in DAILY_AGGREGATES:
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table_name}_ticker_time_id "
+            f"ON {table_name} (ticker, trade_time DESC, id DESC)"
+        )
+        print(f"✅ Created index: {table_name} ticker/time/id")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_ticker_id ON {table_name} (ticker, id DESC)")
+        print(f"✅ Created index: {table_name} ticker/id")
+
+    cur.close()
+    conn.close()
+
+def enable_compression() -> None:
+    """Segment by ticker so per-ticker queries only decompress that ticker's batches"""
+    conn = get_connection()
+    cur = conn.cursor()
+
+    for table_name, _ in DAILY_AGGREGATES:
+        cur.execute("""
+            SELECT compression_enabled FROM timescaledb_information.hypertables
+            WHERE hypertable_name = %s
+        """, (table_name,))
+        result = cur.fetchone()
+        if result is None:
+            print(f"❌ {table_name} is not a hypertable - run schema.sql first")
+            continue
+
+        if not result[0]:
+            cur.execute(f"""
+                ALTER TABLE {table_name} SET (
+                    timescaledb.compress,
+                    timescaledb.compress_segmentby = 'ticker',
+                    timescaledb.compress_orderby = 'trade_time DESC, id DESC'
+                )
+            """)
+            print(f"✅ Enabled compression on {table_name}")
+        else:
+            print(f"📁 Compression already enabled on {table_name}")
+
+        cur.execute(
+            f"SELECT add_compression_policy('{table_name}', INTERVAL '{COMPRESS_AFTER}', if_not_exists => true)"
+        )
+        print(f"✅ Compression policy on {table_name} (after {COMPRESS_AFTER})")
+
+    cur.close()
+    conn.close()
+
+def add_retention_policies() -> None:
+    """Drop raw chunks past the retention window"""
+    conn = get_connection()
+    cur = conn.cursor()
+
+    for table_name, keep_for in RETENTION_POLICIES.items():
+        cur.execute(
+            f"SELECT add_retention_policy('{table_name}', INTERVAL '{keep_for}', if_not_exists => true)"
+        )
+        print(f"✅ Retention policy on {table_name} (keep {keep_for})")
+
+    cur.close()
+    conn.close()
+
+def create_level_mirror() -> None:
+    """
+    Active SD levels mirrored into darkpool_data (main.py keeps it in sync), so
+    /levels/{ticker}/nearby-prints joins prints to levels inside one database
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS sd_level_bands (
+            level_id BIGINT PRIMARY KEY,
+            ticker TEXT NOT NULL,
+            level_price NUMERIC(12, 4) NOT NULL,
+            level_type TEXT NOT NULL,
+            level_name TEXT,
+            synced_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    print("✅ sd_level_bands table ready")
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sd_level_bands_ticker ON sd_level_bands (ticker, level_price)")
+    print("✅ Created index: sd_level_bands ticker/price")
+
+    cur.close()
+    conn.close()
+
+def create_range_join_indexes() -> None:
+    """(ticker, price, trade_time): each level's band is one index range, time checked in-index"""
+    conn = get_connection()
+    cur = conn.cursor()
+
+    for table_name, _ in DAILY_AGGREGATES:
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table_name}_ticker_price_time "
+            f"ON {table_name} (ticker, price, trade_time)"
+        )
+        print(f"✅ Created index: {table_name} ticker/price/time")
+
+    cur.close()
+    conn.close()
+
+def verify_compressed_query_plans(ticker: str = "SPY") -> None:
+    """
+    EXPLAIN the hot per-ticker API queries against compressed history.
+    The ticker filter must appear on the compressed chunk scan (segment pushdown);
+    a bare DecompressChunk with the filter only above it means every batch is decompressed.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+
+    queries = {
+        "threshold (get_dynamic_threshold)": """
+            SELECT trade_value::float FROM {table}
+            WHERE ticker = %s AND trade_time < NOW() - INTERVAL '{age}'
+            ORDER BY trade_time DESC LIMIT 5000
+        """,
+        "keyset page (ticker_trades_query)": """
+            SELECT id, trade_time FROM {table}
+            WHERE ticker = %s AND trade_time <= NOW() - INTERVAL '{age}'
+              AND (trade_time, id) < (NOW() - INTERVAL '{age}', 9223372036854775807)
+            ORDER BY trade_time DESC, id DESC LIMIT 500
+        """,
+    }
+
+    for table_name, _ in DAILY_AGGREGATES:
+        for label, template in queries.items():
+            cur.execute(
+                "EXPLAIN " + template.format(table=table_name, age=COMPRESS_AFTER),
+                (ticker,)
+            )
+            plan = [row[0] for row in cur.fetchall()]
+            # Each scan of a compressed chunk is followed by its own Index Cond/Filter line
+            compressed_scans = [i for i, line in enumerate(plan) if " on compress_hyper" in line]
+            pushed_down = all(
+                i + 1 < len(plan) and "ticker" in plan[i + 1]
+                for i in compressed_scans
+            )
+            if not compressed_scans:
+                status = "📁 no compressed chunks scanned yet"
+            elif pushed_down:
+                status = "✅ segment filter pushed down"
+            else:
+                status = "❌ ticker filter NOT pushed down"
+            print(f"{status}: {table_name} {label}")
+
+    cur.close()
+    conn.close()
+
+def main() -> None:
+    """Run all dark pool schema updates"""
+    print("🚀 Updating darkpool_data schema for Timescale features...")
+    print()
+
+    try:
+        print("🔧 Step 1: Creating daily continuous aggregates...")
+        create_daily_aggregates()
+        print()
+
+        print("🔧 Step 2: Adding refresh policies...")
+        add_refresh_policies()
+        print()
+
+        print("🔧 Step 3: Materializing retained history...")
+        refresh_history()
+        print()
+
+        print("🔧 Step 4: Creating keyset pagination indexes...")
+        create_keyset_indexes()
+        print()
+
+        print("🔧 Step 5: Enabling native compression...")
+        enable_compression()
+        print()
+
+        print("🔧 Step 6: Adding retention policies...")
+        add_retention_policies()
+        print()
+
+        print("🔧 Step 7: Checking compressed query plans...")
+        verify_compressed_query_plans()
+        print()
+
+        print("🔧 Step 8: Creating SD level mirror...")
+        create_level_mirror()
+        print()
+
+        print("🔧 Step 9: Creating range-join indexes...")
+        create_range_join_indexes()
+        print()
+
+        print("✅ Dark pool schema updates complete!")
+
+    except Exception as e:
+        print(f"❌ Schema update failed: {e}")
+        print("   Make sure darkpool_data exists and block_trades/lit_trades are hypertables")
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,10 @@ This updates your existing supply_demand_data database with:
 2. Enhanced background jobs tracking
 3. Correct date semantics
 4. Performance indexes
+5. Per-ticker/day price volume profiles
+6. Durable job queue
+7. Incremental daily absorption rollups (daily_level_volume)
+8. Fractional share counts in the tick cache, price profiles and daily rollups
 
 Fixed version with proper None handling for type safety
 """
@@ -68,7 +72,8 @@ def update_background_jobs_table() -> None:
     enhancement_columns = [
         ("enhancement", "VARCHAR(100)", "Track enhanced vs legacy jobs"),
         ("api_calls_used", "INTEGER DEFAULT 0", "Track unlimited API usage"),
-        ("is_absorption", "BOOLEAN DEFAULT FALSE", "Track job type")
+        ("is_absorption", "BOOLEAN DEFAULT FALSE", "Track job type"),
+        ("job_state", "JSONB", "Full job document shared by all API workers")
     ]
     
     for column_name, column_type, description in enhancement_columns:
@@ -134,7 +139,7 @@ def create_absorption_segments_table() -> None:
         indexes = [
             ("CREATE INDEX idx_absorption_segments_level_id ON absorption_job_segments(level_id)", "Level ID index"),
             ("CREATE INDEX idx_absorption_segments_date_range ON absorption_job_segments(date_start, date_end)", "Date range index"),
-            ("CREATE INDEX idx_absorption_segments_job_id ON absorption_job_segments(job_id)", "Job ID index"),
+            ("CREATE UNIQUE INDEX idx_absorption_segments_job_level ON absorption_job_segments(job_id, level_id)", "Unique job/level index"),
             ("CREATE INDEX idx_absorption_segments_level_dates ON absorption_job_segments(level_id, date_start, date_end)", "Composite level/dates index")
         ]
         
@@ -144,6 +149,28 @@ def create_absorption_segments_table() -> None:
             
     else:
         print("📁 absorption_job_segments table already exists")
+        
+        # Retried jobs upsert their segment, which needs one row per (job_id, level_id)
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM pg_indexes 
+                WHERE tablename = 'absorption_job_segments' AND indexname = 'idx_absorption_segments_job_level'
+            )
+        """)
+        
+        result = cur.fetchone()
+        if not result or not result[0]:
+            cur.execute("""
+                DELETE FROM absorption_job_segments s
+                USING absorption_job_segments newer
+                WHERE newer.job_id = s.job_id AND newer.level_id = s.level_id AND newer.id > s.id
+            """)
+            print(f"✅ Removed {cur.rowcount} duplicate job segments")
+            cur.execute("CREATE UNIQUE INDEX idx_absorption_segments_job_level ON absorption_job_segments(job_id, level_id)")
+            cur.execute("DROP INDEX IF EXISTS idx_absorption_segments_job_id")
+            print("✅ Created index: Unique job/level index")
+        else:
+            print("📁 Unique job/level index already exists")
     
     conn.commit()
     cur.close()
@@ -247,6 +274,179 @@ def add_column_comments() -> None:
     cur.close()
     conn.close()
 
+def create_price_volume_profile_tables() -> None:
+    """Create per-ticker/day volume-at-price histograms and their build ledger"""
+    conn = psycopg2.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASS,
+        database=SD_DB_NAME
+    )
+    
+    cur = conn.cursor()
+    
+    # One row per $0.01 price bucket per ticker/day (main.py PROFILE_BUCKET_SIZE)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS price_volume_profile (
+            ticker VARCHAR(10) NOT NULL,
+            trade_date DATE NOT NULL,
+            price_bucket DECIMAL(12,4) NOT NULL,
+            volume DECIMAL(20,4) NOT NULL,
+            value DECIMAL(20,4) NOT NULL,
+            trade_count INTEGER NOT NULL,
+            PRIMARY KEY (ticker, trade_date, price_bucket)
+        )
+    """)
+    print("✅ price_volume_profile table ready")
+    
+    # A day is only summed from once it is listed here as complete
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS price_volume_profile_days (
+            ticker VARCHAR(10) NOT NULL,
+            trade_date DATE NOT NULL,
+            bucket_count INTEGER NOT NULL,
+            trade_count INTEGER NOT NULL,
+            source VARCHAR(50) NOT NULL,
+            is_complete BOOLEAN NOT NULL DEFAULT FALSE,
+            built_at TIMESTAMP DEFAULT NOW(),
+            PRIMARY KEY (ticker, trade_date)
+        )
+    """)
+    print("✅ price_volume_profile_days table ready")
+    
+    # Level queries scan one price range per day inside the ticker's date range
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_price_volume_profile_ticker_price
+        ON price_volume_profile (ticker, price_bucket, trade_date)
+    """)
+    print("✅ Created index: price_volume_profile ticker/price/date")
+    
+    conn.commit()
+    cur.close()
+    conn.close()
+
+def create_job_queue_table() -> None:
+    """Create the durable job queue the API's job workers claim from"""
+    conn = psycopg2.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASS,
+        database=SD_DB_NAME
+    )
+    
+    cur = conn.cursor()
+    
+    # status: queued -> running -> done/failed; running rows heartbeat, stale ones are requeued
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_queue (
+            job_id VARCHAR(255) PRIMARY KEY REFERENCES background_jobs(job_id) ON DELETE CASCADE,
+            kind VARCHAR(50) NOT NULL,
+            ticker VARCHAR(10) NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            payload JSONB NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker_id VARCHAR(255),
+            enqueued_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """)
+    print("✅ job_queue table ready")
+    
+    indexes = [
+        ("CREATE INDEX IF NOT EXISTS idx_job_queue_claim ON job_queue (priority DESC, enqueued_at) WHERE status = 'queued'", "Queued claim-order index"),
+        ("CREATE INDEX IF NOT EXISTS idx_job_queue_running ON job_queue (ticker, heartbeat_at) WHERE status = 'running'", "Running ticker/heartbeat index")
+    ]
+    
+    for index_sql, description in indexes:
+        cur.execute(index_sql)
+        print(f"✅ Created index: {description}")
+    
+    conn.commit()
+    cur.close()
+    conn.close()
+
+def update_daily_level_volume_table() -> None:
+    """Add the band and completeness columns incremental absorption rollups key on"""
+    conn = psycopg2.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASS,
+        database=SD_DB_NAME
+    )
+    
+    cur = conn.cursor()
+    
+    # A day is reused only for the same band, and only once the day has closed
+    rollup_columns = [
+        ("price_range_low", "DECIMAL(12,4)", "Band the day was summed over"),
+        ("price_range_high", "DECIMAL(12,4)", "Band the day was summed over"),
+        ("is_complete", "BOOLEAN DEFAULT FALSE", "Day had closed when summed")
+    ]
+    
+    for column_name, column_type, description in rollup_columns:
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT FROM information_schema.columns 
+                WHERE table_name = 'daily_level_volume' AND column_name = %s
+            )
+        """, (column_name,))
+        
+        result = cur.fetchone()
+        if not result or not result[0]:
+            cur.execute(f"ALTER TABLE daily_level_volume ADD COLUMN {column_name} {column_type}")
+            print(f"✅ Added {column_name} - {description}")
+        else:
+            print(f"📁 Column {column_name} already exists")
+    
+    conn.commit()
+    cur.close()
+    conn.close()
+
+# Polygon sizes can be fractional; asyncpg's int8 codec would truncate them to whole shares
+FRACTIONAL_SHARE_COLUMNS = [
+    ("market_data_cache", "quantity"),
+    ("price_volume_profile", "volume"),
+    ("daily_level_volume", "daily_volume"),
+    ("daily_level_volume", "cumulative_volume"),
+]
+
+def widen_share_columns() -> None:
+    """Store share counts as DECIMAL(20,4) so fractional-share prints keep their size"""
+    conn = psycopg2.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASS,
+        database=SD_DB_NAME
+    )
+    
+    cur = conn.cursor()
+    
+    for table_name, column_name in FRACTIONAL_SHARE_COLUMNS:
+        cur.execute("""
+            SELECT data_type FROM information_schema.columns 
+            WHERE table_name = %s AND column_name = %s
+        """, (table_name, column_name))
+        
+        result = cur.fetchone()
+        if not result:
+            print(f"⚠️  {table_name}.{column_name} not found")
+        elif result[0] != 'numeric':
+            cur.execute(f"ALTER TABLE {table_name} ALTER COLUMN {column_name} TYPE DECIMAL(20,4)")
+            print(f"✅ Widened {table_name}.{column_name} from {result[0]} to DECIMAL(20,4)")
+        else:
+            print(f"📁 {table_name}.{column_name} already DECIMAL")
+    
+    conn.commit()
+    cur.close()
+    conn.close()
+
 def verify_schema_updates() -> None:
     """Verify all updates were applied correctly"""
     conn = psycopg2.connect(
@@ -262,7 +462,8 @@ def verify_schema_updates() -> None:
     print("🔍 Verifying schema updates...")
     
     # Check tables exist
-    tables_to_check = ['supply_demand_levels', 'level_volume_tracking', 'background_jobs', 'absorption_job_segments']
+    tables_to_check = ['supply_demand_levels', 'level_volume_tracking', 'background_jobs', 'absorption_job_segments',
+                      'price_volume_profile', 'price_volume_profile_days', 'job_queue']
     
     for table in tables_to_check:
         cur.execute("""
@@ -278,7 +479,7 @@ def verify_schema_updates() -> None:
         print(f"{status} Table {table}: {'EXISTS' if exists else 'MISSING'}")
     
     # Check background_jobs enhancement columns
-    enhancement_columns = ['enhancement', 'api_calls_used', 'is_absorption']
+    enhancement_columns = ['enhancement', 'api_calls_used', 'is_absorption', 'job_state']
     for column in enhancement_columns:
         cur.execute("""
             SELECT EXISTS (
@@ -406,6 +607,10 @@ def main() -> None:
     print("   • Enhanced background job tracking")
     print("   • Unlimited API call metrics")
     print("   • Correct absorption date semantics")
+    print("   • Price volume profiles for instant level volume")
+    print("   • Durable prioritized job queue")
+    print("   • Incremental daily absorption rollups")
+    print("   • Fractional share counts")
     print()
     
     try:
@@ -442,13 +647,33 @@ def main() -> None:
         add_column_comments()
         print()
         
-        # Step 5: Verify updates
-        print("🔧 Step 5: Verifying schema updates...")
+        # Step 5: Create price volume profiles
+        print("🔧 Step 5: Creating price_volume_profile tables...")
+        create_price_volume_profile_tables()
+        print()
+        
+        # Step 6: Create job queue
+        print("🔧 Step 6: Creating job_queue table...")
+        create_job_queue_table()
+        print()
+        
+        # Step 7: Daily absorption rollups
+        print("🔧 Step 7: Updating daily_level_volume table...")
+        update_daily_level_volume_table()
+        print()
+        
+        # Step 8: Fractional share counts
+        print("🔧 Step 8: Widening share-count columns...")
+        widen_share_columns()
+        print()
+        
+        # Step 9: Verify updates
+        print("🔧 Step 9: Verifying schema updates...")
         verify_schema_updates()
         print()
         
-        # Step 6: Optional sample data
-        print("🔧 Step 6: Sample data creation...")
+        # Step 10: Optional sample data
+        print("🔧 Step 10: Sample data creation...")
         create_sample_data()
         print()
         